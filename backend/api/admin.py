@@ -3,4 +3,5 @@ from .models import *
 
 # Register your models here.
 admin.site.register(Planet)
-admin.site.register(Star)
\ No newline at end of file
+admin.site.register(Star)
+admin.site.register(PredictionJob)
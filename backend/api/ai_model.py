@@ -1,15 +1,32 @@
+import hashlib
+import importlib.util
 import os
-import requests
-import joblib
-import tensorflow as tf
+import threading
+import time
 import numpy as np
-import pandas as pd
-from tensorflow.keras.models import load_model # type: ignore
+from django.conf import settings
 
+from .batching import MicroBatcher
+from .features import MODEL_FEATURES, Preprocessor, to_model_features
+from .inference import NumpyMLP, load_shared_weights, save_shared_weights
+from .model_registry import ModelRegistry
+from .onnx_model import OnnxClassifier, load_onnx_model, save_onnx_model
+from .prediction_cache import build_prediction_cache
+
+# TensorFlow, joblib and requests are imported inside load_resources() so that
+# importing this module (e.g. from views.py or any manage.py command) stays cheap.
+
+# Files used when no registry version has been promoted (see ML_MODEL_REGISTRY_DIR)
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 MODEL_PATH = os.path.join(BASE_DIR, "model.keras")
 SCALER_PATH = os.path.join(BASE_DIR, "scaler.joblib")
 ENCODER_PATH = os.path.join(BASE_DIR, "label_encoder.joblib")
+# Training medians and masking rules (features.Preprocessor), written by NN.py
+PREPROCESSING_PATH = os.path.join(BASE_DIR, "preprocessing.json")
+# Flat float32 export of the folded weights + scaler + labels, memory-mapped by workers
+SHARED_WEIGHTS_PATH = os.path.join(BASE_DIR, "model_weights.bin")
+# ONNX export with the scaler folded in, labels and medians in its metadata
+ONNX_MODEL_PATH = os.path.join(BASE_DIR, "model.onnx")
 
 # URLs to download model and related files if not present
 FILES_TO_DOWNLOAD = {
@@ -18,46 +35,567 @@ FILES_TO_DOWNLOAD = {
     "label_encoder.joblib": "https://huggingface.co/nimitjalan/1-world-2025-final/resolve/main/label_encoder.joblib",
 }
 
-model = scaler = label_encoder = None
+# Engines that can run the forward pass, by name: each is a loader taking
+# ArtifactPaths and returning (model, scaler, label_encoder), registered with
+# @inference_backend below. ML_INFERENCE_BACKEND picks one at startup, or "auto".
+INFERENCE_BACKENDS = {}
 
-def load_resources():
-    """Load ML assets if not already loaded."""
-    global model, scaler, label_encoder
-    if model and scaler and label_encoder:
-        return  # already loaded
-
-    print("🔄 Attempting to load model, scaler, and label encoder...")
-    if not os.path.exists(MODEL_PATH):
-        print(f"❌ Model not found at {MODEL_PATH}")
+
+class ArtifactPaths:
+    """Files of one model version: the trained artifacts and the exports derived from them."""
+
+    def __init__(self, model, scaler, encoder, preprocessing, shared_weights, onnx):
+        self.model = model
+        self.scaler = scaler
+        self.encoder = encoder
+        self.preprocessing = preprocessing
+        self.shared_weights = shared_weights
+        self.onnx = onnx
+
+    @classmethod
+    def default(cls):
+        """The files in the api folder (read at call time, so tests can point them elsewhere)."""
+        return cls(MODEL_PATH, SCALER_PATH, ENCODER_PATH, PREPROCESSING_PATH, SHARED_WEIGHTS_PATH, ONNX_MODEL_PATH)
+
+    @classmethod
+    def in_directory(cls, directory):
+        return cls(*(
+            os.path.join(directory, name) for name in (
+                "model.keras", "scaler.joblib", "label_encoder.joblib",
+                "preprocessing.json", "model_weights.bin", "model.onnx",
+            )
+        ))
+
+    @property
+    def sources(self):
+        """The trained artifacts, which the exports are derived from."""
+        return (self.model, self.scaler, self.encoder, self.preprocessing)
+
+    def all(self):
+        return self.sources + (self.shared_weights, self.onnx)
+
+
+class LoadedModel:
+    """
+    One loaded model version: everything a prediction needs.
+
+    Requests take a reference to `active` once and use it to the end, so a hot
+    swap, which just rebinds `active`, lets in-flight requests finish on the
+    old version while new ones get the new one.
+    """
+
+    def __init__(self, model, scaler, label_encoder, preprocessor, version):
+        self.model = model
+        self.scaler = scaler
+        self.label_encoder = label_encoder
+        self.preprocessor = preprocessor
+        self.version = version
+
+    def scale(self, features):
+        """Apply the fitted RobustScaler to a whole feature matrix at once."""
+        scaled = np.asarray(features, dtype=np.float64)
+        if self.scaler.center_ is not None:
+            scaled = scaled - self.scaler.center_
+        if self.scaler.scale_ is not None:
+            scaled = scaled / self.scaler.scale_
+        return scaled
+
+    def predict_proba(self, scaled_input):
+        """Run the model on an already scaled matrix."""
+        if isinstance(self.model, (NumpyMLP, OnnxClassifier)):
+            return self.model.predict(scaled_input)
+        return np.asarray(self.model.predict(scaled_input, verbose=0))
+
+    def predict_matrix(self, features):
+        """
+        Run one forward pass over a raw feature matrix.
+
+        Returns:
+            tuple: (labels: np.ndarray of str, confidences: np.ndarray of float)
+        """
+        # Same median imputation, log transforms and column order as training (api/features.py)
+        scaled_input = self.scale(to_model_features(self.preprocessor.transform(features)))
+        pred_proba = self.predict_proba(scaled_input)  # Shape: (rows, num_classes)
+        pred_index = np.argmax(pred_proba, axis=1)
+        confidence = np.max(pred_proba, axis=1)
+        pred_label = self.label_encoder.inverse_transform(pred_index)
+        return pred_label, confidence
+
+
+# The model serving requests, or None until load_resources() succeeds
+active = None
+
+# Loading state, reported by the readiness endpoint
+_load_lock = threading.Lock()
+_warmup_thread = None
+load_status = "not_loaded"  # not_loaded | loading | ready | failed
+load_error = None
+
+# Hot swap to a newly promoted registry version (see _check_for_promotion)
+_swap_thread = None
+_swap_checked_at = 0.0
+_failed_version = None
+
+# Shared micro-batcher for single-row predictions (see get_batcher)
+_batcher = None
+_batcher_lock = threading.Lock()
+
+# Prediction cache (see get_prediction_cache)
+_prediction_cache = None
+_prediction_cache_lock = threading.Lock()
+
+
+def inference_backend(name):
+    """Register the decorated function as the loader of an inference backend."""
+    def register(loader):
+        INFERENCE_BACKENDS[name] = loader
+        return loader
+    return register
+
+
+def onnx_runtime_available(paths=None):
+    """True if onnxruntime is installed and model.onnx has been exported."""
+    paths = paths or ArtifactPaths.default()
+    return importlib.util.find_spec("onnxruntime") is not None and os.path.exists(paths.onnx)
+
+
+def get_inference_backend(paths=None):
+    """
+    Return the configured inference backend name. "auto" picks ONNX Runtime
+    when it can run without TensorFlow, else NumPy.
+    """
+    backend = getattr(settings, "ML_INFERENCE_BACKEND", "numpy")
+    if backend == "auto":
+        return "onnx" if onnx_runtime_available(paths) else "numpy"
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(f"Unknown ML_INFERENCE_BACKEND: {backend!r}")
+    return backend
+
+
+def get_registry():
+    """The model registry under ML_MODEL_REGISTRY_DIR, or None when it isn't configured."""
+    root = getattr(settings, "ML_MODEL_REGISTRY_DIR", None)
+    return ModelRegistry(root) if root else None
+
+
+def is_ready():
+    """True once a model version is loaded."""
+    return active is not None
+
+
+def get_status():
+    """Loading state of the ML assets, for the readiness endpoint."""
+    loaded = active
+    return {
+        "ready": loaded is not None,
+        "status": load_status,
+        "backend": getattr(settings, "ML_INFERENCE_BACKEND", "numpy"),
+        "engine": type(loaded.model).__name__ if loaded is not None else None,
+        "model_version": loaded.version if loaded is not None else None,
+        "error": load_error,
+    }
+
+
+def download_missing_files():
+    """
+    Download any model files that are not on disk yet, in parallel and
+    verified, with one process downloading while the others wait (api/fetcher.py).
+    Each file is checked against its ML_MODEL_FILE_SHA256 pin, else the
+    checksum Hugging Face reports; a file with neither is rejected.
+    Returns the names that were downloaded.
+    """
+    from .fetcher import fetch_files
+
+    return fetch_files(
+        FILES_TO_DOWNLOAD, BASE_DIR,
+        checksums=getattr(settings, "ML_MODEL_FILE_SHA256", {}), require_checksum=True,
+    )
+
+
+def use_shared_weights():
+    """True when the NumPy backend should use the memory-mapped weights file."""
+    return getattr(settings, "ML_SHARED_WEIGHTS", True)
+
+
+def _is_fresh(export_path, sources):
+    """True if `export_path` exists and is newer than every source file on disk."""
+    if not os.path.exists(export_path):
+        return False
+    exported_at = os.path.getmtime(export_path)
+    return all(os.path.getmtime(path) <= exported_at for path in sources if os.path.exists(path))
+
+
+def shared_weights_are_fresh(paths=None):
+    """True if the shared weights file exists and is newer than its sources."""
+    paths = paths or ArtifactPaths.default()
+    return _is_fresh(paths.shared_weights, (paths.model, paths.scaler, paths.encoder))
+
+
+def onnx_model_is_fresh(paths=None):
+    """True if model.onnx exists and is newer than its sources."""
+    paths = paths or ArtifactPaths.default()
+    return _is_fresh(paths.onnx, paths.sources)
+
+
+def export_shared_weights(keras_model=None, paths=None):
+    """
+    Export the model, scaler and label encoder to the shared weights file.
+
+    Needs TensorFlow and joblib, but only once per model version. After that,
+    workers map the file without importing either.
+    """
+    import joblib
+
+    paths = paths or ArtifactPaths.default()
+    if keras_model is None:
+        from tensorflow.keras.models import load_model # type: ignore
+        keras_model = load_model(paths.model, compile=False)
+    mlp = keras_model if isinstance(keras_model, NumpyMLP) else NumpyMLP.from_keras(keras_model)
+    save_shared_weights(paths.shared_weights, mlp, joblib.load(paths.scaler), joblib.load(paths.encoder))
+    return paths.shared_weights
+
+
+def _load_from_keras(paths, as_numpy):
+    """Load model.keras with TensorFlow plus the joblib scaler and encoder."""
+    if not os.path.exists(paths.model):
+        print(f"❌ Model not found at {paths.model}")
         # Attempt to download missing files
-        
-        os.makedirs(BASE_DIR, exist_ok=True)
-        for filename, url in FILES_TO_DOWNLOAD.items():
-            file_path = os.path.join(BASE_DIR, filename)
-            if not os.path.exists(file_path):
-                print(f"⬇️ Downloading {filename} from {url}...")
-                response = requests.get(url, stream=True)
-                response.raise_for_status()
-                with open(file_path, "wb") as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        f.write(chunk)
-                print(f"✅ Downloaded {filename} to {file_path}")
-            else:
-                print(f"ℹ️ {filename} already exists, skipping download.")
+        download_missing_files()
+
+    import joblib
+    import tensorflow as tf
+    from tensorflow.keras.models import load_model # type: ignore
+
+    tf.config.threading.set_intra_op_parallelism_threads(getattr(settings, "ML_TF_INTRA_OP_THREADS", 1))
+    tf.config.threading.set_inter_op_parallelism_threads(getattr(settings, "ML_TF_INTER_OP_THREADS", 1))
+    loaded_model = load_model(paths.model, compile=False)
+    if as_numpy:
+        # Pull the weights out once; predictions no longer go through Keras
+        loaded_model = NumpyMLP.from_keras(loaded_model)
+    loaded_scaler = joblib.load(paths.scaler)
+    loaded_encoder = joblib.load(paths.encoder)
+
+    if as_numpy and use_shared_weights():
+        # Export once so the next workers can skip TensorFlow entirely
+        try:
+            save_shared_weights(paths.shared_weights, loaded_model, loaded_scaler, loaded_encoder)
+            print(f"✅ Exported shared weights to {paths.shared_weights}")
+        except OSError as e:
+            print(f"⚠️ Could not export shared weights: {e}")
+
+    return loaded_model, loaded_scaler, loaded_encoder
+
+
+def export_onnx_model(paths=None):
+    """
+    Export the model, scaler, label encoder and preprocessing medians to model.onnx.
+
+    Reads the shared weights file when it is current, so TensorFlow is only
+    needed when there is no export yet. Needs the `onnx` package.
+    """
+    paths = paths or ArtifactPaths.default()
+    if shared_weights_are_fresh(paths):
+        mlp, loaded_scaler, loaded_encoder = load_shared_weights(paths.shared_weights)
+    else:
+        import joblib
+        from tensorflow.keras.models import load_model # type: ignore
+
+        if not os.path.exists(paths.model):
+            download_missing_files()
+        mlp = NumpyMLP.from_keras(load_model(paths.model, compile=False))
+        loaded_scaler, loaded_encoder = joblib.load(paths.scaler), joblib.load(paths.encoder)
+    preprocessor = _load_preprocessor(mlp, loaded_scaler, paths)
+    save_onnx_model(paths.onnx, mlp, loaded_scaler, loaded_encoder, preprocessor)
+    return paths.onnx
+
+
+@inference_backend("numpy")
+def _load_numpy(paths):
+    """Folded weights run with NumPy, memory-mapped when the shared file is current."""
+    if use_shared_weights() and shared_weights_are_fresh(paths):
+        # Memory-mapped, no TensorFlow or joblib involved
+        return load_shared_weights(paths.shared_weights)
+    return _load_from_keras(paths, as_numpy=True)
+
+
+@inference_backend("keras")
+def _load_keras(paths):
+    """model.predict through TensorFlow."""
+    return _load_from_keras(paths, as_numpy=False)
+
+
+@inference_backend("onnx")
+def _load_onnx(paths):
+    """ONNX Runtime session over model.onnx, exported first if missing or stale."""
+    if not onnx_model_is_fresh(paths):
+        print(f"ℹ️ Exporting {paths.onnx}...")
+        export_onnx_model(paths)
+    return load_onnx_model(paths.onnx, threads=getattr(settings, "ML_ONNX_THREADS", 1))
+
+
+def _load_preprocessor(loaded_model, loaded_scaler, paths):
+    """
+    Load preprocessing.json, else the medians bundled with the model (ONNX),
+    else rebuild them from the scaler for models trained before NN.py wrote
+    the file.
+    """
+    if os.path.exists(paths.preprocessing):
+        return Preprocessor.load(paths.preprocessing)
+    if getattr(loaded_model, "preprocessor", None) is not None:
+        return loaded_model.preprocessor
+    print(f"ℹ️ {os.path.basename(paths.preprocessing)} not found, using the scaler's medians.")
+    return Preprocessor.from_scaler(loaded_scaler)
+
+
+def file_version(paths=None):
+    """
+    Short hash identifying model files that aren't in the registry.
+
+    Built from the size and modification time of the trained artifacts
+    (model.keras, the scaler, the label encoder and the preprocessing medians),
+    so replacing any of them changes the version. The shared weights and ONNX
+    exports are derived from those and written by whichever worker loads the
+    model first, so they would give workers different versions of the same
+    model; they only count when none of the trained artifacts is present.
+    """
+    paths = paths or ArtifactPaths.default()
+    files = paths.sources
+    if not any(os.path.exists(path) for path in files):
+        files = paths.all()
+    digest = hashlib.sha256()
+    for path in files:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        digest.update(f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns};".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def _resolve_version():
+    """
+    (version, ArtifactPaths) to load: the registry's promoted version, after
+    checking its checksums, or the files in the api folder.
+    """
+    registry = get_registry()
+    version = registry.current_version() if registry is not None else None
+    if version is None:
+        paths = ArtifactPaths.default()
+        return file_version(paths), paths
+    registry.verify(version)
+    return version, ArtifactPaths.in_directory(registry.version_dir(version))
+
+
+def load_version(version, paths):
+    """Load one model version with the configured backend."""
+    loader = INFERENCE_BACKENDS[get_inference_backend(paths)]
+    loaded_model, loaded_scaler, loaded_encoder = loader(paths)
+    loaded_preprocessor = _load_preprocessor(loaded_model, loaded_scaler, paths)
+    return LoadedModel(loaded_model, loaded_scaler, loaded_encoder, loaded_preprocessor, version)
+
+
+def load_resources():
+    """
+    Load ML assets if not already loaded. Once loaded, check (at most every
+    ML_MODEL_RELOAD_INTERVAL seconds) whether another registry version has
+    been promoted, and swap to it in the background.
+    """
+    global active, load_status, load_error
+    if active is not None:
+        _check_for_promotion()
+        return
+
+    # Only one thread loads; concurrent callers wait for it to finish
+    with _load_lock:
+        if active is not None:
+            return
+
+        load_status = "loading"
+        print("🔄 Attempting to load model, scaler, and label encoder...")
+        try:
+            loaded = load_version(*_resolve_version())
+        except Exception as e:
+            print(f"❌ Failed to load ML resources: {e}")
+            load_status, load_error = "failed", str(e)
+            return
+
+        active = loaded
+        load_status, load_error = "ready", None
+        print(f"✅ Model version {loaded.version} and preprocessors loaded successfully.")
+
+
+def _check_for_promotion():
+    """Start a background swap if the registry's CURRENT no longer matches the active version."""
+    global _swap_thread, _swap_checked_at
+    now = time.monotonic()
+    if now - _swap_checked_at < getattr(settings, "ML_MODEL_RELOAD_INTERVAL", 2.0):
+        return
+    _swap_checked_at = now
+
+    registry = get_registry()
+    version = registry.current_version() if registry is not None else None
+    if version is None or version == active.version or version == _failed_version:
+        return
+    with _load_lock:
+        if _swap_thread is not None and _swap_thread.is_alive():
+            return
+        _swap_thread = threading.Thread(target=swap_to, args=(version,), name="ml-swap", daemon=True)
+        _swap_thread.start()
+
 
+def swap_to(version):
+    """
+    Load a registry version next to the active one, then make it active.
+
+    Until the new version is fully loaded, requests keep using the old one.
+    A version that fails to load is not retried until another is promoted.
+    """
+    global active, _failed_version
+    registry = get_registry()
+    print(f"🔄 Loading promoted model version {version}...")
     try:
-        tf.config.threading.set_intra_op_parallelism_threads(1)
-        tf.config.threading.set_inter_op_parallelism_threads(1)
-        model = load_model(MODEL_PATH, compile=False)
-        scaler = joblib.load(SCALER_PATH)
-        label_encoder = joblib.load(ENCODER_PATH)
-        print("✅ Model and preprocessors loaded successfully.")
+        registry.verify(version)
+        loaded = load_version(version, ArtifactPaths.in_directory(registry.version_dir(version)))
     except Exception as e:
-        print(f"❌ Failed to load ML resources: {e}")
-        model = scaler = label_encoder = None
+        print(f"❌ Failed to load model version {version}, keeping {active.version if active else None}: {e}")
+        _failed_version = version
+        return None
+    active = loaded
+    _failed_version = None
+    print(f"✅ Switched to model version {version}")
+    return loaded
+
+
+def warm_up_in_background():
+    """
+    Start loading the ML assets in a daemon thread.
+
+    Called at startup so the first /api/predict/ request doesn't pay for the
+    TensorFlow import, model load or file download. Safe to call repeatedly.
+    """
+    global _warmup_thread
+    if is_ready() or (_warmup_thread is not None and _warmup_thread.is_alive()):
+        return _warmup_thread
+    _warmup_thread = threading.Thread(target=load_resources, name="ml-warmup", daemon=True)
+    _warmup_thread.start()
+    return _warmup_thread
+
+def get_batcher():
+    """
+    Return the process-wide MicroBatcher, or None when micro-batching is off.
+    """
+    global _batcher
+    if not getattr(settings, "ML_MICROBATCH_ENABLED", False):
+        return None
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = MicroBatcher(
+                    _predict_matrix,
+                    max_wait_ms=getattr(settings, "ML_MICROBATCH_MAX_WAIT_MS", 2.0),
+                    max_batch_size=getattr(settings, "ML_MICROBATCH_MAX_ROWS", 64),
+                )
+    return _batcher
+
+
+def get_model_version():
+    """The active model version, or the one that would be loaded next."""
+    loaded = active
+    if loaded is not None:
+        return loaded.version
+    registry = get_registry()
+    return (registry.current_version() if registry is not None else None) or file_version()
+
+
+def get_prediction_cache():
+    """
+    Return the process-wide PredictionCache, or None when caching is off.
+    """
+    global _prediction_cache
+    config = getattr(settings, "ML_PREDICTION_CACHE", {})
+    if config.get("BACKEND", "local") in (None, "", "none"):
+        return None
+    if _prediction_cache is None:
+        with _prediction_cache_lock:
+            if _prediction_cache is None:
+                _prediction_cache = build_prediction_cache(config)
+    return _prediction_cache
+
+
+def get_metrics():
+    """Inference counters for the metrics endpoint."""
+    batcher = get_batcher()
+    cache = get_prediction_cache()
+    return {
+        "model_version": get_model_version(),
+        "microbatch": dict(enabled=True, **batcher.stats()) if batcher else {"enabled": False},
+        "prediction_cache": dict(enabled=True, **cache.stats()) if cache else {"enabled": False},
+    }
+
 
 # ---------------- Classification Function ----------------
-def classify(data: dict):
+# Input fields required for classification (request/form names)
+CLASSIFICATION_FIELDS = [
+    "orbital_period", "duration", "transit_depth", "radius",
+    "star_temp", "star_radius", "model_snr"
+]
+
+# Same column order as training
+FEATURE_COLUMNS = MODEL_FEATURES
+
+# Maximum number of rows sent through the model in one forward pass
+BATCH_CHUNK_SIZE = 1024
+
+
+def max_imputed_fields():
+    """How many classification fields a row may leave out (filled with training medians)."""
+    return getattr(settings, "ML_MAX_IMPUTED_FIELDS", 1)
+
+
+def _extract_features(data: dict):
+    """
+    Convert one input dict into a raw feature row (features.RAW_FEATURES order).
+
+    Missing fields become NaN, up to max_imputed_fields() per row.
+    _predict_matrix masks and imputes them with the training medians, then
+    applies the training transforms, on whole matrices.
+
+    Raises:
+        ValueError: if a field is not numeric, or too many are missing.
+    """
+    row = []
+    for field in CLASSIFICATION_FIELDS:
+        value = data.get(field)
+        if value is None:
+            row.append(np.nan)
+            continue
+        try:
+            # Convert all fields to float safely
+            row.append(float(value))
+        except (TypeError, ValueError):
+            raise ValueError("Invalid or missing numeric input field(s).")
+
+    missing = sum(1 for value in row if not np.isfinite(value))
+    if missing > max_imputed_fields():
+        raise ValueError("Missing one or more fields required for classification.")
+    return row
+
+
+def _predict_matrix(features, loaded=None):
+    """Run one forward pass over a raw feature matrix with `loaded` (default: the active model)."""
+    return (loaded or active).predict_matrix(features)
+
+
+def _loaded_model():
+    """Load if needed and return the active LoadedModel."""
+    load_resources()
+    loaded = active
+    if loaded is None:
+        raise RuntimeError("Model or scaler not loaded properly.")
+    return loaded
+
+
+def classify(data: dict, return_version=False):
     """
     Classify a planet candidate using the trained deep learning model.
 
@@ -70,54 +608,106 @@ def classify(data: dict):
             - star_temp
             - star_radius
             - model_snr
+        return_version (bool): Also return the version of the model that
+            produced the result.
 
     Returns:
-        tuple: (classification_label: str, confidence_score: float)
+        tuple: (classification_label: str, confidence_score: float), plus
+            the model version when `return_version` is set
     """
 
-    load_resources()
+    loaded = _loaded_model()
 
+    features = _extract_features(data)
 
-    if model is None or scaler is None or label_encoder is None:
-        raise RuntimeError("Model or scaler not loaded properly.")
+    def result_with_version(result):
+        return result + (loaded.version,) if return_version else result
 
-    # --- Step 1: Extract and clean fields ---
-    try:
-        # Convert all fields to float safely
-        period = float(data.get("orbital_period"))
-        duration = float(data.get("duration"))
-        transit_depth = float(data.get("transit_depth"))
-        planet_radius = float(data.get("radius"))
-        star_temp = float(data.get("star_temp"))
-        star_radius = float(data.get("star_radius"))
-        model_snr = float(data.get("model_snr"))
-    except (TypeError, ValueError):
-        raise ValueError("Invalid or missing numeric input field(s).")
-
-    # --- Step 2: Apply same preprocessing as training ---
-    transit_depth_log = np.log1p(transit_depth)
-    planet_radius_log = np.log1p(planet_radius)
-
-    # Same column order as training
-    columns = [
-        "period", "duration", "star_temp", "star_radius",
-        "model_snr", "transit_depth_log", "planet_radius_log"
-    ]
-
-    # Build a DataFrame for consistency with scaler
-    input_df = pd.DataFrame([[
-        period, duration, star_temp, star_radius,
-        model_snr, transit_depth_log, planet_radius_log
-    ]], columns=columns)
-
-    # Scale features
-    scaled_input = scaler.transform(input_df)
-
-    # --- Step 3: Predict ---
-    pred_proba = model.predict(scaled_input)[0]  # Shape: (num_classes,)
-    pred_index = int(np.argmax(pred_proba))
-    confidence = float(np.max(pred_proba))
-    pred_label = label_encoder.inverse_transform([pred_index])[0]
-
-    # --- Step 4: Return readable output ---
-    return pred_label, round(confidence, 4)
+    cache = get_prediction_cache()
+    if cache is not None:
+        key = cache.make_key(features, loaded.version)
+        cached = cache.get_many([key])
+        if key in cached:
+            return result_with_version(tuple(cached[key]))
+
+    batcher = get_batcher()
+    if batcher is not None:
+        # Share one forward pass with other requests arriving at the same time
+        # (only with rows for the same model version)
+        pred_label, confidence = batcher.submit(features, loaded).result()
+    else:
+        labels, confidences = loaded.predict_matrix([features])
+        pred_label, confidence = labels[0], confidences[0]
+
+    # --- Return readable output ---
+    result = (str(pred_label), round(float(confidence), 4))
+    if cache is not None:
+        cache.set_many({key: result})
+    return result_with_version(result)
+
+
+def classify_batch(rows, chunk_size=BATCH_CHUNK_SIZE):
+    """
+    Classify many planet candidates with one forward pass per chunk.
+
+    Args:
+        rows (list[dict]): Input dicts with the same fields as `classify`.
+        chunk_size (int): Maximum number of rows per forward pass.
+
+    Returns:
+        list[dict]: One entry per input row, in order. Successful rows have
+            "classification", "confidence" and "model_version"; invalid rows
+            have "error". The whole batch uses one model version.
+    """
+
+    loaded = _loaded_model()
+
+    results = [None] * len(rows)
+
+    def prediction(label, confidence):
+        return {"classification": label, "confidence": confidence, "model_version": loaded.version}
+
+    # --- Validate every row, keeping track of which ones can be classified ---
+    valid_indices = []
+    features = []
+    for index, row in enumerate(rows):
+        try:
+            features.append(_extract_features(row))
+        except ValueError as e:
+            results[index] = {"error": str(e)}
+            continue
+        valid_indices.append(index)
+
+    # --- Serve repeated candidates from the prediction cache ---
+    cache = get_prediction_cache()
+    if cache is not None and features:
+        keys = [cache.make_key(row, loaded.version) for row in features]
+        cached = cache.get_many(keys)
+        missing = []
+        for index, key, row in zip(valid_indices, keys, features):
+            if key in cached:
+                results[index] = prediction(*cached[key])
+            else:
+                missing.append((index, key, row))
+        valid_indices = [index for index, _, _ in missing]
+        keys = [key for _, key, _ in missing]
+        features = [row for _, _, row in missing]
+
+    if not features:
+        return results
+
+    # --- Scale and predict the valid rows as one matrix, chunk by chunk ---
+    matrix = np.asarray(features, dtype=np.float64)
+    new_entries = {}
+    for start in range(0, len(matrix), chunk_size):
+        labels, confidences = loaded.predict_matrix(matrix[start:start + chunk_size])
+        for offset, (label, confidence) in enumerate(zip(labels, confidences)):
+            result = (str(label), round(float(confidence), 4))
+            results[valid_indices[start + offset]] = prediction(*result)
+            if cache is not None:
+                new_entries[keys[start + offset]] = result
+
+    if cache is not None:
+        cache.set_many(new_entries)
+
+    return results
@@ -1,6 +1,75 @@
+import os
+import sys
+
 from django.apps import AppConfig
 
 
+# Executables that serve requests through site_settings.wsgi/asgi
+SERVER_EXECUTABLES = {"gunicorn", "uwsgi", "daphne", "uvicorn", "hypercorn", "waitress-serve"}
+# Of those, the ones that may import the app in a master process and fork
+# workers from it (gunicorn --preload, uWSGI without lazy-apps). Threads don't
+# survive a fork, so they are started in each worker instead, see ApiConfig.ready.
+FORKING_SERVER_EXECUTABLES = {"gunicorn", "uwsgi"}
+
+# Process that started the background threads (they are per process)
+_started_in_pid = None
+
+
+def _executable():
+    return os.path.basename(sys.argv[0]) if sys.argv else ""
+
+
+def _is_server_process():
+    """
+    True when this process will serve requests (a WSGI/ASGI server or runserver).
+
+    manage.py commands (migrate, load_data, shell, test, ...) and ad-hoc
+    scripts should not pay for loading TensorFlow in the background.
+    """
+    executable = _executable()
+    if executable in SERVER_EXECUTABLES:
+        return True
+    if executable != "manage.py" or sys.argv[1:2] != ["runserver"]:
+        return False
+    # With the autoreloader, only the child process (RUN_MAIN) serves requests
+    return os.environ.get("RUN_MAIN") == "true" or "--noreload" in sys.argv
+
+
+def start_background_threads(**kwargs):
+    """
+    Start the model warm-up and the in-process prediction job workers, once
+    per process. Also a request_started receiver, hence **kwargs.
+    """
+    global _started_in_pid
+    if _started_in_pid == os.getpid():
+        return
+    _started_in_pid = os.getpid()
+
+    from django.conf import settings
+
+    if getattr(settings, "ML_WARMUP_ON_STARTUP", True):
+        from . import ai_model
+        ai_model.warm_up_in_background()
+
+    if settings.ML_PREDICTION_JOBS.get("IN_PROCESS", True):
+        # Resume jobs interrupted by a restart or crash
+        from . import jobs
+        jobs.start_workers()
+
+
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from django.core.signals import request_started
+        from . import spatial, tiles  # noqa: F401 - connect the star index and tile signals
+
+        if not _is_server_process():
+            return
+        if _executable() in FORKING_SERVER_EXECUTABLES:
+            # This may be the master, about to fork: start in the worker, from
+            # gunicorn's post_worker_init hook (gunicorn.conf.py) or its first request
+            request_started.connect(start_background_threads, dispatch_uid="api_background_threads")
+        else:
+            start_background_threads()
@@ -0,0 +1,132 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+def _bucket(value):
+    """Power-of-two histogram bucket (upper bound) for a positive count."""
+    bucket = 1
+    while bucket < value:
+        bucket *= 2
+    return bucket
+
+
+class MicroBatcher:
+    """
+    Collects single-row predictions from concurrent requests and runs them
+    through the model as one matrix.
+
+    A background thread takes the first pending row, then keeps collecting
+    until `max_batch_size` rows are queued or `max_wait_ms` has passed,
+    whichever comes first. Each caller gets a Future for its own row.
+    """
+
+    def __init__(self, predict_fn, max_wait_ms=2.0, max_batch_size=64):
+        """
+        Args:
+            predict_fn: Callable taking a (rows, features) matrix and returning
+                (labels, confidences) arrays, one entry per row. Rows submitted
+                with a `context` are passed it as a second argument.
+            max_wait_ms (float): Longest time to hold a row waiting for more.
+            max_batch_size (int): Most rows per forward pass.
+        """
+        self.predict_fn = predict_fn
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_batch_size = max_batch_size
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._rows = 0
+        self._max_queue_depth = 0
+        self._batch_size_histogram = {}
+        self._queue_depth_histogram = {}
+
+    def submit(self, features, context=None):
+        """
+        Queue one feature row; the Future resolves to (label, confidence).
+
+        Rows are only batched with rows submitted with the same `context`
+        (e.g. the model version they must run on).
+        """
+        self._ensure_started()
+        future = Future()
+        self._queue.put((features, future, context))
+        return future
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="ml-microbatch", daemon=True)
+                self._thread.start()
+
+    def _collect(self):
+        """Block for the first row, then gather more until the batch is full or the window closes."""
+        batch = [self._queue.get()]
+        queue_depth = self._queue.qsize() + 1
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch, queue_depth
+
+    def _run(self):
+        while True:
+            batch, queue_depth = self._collect()
+            self._record(len(batch), queue_depth)
+
+            groups = {}
+            for features, future, context in batch:
+                groups.setdefault(id(context), (context, [], []))
+                groups[id(context)][1].append(features)
+                groups[id(context)][2].append(future)
+
+            for context, rows, futures in groups.values():
+                args = (np.asarray(rows),) if context is None else (np.asarray(rows), context)
+                try:
+                    labels, confidences = self.predict_fn(*args)
+                except Exception as e:
+                    for future in futures:
+                        future.set_exception(e)
+                    continue
+
+                for future, label, confidence in zip(futures, labels, confidences):
+                    future.set_result((label, confidence))
+
+    def _record(self, batch_size, queue_depth):
+        with self._stats_lock:
+            self._batches += 1
+            self._rows += batch_size
+            self._max_queue_depth = max(self._max_queue_depth, queue_depth)
+            size_bucket = _bucket(batch_size)
+            self._batch_size_histogram[size_bucket] = self._batch_size_histogram.get(size_bucket, 0) + 1
+            depth_bucket = _bucket(queue_depth)
+            self._queue_depth_histogram[depth_bucket] = self._queue_depth_histogram.get(depth_bucket, 0) + 1
+
+    def stats(self):
+        """Queue depth and batch-size counters. Histogram keys are bucket upper bounds."""
+        with self._stats_lock:
+            return {
+                "max_wait_ms": self.max_wait * 1000.0,
+                "max_batch_size": self.max_batch_size,
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self._max_queue_depth,
+                "batches": self._batches,
+                "rows": self._rows,
+                "mean_batch_size": round(self._rows / self._batches, 2) if self._batches else 0.0,
+                "batch_size_histogram": {str(k): v for k, v in sorted(self._batch_size_histogram.items())},
+                "queue_depth_histogram": {str(k): v for k, v in sorted(self._queue_depth_histogram.items())},
+            }
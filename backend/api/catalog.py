@@ -0,0 +1,443 @@
+import io
+import time
+
+import pandas as pd
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Planet, Star
+
+# CSV columns (as written by network/visual_preprocessing.py) and the model
+# fields a reload refreshes. Planet classification/confidence are left alone.
+STAR_FIELDS = ["ra", "dec", "sy_dist", "star_temp", "star_radius"]
+PLANET_FIELDS = ["orbital_period", "radius", "ra", "dec", "duration", "transit_depth", "model_snr"]
+STAR_COLUMNS = ["name"] + STAR_FIELDS
+PLANET_COLUMNS = ["name", "star_name"] + PLANET_FIELDS
+TEXT_COLUMNS = ("name", "star_name", "content_hash")
+
+# Bind parameters per statement on backends that don't declare a limit (Postgres's)
+MAX_QUERY_PARAMS = 65535
+
+
+class LoadStats:
+    """Row counts and timing for one catalog file."""
+
+    def __init__(self):
+        self.rows = 0
+        self.upserted = 0
+        self.kept_user_inputted = 0
+        self.missing_star = 0
+        # Sync only
+        self.inserted = 0
+        self.updated = 0
+        self.deleted = 0
+        self.unchanged = 0
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.started
+        return self
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+
+COLUMNAR_EXTENSIONS = (".parquet", ".arrow", ".feather")
+
+
+def _columnar_chunks(path, columns, chunk_size):
+    """
+    Read the wanted columns of a Parquet or Arrow IPC file (as written by
+    network/storage.py) in `chunk_size` row slices. Arrow files are
+    memory-mapped.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.ipc as ipc
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet/Arrow catalog files need pyarrow: pip install pyarrow")
+
+    if path.lower().endswith(".parquet"):
+        parquet_file = pq.ParquetFile(path, memory_map=True)
+        present = [column for column in columns if column in parquet_file.schema_arrow.names]
+        for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=present):
+            yield batch.to_pandas()
+        return
+
+    with pa.memory_map(path, "r") as source:
+        table = ipc.open_file(source).read_all()
+        table = table.select([column for column in columns if column in table.column_names])
+        for offset in range(0, table.num_rows, chunk_size):
+            yield table.slice(offset, chunk_size).to_pandas()
+
+
+def read_chunks(path, columns, chunk_size):
+    """
+    Yield DataFrames of at most `chunk_size` rows with exactly `columns`.
+
+    CSV, Parquet and Arrow IPC (.arrow/.feather) files are accepted. Only the
+    needed columns are parsed (numeric ones as float64), columns missing from
+    the file come back as all-NaN, rows without a name are dropped, and a name
+    repeated within a chunk keeps its last row.
+    """
+    dtypes = {column: (str if column in TEXT_COLUMNS else "float64") for column in columns}
+    numeric = [column for column in columns if column not in TEXT_COLUMNS]
+    if path.lower().endswith(COLUMNAR_EXTENSIONS):
+        reader = _columnar_chunks(path, columns, chunk_size)
+    else:
+        # round_trip parsing keeps floats bit-exact, so re-exported CSVs hash the same
+        reader = pd.read_csv(
+            path, usecols=lambda column: column in dtypes, dtype=dtypes, chunksize=chunk_size,
+            float_precision="round_trip",
+        )
+    for chunk in reader:
+        chunk = chunk.reindex(columns=columns)
+        chunk[numeric] = chunk[numeric].astype("float64")
+        chunk = chunk.dropna(subset=[column for column in columns if column in TEXT_COLUMNS])
+        yield chunk.drop_duplicates(subset="name", keep="last")
+
+
+def column_values(frame, column):
+    """Column as a Python list with NaN turned into None (stored as NULL)."""
+    values = frame[column]
+    return values.astype(object).where(values.notna(), None).tolist()
+
+
+def content_hashes(frame, columns):
+    """
+    Per-row hash of `columns` as 16 hex digits, stored in content_hash so a
+    sync can tell which rows changed. Should pandas ever change its hashing,
+    the next sync simply rewrites every row once.
+    """
+    hashes = pd.util.hash_pandas_object(frame[columns], index=False)
+    return [f"{value:016x}" for value in hashes.tolist()]
+
+
+def batches(frame, batch_size):
+    for start in range(0, len(frame), batch_size):
+        yield frame.iloc[start:start + batch_size]
+
+
+def _upsert_catalog_rows(model, fields, rows, update_fields, defaults=None):
+    """
+    Upsert `rows` (tuples of `fields` values) by name with
+    INSERT ... ON CONFLICT (name) DO UPDATE ... WHERE NOT user_inputted, like
+    the COPY path: a user-inputted row is never overwritten, even one inserted
+    after the batch was read. `defaults` are extra field values for every row
+    that only apply to inserts. Rows are split into as many statements as the
+    backend's parameter limit requires.
+
+    Returns:
+        int: rows inserted or updated (user-inputted conflicts are skipped).
+    """
+    if not rows:
+        return 0
+    defaults = {"user_inputted": False, **(defaults or {})}
+    fields = [model._meta.get_field(name) for name in list(fields) + list(defaults)]
+    table = connection.ops.quote_name(model._meta.db_table)
+    columns = ", ".join(connection.ops.quote_name(field.column) for field in fields)
+    updates = ", ".join(
+        f"{column} = EXCLUDED.{column}"
+        for column in (connection.ops.quote_name(model._meta.get_field(name).column) for name in update_fields)
+    )
+    placeholders = "(" + ", ".join(["%s"] * len(fields)) + ")"
+    max_params = connection.features.max_query_params or MAX_QUERY_PARAMS
+    per_statement = max(1, min(connection.ops.bulk_batch_size(fields, rows), max_params // len(fields)))
+
+    upserted = 0
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), per_statement):
+            statement_rows = rows[start:start + per_statement]
+            params = [
+                field.get_db_prep_save(value, connection)
+                for row in statement_rows
+                for field, value in zip(fields, (*row, *defaults.values()))
+            ]
+            cursor.execute(
+                f"INSERT INTO {table} ({columns}) VALUES {', '.join([placeholders] * len(statement_rows))} "
+                f"ON CONFLICT (name) DO UPDATE SET {updates} WHERE NOT {table}.user_inputted",
+                params,
+            )
+            upserted += cursor.rowcount
+    return upserted
+
+
+def _planet_insert_defaults():
+    """Values of the Planet fields a catalog row doesn't have, for new planets."""
+    return {"classification": "", "model_version": "", "created_at": timezone.now()}
+
+
+def upsert_stars(frame, stats, batch_size=1000):
+    """Insert new stars and update catalog ones by name; user-inputted stars are not touched."""
+    fields = STAR_COLUMNS + ["content_hash"]
+    for batch in batches(frame, batch_size):
+        rows = [
+            (*values, content_hash)
+            for values, content_hash in zip(
+                zip(*(column_values(batch, column) for column in STAR_COLUMNS)),
+                content_hashes(batch, STAR_COLUMNS),
+            )
+        ]
+        with transaction.atomic():
+            upserted = _upsert_catalog_rows(Star, fields, rows, update_fields=fields[1:])
+        stats.rows += len(batch)
+        stats.upserted += upserted
+        stats.kept_user_inputted += len(batch) - upserted
+
+
+def upsert_planets(frame, stats, batch_size=1000):
+    """Same as upsert_stars for planets; rows whose star isn't in the database are skipped."""
+    fields = ["name", "star"] + PLANET_FIELDS + ["content_hash"]
+    for batch in batches(frame, batch_size):
+        with transaction.atomic():
+            star_ids = dict(
+                Star.objects.filter(name__in=set(batch["star_name"])).values_list("name", "id")
+            )
+            rows = [
+                (name, star_ids[star_name], *values, content_hash)
+                for (name, star_name, *values), content_hash in zip(
+                    zip(*(column_values(batch, column) for column in PLANET_COLUMNS)),
+                    content_hashes(batch, PLANET_COLUMNS),
+                )
+                if star_name in star_ids
+            ]
+            upserted = _upsert_catalog_rows(
+                Planet, fields, rows, update_fields=fields[1:],
+                defaults=_planet_insert_defaults(),
+            )
+        stats.rows += len(batch)
+        stats.upserted += upserted
+        stats.missing_star += len(batch) - len(rows)
+        stats.kept_user_inputted += len(rows) - upserted
+
+
+def copy_supported():
+    return connection.vendor == "postgresql"
+
+
+def _quoted(columns, prefix=""):
+    return ", ".join(prefix + connection.ops.quote_name(column) for column in columns)
+
+
+def _copy_into_staging(cursor, staging, frame, columns):
+    """COPY a chunk into a temp table that is dropped at commit (or replaced by the next chunk)."""
+    definitions = ", ".join(
+        f"{connection.ops.quote_name(column)} {'text' if column in TEXT_COLUMNS else 'double precision'}"
+        for column in columns
+    )
+    # The DROP matters when the load runs inside an outer transaction
+    cursor.execute(f"DROP TABLE IF EXISTS {staging}")
+    cursor.execute(f"CREATE TEMP TABLE {staging} ({definitions}) ON COMMIT DROP")
+    buffer = io.StringIO()
+    # Empty unquoted fields are NULL in COPY's CSV format
+    frame[columns].to_csv(buffer, header=False, index=False)
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {staging} ({_quoted(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+
+def copy_upsert_stars(frame, stats):
+    """
+    Postgres only: COPY the chunk into a staging table, then upsert it with a
+    single INSERT ... ON CONFLICT. Same semantics as upsert_stars.
+    """
+    table = connection.ops.quote_name(Star._meta.db_table)
+    staged_columns = STAR_COLUMNS + ["content_hash"]
+    columns = _quoted(staged_columns)
+    updates = ", ".join(
+        f"{field} = EXCLUDED.{field}" for field in map(connection.ops.quote_name, staged_columns[1:])
+    )
+    frame = frame.assign(content_hash=content_hashes(frame, STAR_COLUMNS))
+    with transaction.atomic(), connection.cursor() as cursor:
+        _copy_into_staging(cursor, "staging_stars", frame, staged_columns)
+        cursor.execute(
+            f"INSERT INTO {table} ({columns}, user_inputted) "
+            f"SELECT {columns}, false FROM staging_stars "
+            f"ON CONFLICT (name) DO UPDATE SET {updates} WHERE NOT {table}.user_inputted"
+        )
+        upserted = cursor.rowcount
+    stats.rows += len(frame)
+    stats.upserted += upserted
+    stats.kept_user_inputted += len(frame) - upserted
+
+
+def copy_upsert_planets(frame, stats):
+    """Postgres COPY variant of upsert_planets."""
+    planets = connection.ops.quote_name(Planet._meta.db_table)
+    stars = connection.ops.quote_name(Star._meta.db_table)
+    copied_fields = PLANET_FIELDS + ["content_hash"]
+    fields = _quoted(copied_fields)
+    staged_fields = _quoted(copied_fields, prefix="p.")
+    updates = ", ".join(
+        f"{field} = EXCLUDED.{field}" for field in map(connection.ops.quote_name, ["star_id"] + copied_fields)
+    )
+    frame = frame.assign(content_hash=content_hashes(frame, PLANET_COLUMNS))
+    with transaction.atomic(), connection.cursor() as cursor:
+        _copy_into_staging(cursor, "staging_planets", frame, PLANET_COLUMNS + ["content_hash"])
+        cursor.execute(f"SELECT count(*) FROM staging_planets p JOIN {stars} s ON s.name = p.star_name")
+        with_star = cursor.fetchone()[0]
+        cursor.execute(
+            f"INSERT INTO {planets} (name, star_id, {fields}, user_inputted, classification, model_version, created_at) "
+            f"SELECT p.name, s.id, {staged_fields}, false, '', '', %s "
+            f"FROM staging_planets p JOIN {stars} s ON s.name = p.star_name "
+            f"ON CONFLICT (name) DO UPDATE SET {updates} WHERE NOT {planets}.user_inputted",
+            [timezone.now()],
+        )
+        upserted = cursor.rowcount
+    stats.rows += len(frame)
+    stats.upserted += upserted
+    stats.missing_star += len(frame) - with_star
+    stats.kept_user_inputted += with_star - upserted
+
+
+def load_stars(path, chunk_size=5000, batch_size=1000, use_copy=False):
+    stats = LoadStats()
+    for chunk in read_chunks(path, STAR_COLUMNS, chunk_size):
+        if use_copy:
+            copy_upsert_stars(chunk, stats)
+        else:
+            upsert_stars(chunk, stats, batch_size)
+    return stats.finish()
+
+
+def load_planets(path, chunk_size=5000, batch_size=1000, use_copy=False):
+    stats = LoadStats()
+    for chunk in read_chunks(path, PLANET_COLUMNS, chunk_size):
+        if use_copy:
+            copy_upsert_planets(chunk, stats)
+        else:
+            upsert_planets(chunk, stats, batch_size)
+    return stats.finish()
+
+
+class CatalogSync:
+    """
+    Incremental sync of the catalog tables with a pair of CSVs.
+
+    Each incoming row is hashed and compared with the stored content_hash, so
+    only new and changed rows are written, and catalog rows missing from the
+    CSVs are deleted. User-inputted rows are never touched. Reading the stored
+    (name, id, hash) triples is the only per-catalog cost; writes scale with
+    the size of the change.
+    """
+
+    def __init__(self, chunk_size=5000, batch_size=1000):
+        self.chunk_size = chunk_size
+        self.batch_size = batch_size
+        self.star_stats = None
+        self.stale_star_ids = []
+
+    def _existing(self, model):
+        """name -> (id, content_hash, user_inputted) for every row of `model`."""
+        return {
+            name: (pk, content_hash, user_inputted)
+            for name, pk, content_hash, user_inputted in model.objects.values_list(
+                "name", "id", "content_hash", "user_inputted"
+            )
+        }
+
+    def _changes(self, batch, columns, existing, seen, stats):
+        """Rows of `batch` whose hash differs from the stored one, as (id or None, hash, values)."""
+        changes = []
+        for values, content_hash in zip(
+            zip(*(column_values(batch, column) for column in columns)), content_hashes(batch, columns)
+        ):
+            name = values[0]
+            pk, stored_hash, user_inputted = existing.get(name, (None, None, False))
+            seen.add(name)
+            stats.rows += 1
+            if user_inputted:
+                stats.kept_user_inputted += 1
+            elif stored_hash == content_hash:
+                stats.unchanged += 1
+            else:
+                existing[name] = (pk, content_hash, False)
+                changes.append((pk, content_hash, values))
+        return changes
+
+    def _write(self, model, fields, rows, stats, defaults=None):
+        """
+        Write changed rows with _upsert_catalog_rows, so a user-inputted row
+        added since _existing() read the table is still left alone.
+
+        Args:
+            fields (list): Field names of each row, "name" first.
+            rows (list): (id or None, values) per changed row. The id only
+                drives the counts (existing rows are updated, the others
+                inserted), since bulk_update()'s CASE expressions are far slower
+                than ON CONFLICT for large changes.
+        """
+        with transaction.atomic():
+            upserted = _upsert_catalog_rows(
+                model, fields, [values for _, values in rows], update_fields=fields[1:], defaults=defaults,
+            )
+        updated = sum(pk is not None for pk, _ in rows)
+        # Rows the guard skipped collided with user rows saved during the sync
+        skipped = len(rows) - upserted
+        stats.updated += updated
+        stats.inserted += len(rows) - updated - skipped
+        stats.kept_user_inputted += skipped
+
+    def _stale_ids(self, existing, seen):
+        return [
+            pk for name, (pk, _, user_inputted) in existing.items()
+            if name not in seen and not user_inputted and pk is not None
+        ]
+
+    def sync_stars(self, path):
+        """Insert/update stars. Stale stars are only deleted by finish(), after planets are synced."""
+        stats = LoadStats()
+        existing, seen = self._existing(Star), set()
+        fields = STAR_COLUMNS + ["content_hash"]
+        for chunk in read_chunks(path, STAR_COLUMNS, self.chunk_size):
+            for batch in batches(chunk, self.batch_size):
+                stars = [
+                    (pk, (*values, content_hash))
+                    for pk, content_hash, values in self._changes(batch, STAR_COLUMNS, existing, seen, stats)
+                ]
+                self._write(Star, fields, stars, stats)
+        self.stale_star_ids = self._stale_ids(existing, seen)
+        self.star_stats = stats.finish()
+        return stats
+
+    def sync_planets(self, path):
+        stats = LoadStats()
+        existing, seen = self._existing(Planet), set()
+        fields = ["name", "star"] + PLANET_FIELDS + ["content_hash"]
+        for chunk in read_chunks(path, PLANET_COLUMNS, self.chunk_size):
+            for batch in batches(chunk, self.batch_size):
+                changes = self._changes(batch, PLANET_COLUMNS, existing, seen, stats)
+                star_ids = dict(
+                    Star.objects.filter(name__in={values[1] for _, _, values in changes}).values_list("name", "id")
+                )
+                planets = []
+                for pk, content_hash, (name, star_name, *values) in changes:
+                    if star_name not in star_ids:
+                        stats.missing_star += 1
+                        continue
+                    planets.append((pk, (name, star_ids[star_name], *values, content_hash)))
+                self._write(Planet, fields, planets, stats, defaults=_planet_insert_defaults())
+
+        stale = self._stale_ids(existing, seen)
+        for start in range(0, len(stale), self.batch_size):
+            _, deleted = Planet.objects.filter(pk__in=stale[start:start + self.batch_size]).delete()
+            stats.deleted += deleted.get(Planet._meta.label, 0)
+        return stats.finish()
+
+    def finish(self):
+        """
+        Delete stars missing from the CSV. Stars that still have user-inputted
+        planets are kept, since deleting them would cascade to those planets.
+        """
+        started = time.perf_counter()
+        stats = self.star_stats
+        stale = self.stale_star_ids
+        for start in range(0, len(stale), self.batch_size):
+            stars = Star.objects.filter(pk__in=stale[start:start + self.batch_size])
+            _, deleted = stars.exclude(planets__user_inputted=True).delete()
+            stats.deleted += deleted.get(Star._meta.label, 0)
+        stats.elapsed += time.perf_counter() - started
+        return stats
+
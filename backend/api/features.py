@@ -0,0 +1,188 @@
+"""
+Feature and label preparation shared by training (network/NN.py) and serving
+(api/ai_model.py), so both transform inputs the same way.
+
+Only depends on numpy: NN.py imports it without Django, and the serving path
+works on plain matrices.
+"""
+import json
+import os
+import tempfile
+
+import numpy as np
+
+# Raw inputs, in the column order of Full Data.csv's feature columns
+RAW_FEATURES = [
+    "period", "duration", "transit_depth", "planet_radius",
+    "star_temp", "star_radius", "model_snr",
+]
+
+# Values outside these ranges are physically meaningless and treated as missing
+POSITIVE_FEATURES = ["period", "duration", "planet_radius", "star_radius", "model_snr"]
+NON_NEGATIVE_FEATURES = ["transit_depth", "star_temp"]
+
+# log1p-transformed inputs, appended (as <name>_log) after the other features
+LOG_FEATURES = ["transit_depth", "planet_radius"]
+
+# Columns seen by the scaler and the network, in order
+MODEL_FEATURES = [name for name in RAW_FEATURES if name not in LOG_FEATURES] + [
+    f"{name}_log" for name in LOG_FEATURES
+]
+
+FP_FLAGS = ["fp_flag_nt", "fp_flag_ss", "fp_flag_co", "fp_flag_ec"]
+
+_POSITIVE = [RAW_FEATURES.index(name) for name in POSITIVE_FEATURES]
+_NON_NEGATIVE = [RAW_FEATURES.index(name) for name in NON_NEGATIVE_FEATURES]
+_LINEAR = [RAW_FEATURES.index(name) for name in RAW_FEATURES if name not in LOG_FEATURES]
+_LOG = [RAW_FEATURES.index(name) for name in LOG_FEATURES]
+
+
+def derive_labels(disposition, fp_flags):
+    """
+    Training labels: 'confirmed' for disposition 1, 'false_positive' for
+    disposition 0 with any false-positive flag set, else 'candidate'.
+
+    Args:
+        disposition: (rows,) array of 0/1/2 targets.
+        fp_flags: (rows, 4) array of the FP_FLAGS columns; NaN counts as unset.
+    """
+    disposition = np.asarray(disposition)
+    any_fp_flag = np.nansum(np.asarray(fp_flags, dtype=np.float64), axis=1) > 0
+    return np.select(
+        [disposition == 1, (disposition == 0) & any_fp_flag],
+        ["confirmed", "false_positive"],
+        default="candidate",
+    )
+
+
+def mask_invalid(raw, positive=_POSITIVE, non_negative=_NON_NEGATIVE):
+    """
+    Copy of a (rows, RAW_FEATURES) matrix with out-of-range values set to NaN.
+
+    Infinities are out of range everywhere. `positive` / `non_negative` are
+    the column indexes that must be > 0 / >= 0.
+    """
+    raw = np.array(raw, dtype=np.float64, ndmin=2)
+    raw[np.isinf(raw)] = np.nan
+    values = raw[:, positive]
+    raw[:, positive] = np.where(values <= 0, np.nan, values)
+    values = raw[:, non_negative]
+    raw[:, non_negative] = np.where(values < 0, np.nan, values)
+    return raw
+
+
+def column_medians(raw):
+    """Per-column medians of a masked raw matrix, ignoring NaN."""
+    return np.nanmedian(raw, axis=0)
+
+
+def impute(raw, medians):
+    """Replace NaN in a raw matrix with the per-column `medians`."""
+    return np.where(np.isnan(raw), np.asarray(medians, dtype=np.float64), raw)
+
+
+def to_model_features(raw):
+    """(rows, RAW_FEATURES) -> (rows, MODEL_FEATURES): log1p columns moved to the end."""
+    raw = np.asarray(raw, dtype=np.float64)
+    return np.hstack([raw[:, _LINEAR], np.log1p(raw[:, _LOG])])
+
+
+def prepare_training_data(df):
+    """
+    Labels and model features from a Full Data frame.
+
+    Returns:
+        tuple: (features (rows, MODEL_FEATURES) matrix, labels (rows,) array,
+            medians used for imputation, per RAW_FEATURES column)
+    """
+    labels = derive_labels(df["disposition"].to_numpy(), df[FP_FLAGS].to_numpy(dtype=np.float64))
+    raw = mask_invalid(df[RAW_FEATURES].to_numpy(dtype=np.float64))
+    medians = column_medians(raw)
+    return to_model_features(impute(raw, medians)), labels, medians
+
+
+class Preprocessor:
+    """
+    Masking rules and training medians, applied to raw rows at serving time
+    exactly as training did: out-of-range or missing values become the
+    training median of their column.
+
+    Saved by NN.py as preprocessing.json next to scaler.joblib.
+    """
+
+    def __init__(self, medians, positive=POSITIVE_FEATURES, non_negative=NON_NEGATIVE_FEATURES):
+        """
+        Args:
+            medians (dict): RAW_FEATURES name -> training median.
+            positive (list): Features that must be > 0.
+            non_negative (list): Features that must be >= 0.
+        """
+        missing = set(RAW_FEATURES) - set(medians)
+        if missing:
+            raise ValueError(f"No median for: {', '.join(sorted(missing))}")
+        self.medians = np.array([float(medians[name]) for name in RAW_FEATURES])
+        self.positive = list(positive)
+        self.non_negative = list(non_negative)
+        self._positive = [RAW_FEATURES.index(name) for name in self.positive]
+        self._non_negative = [RAW_FEATURES.index(name) for name in self.non_negative]
+
+    @classmethod
+    def fit(cls, raw):
+        """Medians of a raw training matrix after masking."""
+        return cls(dict(zip(RAW_FEATURES, column_medians(mask_invalid(raw)).tolist())))
+
+    @classmethod
+    def from_scaler(cls, scaler):
+        """
+        Recover the training medians from a RobustScaler fitted on the
+        imputed model features: its center_ is their per-column median, and
+        filling gaps with the median doesn't move it. The log1p columns are
+        mapped back with expm1.
+        """
+        center = np.asarray(scaler.center_, dtype=np.float64)
+        names = getattr(scaler, "feature_names_in_", None)
+        if len(center) != len(MODEL_FEATURES) or (names is not None and list(names) != MODEL_FEATURES):
+            raise ValueError("Scaler wasn't fitted on MODEL_FEATURES")
+        medians = {}
+        for name, value in zip(MODEL_FEATURES, center.tolist()):
+            if name.endswith("_log") and name[:-4] in LOG_FEATURES:
+                medians[name[:-4]] = float(np.expm1(value))
+            else:
+                medians[name] = value
+        return cls(medians)
+
+    def transform(self, raw):
+        """Mask out-of-range values, then fill every gap with the training median."""
+        return impute(mask_invalid(raw, self._positive, self._non_negative), self.medians)
+
+    def to_dict(self):
+        return {
+            "raw_features": RAW_FEATURES,
+            "medians": dict(zip(RAW_FEATURES, self.medians.tolist())),
+            "positive": self.positive,
+            "non_negative": self.non_negative,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get("raw_features", RAW_FEATURES) != RAW_FEATURES:
+            raise ValueError("Preprocessing artifact has a different feature list")
+        return cls(data["medians"], data["positive"], data["non_negative"])
+
+    def save(self, path):
+        """Write the JSON artifact atomically."""
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(self.to_dict(), f, indent=2)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
@@ -0,0 +1,213 @@
+"""
+Download model artifacts safely from several processes at once.
+
+    fetch_files({"model.keras": url, ...}, directory)
+
+- Files are downloaded in parallel, each to `<name>.part` and renamed into
+  place only once complete and verified, so a reader never sees a partial file.
+- An interrupted download resumes from the `.part` file with an HTTP Range
+  request (servers that ignore Range just send the whole file again).
+- The result is checked against the expected size and a checksum: the SHA-256
+  given by the caller, else the one the server reports. Hugging Face's resolve
+  URLs answer LFS files with a redirect carrying the file's SHA-256 in
+  X-Linked-Etag (the CDN response it leads to doesn't have it), and regular
+  files with their git blob SHA-1 as ETag. With `require_checksum`, a file
+  that can't be checked either way is rejected.
+- A lock file in `directory` makes workers that start together wait for one
+  download instead of racing on the same files.
+"""
+import hashlib
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .model_registry import file_sha256
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock
+    fcntl = None
+
+LOCK_NAME = ".download.lock"
+PART_SUFFIX = ".part"
+CHUNK_SIZE = 1 << 20
+# Bytes read per network chunk: a dropped connection loses at most this much
+DOWNLOAD_CHUNK_SIZE = 1 << 16
+_SHA256 = re.compile(r"^[0-9a-f]{64}$")
+_GIT_SHA1 = re.compile(r"^[0-9a-f]{40}$")
+
+
+class FileLock:
+    """Exclusive flock() on a file, held across processes (and threads, via separate descriptors)."""
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+
+    def __enter__(self):
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info):
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+        self._fd = None
+
+
+def file_git_blob_sha1(path):
+    """SHA-1 git gives the file as a blob (what Hugging Face sends as ETag for non-LFS files)."""
+    digest = hashlib.sha1(f"blob {os.path.getsize(path)}\0".encode("ascii"))
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _header_value(response, name):
+    return response.headers.get(name, "").removeprefix("W/").strip('"').lower()
+
+
+def _expected_checksum(response, sha256):
+    """
+    (checksum function, expected hex digest) for a download, or None.
+
+    Redirects are followed by requests, so X-Linked-Etag is looked for on the
+    redirect responses (response.history) as well as the final one.
+    """
+    if sha256:
+        return file_sha256, sha256.lower()
+    for hop in response.history + [response]:
+        linked = _header_value(hop, "X-Linked-Etag")
+        if _SHA256.match(linked):
+            return file_sha256, linked
+    if not response.history:
+        etag = _header_value(response, "ETag")
+        if _GIT_SHA1.match(etag):
+            return file_git_blob_sha1, etag
+    return None
+
+
+def _expected_size(response, resumed_from):
+    """Full file size from Content-Range (206) or Content-Length (200), if the server sent it."""
+    content_range = response.headers.get("Content-Range", "")
+    if response.status_code == 206 and "/" in content_range:
+        total = content_range.rsplit("/", 1)[1]
+        return int(total) if total.isdigit() else None
+    length = response.headers.get("Content-Length")
+    return int(length) + resumed_from if length and length.isdigit() else None
+
+
+def download(url, path, sha256=None, session=None, timeout=30, attempts=3, chunk_size=DOWNLOAD_CHUNK_SIZE,
+             require_checksum=False):
+    """
+    Download `url` to `path`, resuming `path.part` if an earlier attempt was cut short.
+
+    Args:
+        sha256 (str): Expected checksum; defaults to the one the server reports.
+        require_checksum (bool): Reject the file if there is no checksum to
+            check it against.
+        session: requests.Session to use (not shared between threads); plain
+            requests.get by default.
+        attempts (int): Tries, each resuming where the previous one stopped.
+
+    Raises:
+        ValueError: if the finished file doesn't match the expected size or
+            checksum, or has no checksum while one is required.
+        requests.RequestException: if the last attempt fails.
+    """
+    import requests
+
+    session = session or requests
+    part_path = path + PART_SUFFIX
+    for attempt in range(1, attempts + 1):
+        resumed_from = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {"Range": f"bytes={resumed_from}-"} if resumed_from else {}
+        try:
+            with session.get(url, stream=True, headers=headers, timeout=timeout) as response:
+                if response.status_code == 416:
+                    # The part file isn't a prefix of this file; start over
+                    os.remove(part_path)
+                    continue
+                response.raise_for_status()
+                if response.status_code != 206:
+                    resumed_from = 0
+                expected_checksum = _expected_checksum(response, sha256)
+                if expected_checksum is None and require_checksum:
+                    raise ValueError(f"{os.path.basename(path)}: no checksum to verify the download against")
+                expected_size = _expected_size(response, resumed_from)
+                with open(part_path, "ab" if resumed_from else "wb") as f:
+                    for chunk in response.iter_content(chunk_size=chunk_size):
+                        f.write(chunk)
+                    f.flush()
+                    os.fsync(f.fileno())
+        except requests.RequestException:
+            if attempt == attempts:
+                raise
+            time.sleep(min(2 ** attempt, 10) / 10)
+            continue
+
+        size = os.path.getsize(part_path)
+        if expected_size is not None and size != expected_size:
+            if size < expected_size and attempt < attempts:
+                continue  # connection dropped; resume from here
+            raise ValueError(f"{os.path.basename(path)}: got {size} bytes, expected {expected_size}")
+        if expected_checksum is not None:
+            checksum, expected = expected_checksum
+            if checksum(part_path) != expected:
+                os.remove(part_path)
+                raise ValueError(f"{os.path.basename(path)}: checksum mismatch, download discarded")
+        os.replace(part_path, path)
+        return path
+    raise ValueError(f"{os.path.basename(path)}: download did not complete")
+
+
+def fetch_files(files, directory, checksums=None, max_workers=4, **download_options):
+    """
+    Download every file in `files` ({name: url}) that isn't in `directory` yet.
+
+    Args:
+        checksums (dict): Optional {name: sha256}. Files already on disk are
+            re-checked against these and downloaded again on a mismatch.
+        download_options: Passed to `download`.
+
+    Returns:
+        list: Names that were downloaded.
+    """
+    checksums = checksums or {}
+    os.makedirs(directory, exist_ok=True)
+
+    def missing():
+        names = []
+        for name in files:
+            path = os.path.join(directory, name)
+            if not os.path.exists(path):
+                names.append(name)
+            elif checksums.get(name) and file_sha256(path) != checksums[name].lower():
+                print(f"⚠️ {name} doesn't match its checksum, downloading it again.")
+                names.append(name)
+        return names
+
+    if not missing():
+        return []
+
+    # Whoever holds the lock downloads; the others find the files there afterwards
+    with FileLock(os.path.join(directory, LOCK_NAME)):
+        names = missing()
+        if not names:
+            return []
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {}
+            for name in names:
+                print(f"⬇️ Downloading {name} from {files[name]}...")
+                futures[name] = pool.submit(
+                    download, files[name], os.path.join(directory, name),
+                    sha256=checksums.get(name), **download_options
+                )
+            for name, future in futures.items():
+                future.result()
+                print(f"✅ Downloaded {name} to {os.path.join(directory, name)}")
+    return names
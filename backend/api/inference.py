@@ -0,0 +1,230 @@
+import json
+import os
+import struct
+import tempfile
+
+import numpy as np
+
+
+def _linear(x):
+    return x
+
+
+def _relu(x):
+    return np.maximum(x, 0.0)
+
+
+def _softmax(x):
+    # Subtract the row max for numerical stability
+    exp = np.exp(x - x.max(axis=1, keepdims=True))
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+ACTIVATIONS = {
+    "linear": _linear,
+    "relu": _relu,
+    "softmax": _softmax,
+}
+
+# Layers that are a no-op at inference time
+PASSTHROUGH_LAYERS = {"InputLayer", "Dropout"}
+
+
+class NumpyMLP:
+    """
+    Pure NumPy forward pass for the exoplanet classifier.
+
+    The network is stored as a list of dense layers (kernel, bias, activation)
+    with BatchNormalization already folded into the weights, so a prediction
+    is just a few matmuls. Dropout is skipped since it does nothing at
+    inference time.
+    """
+
+    def __init__(self, layers, dtype=np.float32):
+        self.layers = [
+            (np.asarray(kernel, dtype=dtype), np.asarray(bias, dtype=dtype), activation)
+            for kernel, bias, activation in layers
+        ]
+        self.dtype = dtype
+        for _, _, activation in self.layers:
+            if activation not in ACTIVATIONS:
+                raise ValueError(f"Unsupported activation: {activation}")
+
+    @classmethod
+    def from_keras(cls, keras_model, dtype=np.float32):
+        """
+        Extract Dense/BatchNormalization weights from a loaded Keras model.
+
+        A BatchNormalization layer is an affine transform at inference time.
+        When the Dense layer before it is linear, it is folded into that
+        layer. When there is a non-linear activation in between (as in
+        `Dense(relu) -> BatchNorm`), it is folded into the next Dense layer's
+        inputs instead.
+        """
+        layers = []
+        pending = None  # (scale, shift) of a BatchNorm waiting for the next Dense
+
+        for layer in keras_model.layers:
+            kind = type(layer).__name__
+            if kind in PASSTHROUGH_LAYERS:
+                continue
+
+            if kind == "Dense":
+                kernel = np.asarray(layer.kernel, dtype=np.float64)
+                if layer.use_bias:
+                    bias = np.asarray(layer.bias, dtype=np.float64)
+                else:
+                    bias = np.zeros(kernel.shape[1])
+                if pending is not None:
+                    # Dense(BN(x)) = (x * scale + shift) @ W + b
+                    scale, shift = pending
+                    bias = bias + shift @ kernel
+                    kernel = kernel * scale[:, None]
+                    pending = None
+                layers.append((kernel, bias, layer.get_config()["activation"]))
+
+            elif kind == "BatchNormalization":
+                scale, shift = cls._batch_norm_affine(layer)
+                if pending is not None:
+                    # Two BatchNorms in a row compose into one affine transform
+                    prev_scale, prev_shift = pending
+                    pending = (prev_scale * scale, prev_shift * scale + shift)
+                elif layers and layers[-1][2] == "linear":
+                    kernel, bias, activation = layers[-1]
+                    layers[-1] = (kernel * scale, bias * scale + shift, activation)
+                else:
+                    pending = (scale, shift)
+
+            else:
+                raise ValueError(f"Unsupported layer type for NumPy inference: {kind}")
+
+        if pending is not None:
+            raise ValueError("BatchNormalization after the last Dense layer is not supported.")
+
+        return cls(layers, dtype=dtype)
+
+    @staticmethod
+    def _batch_norm_affine(layer):
+        """Return (scale, shift) such that BN(x) == x * scale + shift."""
+        mean = np.asarray(layer.moving_mean, dtype=np.float64)
+        variance = np.asarray(layer.moving_variance, dtype=np.float64)
+        gamma = np.asarray(layer.gamma, dtype=np.float64) if layer.scale else np.ones_like(mean)
+        beta = np.asarray(layer.beta, dtype=np.float64) if layer.center else np.zeros_like(mean)
+        scale = gamma / np.sqrt(variance + layer.epsilon)
+        shift = beta - mean * scale
+        return scale, shift
+
+    def predict(self, x):
+        """Return class probabilities for a (rows, features) matrix."""
+        out = np.asarray(x, dtype=self.dtype)
+        for kernel, bias, activation in self.layers:
+            out = ACTIVATIONS[activation](out @ kernel + bias)
+        return out
+
+
+# ---------------- Shared (memory-mapped) weights ----------------
+# File layout: 8-byte little-endian header length, a JSON header, zero padding
+# up to a 64-byte boundary, then every array as one flat float32 buffer.
+SHARED_WEIGHTS_VERSION = 1
+_HEADER_ALIGN = 64
+
+
+class ScalerParams:
+    """The parts of a fitted RobustScaler that serving needs."""
+
+    def __init__(self, center_, scale_):
+        self.center_ = center_
+        self.scale_ = scale_
+
+
+class LabelClasses:
+    """The parts of a fitted LabelEncoder that serving needs."""
+
+    def __init__(self, classes_):
+        self.classes_ = np.asarray(classes_)
+
+    def inverse_transform(self, indices):
+        return self.classes_[np.asarray(indices)]
+
+
+def save_shared_weights(path, mlp, scaler, label_encoder):
+    """
+    Write the network, scaler parameters and class labels to one flat file.
+
+    The file is written to a temporary name and renamed into place, so
+    workers never map a half-written file.
+    """
+    buffers = []
+    offset = 0
+
+    def add(array):
+        nonlocal offset
+        if array is None:
+            return None
+        array = np.ascontiguousarray(array, dtype=np.float32)
+        buffers.append(array)
+        entry = {"offset": offset, "shape": list(array.shape)}
+        offset += array.size
+        return entry
+
+    header = {
+        "version": SHARED_WEIGHTS_VERSION,
+        "dtype": "float32",
+        "layers": [
+            {"kernel": add(kernel), "bias": add(bias), "activation": activation}
+            for kernel, bias, activation in mlp.layers
+        ],
+        "scaler": {"center": add(scaler.center_), "scale": add(scaler.scale_)},
+        "classes": [str(label) for label in label_encoder.classes_],
+    }
+
+    header_bytes = json.dumps(header).encode("utf-8")
+    data_offset = -(-(8 + len(header_bytes)) // _HEADER_ALIGN) * _HEADER_ALIGN
+    padding = data_offset - 8 - len(header_bytes)
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(struct.pack("<Q", len(header_bytes)))
+            f.write(header_bytes)
+            f.write(b"\0" * padding)
+            for array in buffers:
+                f.write(array.tobytes())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def load_shared_weights(path):
+    """
+    Memory-map a file written by `save_shared_weights`.
+
+    The weights are read-only views into one shared mapping, so every worker
+    process on the machine shares the same physical pages.
+
+    Returns:
+        tuple: (NumpyMLP, ScalerParams, LabelClasses)
+    """
+    with open(path, "rb") as f:
+        (header_length,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_length).decode("utf-8"))
+    if header.get("version") != SHARED_WEIGHTS_VERSION:
+        raise ValueError(f"Unsupported shared weights version: {header.get('version')!r}")
+
+    data_offset = -(-(8 + header_length) // _HEADER_ALIGN) * _HEADER_ALIGN
+    buffer = np.memmap(path, dtype=np.float32, mode="r", offset=data_offset)
+
+    def view(entry):
+        if entry is None:
+            return None
+        size = int(np.prod(entry["shape"]))
+        return buffer[entry["offset"]:entry["offset"] + size].reshape(entry["shape"])
+
+    mlp = NumpyMLP(
+        [(view(layer["kernel"]), view(layer["bias"]), layer["activation"]) for layer in header["layers"]],
+        dtype=np.float32,
+    )
+    scaler = ScalerParams(view(header["scaler"]["center"]), view(header["scaler"]["scale"]))
+    return mlp, scaler, LabelClasses(header["classes"])
@@ -0,0 +1,232 @@
+"""
+Asynchronous prediction jobs: POST /api/predict/jobs/ stores the uploaded rows
+and returns at once; workers classify them in chunks.
+
+The queue is the PredictionJob table itself, so any process can work on it:
+
+- with ML_PREDICTION_JOBS["IN_PROCESS"], server processes start WORKERS
+  threads when a job is submitted (and at startup, to resume interrupted jobs);
+- `python manage.py run_prediction_jobs` runs a worker in its own process.
+
+A chunk's planets, row results and progress counters are committed in one
+transaction together with the worker's heartbeat, so a worker that dies only
+loses the chunk it was on. Its job is claimed again once the heartbeat is
+older than STALE_AFTER seconds and carries on from the first unclassified row.
+"""
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import PredictionJob, PredictionJobRow
+
+DEFAULT_SETTINGS = {
+    "IN_PROCESS": True,
+    "WORKERS": 1,
+    "CHUNK_SIZE": 1000,
+    "MAX_ROWS": 200000,
+    "STALE_AFTER": 60,
+    "POLL_INTERVAL": 1.0,
+}
+
+# Rows inserted per query when a job is created
+INSERT_BATCH_SIZE = 1000
+
+# In-process worker threads, see start_workers()
+_workers = []
+_workers_lock = threading.Lock()
+_wakeup = threading.Event()
+
+
+class JobLost(Exception):
+    """Another worker took the job over (this one's heartbeat went stale)."""
+
+
+def job_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, "ML_PREDICTION_JOBS", {})}
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+def create_job(rows):
+    """
+    Store `rows` (an iterable of dicts) as a new queued job.
+
+    Rows are inserted in batches as they are read, so `rows` can be a lazy
+    parser over the request body.
+
+    Raises:
+        ValueError: if there are no rows, more than MAX_ROWS, or the parser
+            fails; nothing is stored then.
+    """
+    max_rows = job_settings()["MAX_ROWS"]
+    with transaction.atomic():
+        job = PredictionJob.objects.create()
+        batch = []
+        total = 0
+        for row in rows:
+            if total >= max_rows:
+                raise ValueError(f"Too many rows (max {max_rows}).")
+            batch.append(PredictionJobRow(job=job, index=total, data=row))
+            total += 1
+            if len(batch) >= INSERT_BATCH_SIZE:
+                PredictionJobRow.objects.bulk_create(batch)
+                batch = []
+        if not total:
+            raise ValueError("The upload has no rows.")
+        PredictionJobRow.objects.bulk_create(batch)
+        job.total_rows = total
+        job.save(update_fields=["total_rows"])
+    return job
+
+
+def claim_job(worker):
+    """
+    Take the oldest queued job, or a running one whose worker stopped
+    heartbeating. Returns the job, or None if there is nothing to do.
+
+    The claim is a conditional UPDATE on the status and heartbeat read just
+    before, so two workers can't claim the same job, on any database.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=job_settings()["STALE_AFTER"])
+    candidates = (
+        PredictionJob.objects
+        .filter(Q(status=PredictionJob.QUEUED) | Q(status=PredictionJob.RUNNING, heartbeat_at__lt=stale))
+        .order_by("created_at")
+        .values_list("id", "status", "heartbeat_at")[:10]
+    )
+    for job_id, job_status, heartbeat_at in candidates:
+        claimed = PredictionJob.objects.filter(pk=job_id, status=job_status, heartbeat_at=heartbeat_at).update(
+            status=PredictionJob.RUNNING, worker=worker, heartbeat_at=now,
+            started_at=Coalesce(F("started_at"), now),
+        )
+        if claimed:
+            if job_status == PredictionJob.RUNNING:
+                print(f"♻️ Resuming prediction job {job_id}")
+            return PredictionJob.objects.get(pk=job_id)
+    return None
+
+
+def _heartbeat(job, worker):
+    """Refresh the job's heartbeat; JobLost if another worker has claimed it since."""
+    updated = PredictionJob.objects.filter(pk=job.pk, worker=worker, status=PredictionJob.RUNNING).update(
+        heartbeat_at=timezone.now()
+    )
+    if not updated:
+        raise JobLost(job.pk)
+
+
+def process_job(job, worker, chunk_size=None):
+    """
+    Classify and save the job's remaining rows, one chunk per transaction.
+
+    Rows go through the same cleaning, classification and bulk save as
+    /api/predict/batch/, and each row's result is stored as that endpoint
+    would return it. Rows that can't be classified or saved get an "error"
+    result; only other errors (database or model unavailable) fail the job.
+    """
+    from .views import PredictPlanetBatch
+
+    chunk_size = chunk_size or job_settings()["CHUNK_SIZE"]
+    view = PredictPlanetBatch()
+    pending = job.rows.filter(result__isnull=True).order_by("index").only("id", "index", "data")
+    while True:
+        chunk = list(pending[:chunk_size])
+        if not chunk:
+            break
+        rows, results = view.classify_rows([row.data for row in chunk])
+        with transaction.atomic():
+            # Taken first: on Postgres this locks the job row until commit
+            _heartbeat(job, worker)
+            saved = view.save_batch(rows, results)
+            for row, result in zip(chunk, results):
+                row.result = result
+            PredictionJobRow.objects.bulk_update(chunk, ["result"])
+            PredictionJob.objects.filter(pk=job.pk).update(
+                processed_rows=F("processed_rows") + len(chunk),
+                saved_rows=F("saved_rows") + saved,
+                error_rows=F("error_rows") + sum(1 for result in results if "error" in result),
+            )
+
+    PredictionJob.objects.filter(pk=job.pk, worker=worker).update(
+        status=PredictionJob.DONE, finished_at=timezone.now(), heartbeat_at=timezone.now()
+    )
+
+
+def run_job(job, worker):
+    """process_job, recording a failure on the job instead of raising."""
+    print(f"⚙️ Running prediction job {job.pk} ({job.total_rows} rows)")
+    try:
+        process_job(job, worker)
+    except JobLost:
+        print(f"⚠️ Prediction job {job.pk} was taken over by another worker")
+        return
+    except Exception as e:
+        print(f"❌ Prediction job {job.pk} failed:", e)
+        PredictionJob.objects.filter(pk=job.pk, worker=worker).update(
+            status=PredictionJob.FAILED, error=str(e), finished_at=timezone.now()
+        )
+        return
+    print(f"✅ Prediction job {job.pk} done")
+
+
+def work(worker=None, wait=False):
+    """
+    Run jobs until there is nothing left to do. Returns how many were run.
+
+    Without `wait`, keep polling while another worker has a job running (it may
+    die and need resuming), then return. With `wait`, poll forever.
+    """
+    worker = worker or worker_name()
+    poll_interval = job_settings()["POLL_INTERVAL"]
+    count = 0
+    while True:
+        job = claim_job(worker)
+        if job is not None:
+            run_job(job, worker)
+            count += 1
+            continue
+        if not wait and not PredictionJob.objects.filter(status=PredictionJob.RUNNING).exists():
+            return count
+        time.sleep(poll_interval)
+
+
+def _worker_thread():
+    try:
+        while True:
+            work()
+            with _workers_lock:
+                # A job submitted while work() was returning sets _wakeup
+                if not _wakeup.is_set():
+                    _workers.remove(threading.current_thread())
+                    return
+                _wakeup.clear()
+    finally:
+        with _workers_lock:
+            if threading.current_thread() in _workers:  # work() raised
+                _workers.remove(threading.current_thread())
+        connection.close()
+
+
+def start_workers():
+    """
+    Make sure this process has its WORKERS in-process worker threads running.
+    They exit once the queue is empty. Safe to call repeatedly.
+    """
+    count = job_settings()["WORKERS"]
+    with _workers_lock:
+        _wakeup.set()
+        while len(_workers) < count:
+            thread = threading.Thread(target=_worker_thread, name="prediction-jobs", daemon=True)
+            _workers.append(thread)
+            thread.start()
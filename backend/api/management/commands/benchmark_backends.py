@@ -0,0 +1,119 @@
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from api import ai_model
+
+# Model files ai_model loads, by path attribute
+MODEL_FILES = {
+    "MODEL_PATH": "model.keras",
+    "SCALER_PATH": "scaler.joblib",
+    "ENCODER_PATH": "label_encoder.joblib",
+    "PREPROCESSING_PATH": "preprocessing.json",
+    "SHARED_WEIGHTS_PATH": "model_weights.bin",
+    "ONNX_MODEL_PATH": "model.onnx",
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare inference backends: cold start (fresh process), per-row latency, "
+        "batch throughput and peak RSS"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--backends", nargs="+", default=["numpy", "onnx", "keras"])
+        parser.add_argument("--rows", type=int, default=500, help="Single-row predictions timed per backend")
+        parser.add_argument("--batch-size", type=int, default=1024)
+        parser.add_argument("--model-dir", help="Folder with the model files (default: the api folder)")
+        # Internal: measure one backend in this process and print JSON
+        parser.add_argument("--measure", help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options["model_dir"]:
+            for attribute, filename in MODEL_FILES.items():
+                setattr(ai_model, attribute, os.path.join(options["model_dir"], filename))
+
+        if options["measure"]:
+            self.stdout.write(json.dumps(self.measure(options["measure"], options)))
+            return
+
+        for backend in options["backends"]:
+            if backend not in ai_model.INFERENCE_BACKENDS:
+                raise CommandError(f"Unknown backend: {backend}")
+
+        self.stdout.write(
+            f"{'backend':<8} {'process':>9} {'load':>9} {'per row':>10} {'batch rows/s':>13} {'peak RSS':>10}"
+        )
+        for backend in options["backends"]:
+            result = self.run_child(backend, options)
+            if "error" in result:
+                self.stdout.write(f"{backend:<8} ❌ {result['error']}")
+                continue
+            self.stdout.write(
+                f"{backend:<8} {result['process_s']:>8.2f}s {result['load_s']:>8.2f}s "
+                f"{result['row_ms']:>8.3f}ms {result['batch_rows_per_s']:>13,.0f} {result['rss_mb']:>8.0f}MB"
+            )
+
+    def run_child(self, backend, options):
+        """Measure `backend` in a fresh interpreter, so imports and RSS start from zero."""
+        command = [
+            sys.executable, sys.argv[0], "benchmark_backends", "--measure", backend,
+            "--rows", str(options["rows"]), "--batch-size", str(options["batch_size"]),
+        ]
+        env = {
+            **os.environ, "ML_INFERENCE_BACKEND": backend, "ML_WARMUP_ON_STARTUP": "0",
+            "ML_PREDICTION_CACHE_BACKEND": "none", "ML_MICROBATCH_ENABLED": "0",
+        }
+        if options["model_dir"]:
+            command += ["--model-dir", options["model_dir"]]
+            # Load the given files, not the registry's promoted version
+            env["ML_MODEL_REGISTRY_DIR"] = ""
+        start = time.perf_counter()
+        completed = subprocess.run(command, capture_output=True, text=True, env=env)
+        process_s = time.perf_counter() - start
+        lines = completed.stdout.strip().splitlines()
+        if completed.returncode != 0 or not lines:
+            return {"error": (completed.stderr.strip().splitlines() or ["no output"])[-1]}
+        return dict(json.loads(lines[-1]), process_s=process_s)
+
+    def measure(self, backend, options):
+        rng = np.random.default_rng(0)
+        rows = [
+            {field: float(value) for field, value in zip(ai_model.CLASSIFICATION_FIELDS, sample)}
+            for sample in rng.lognormal(1.5, 1.0, (max(options["rows"], options["batch_size"]), 7))
+        ]
+
+        # Cold start: load the backend and answer the first request
+        start = time.perf_counter()
+        ai_model.load_resources()
+        if not ai_model.is_ready():
+            raise CommandError(ai_model.load_error or "load failed")
+        ai_model.classify(rows[0])
+        load_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for row in rows[:options["rows"]]:
+            ai_model.classify(row)
+        row_ms = (time.perf_counter() - start) / options["rows"] * 1000
+
+        batch = rows[:options["batch_size"]]
+        start = time.perf_counter()
+        ai_model.classify_batch(batch)
+        batch_s = time.perf_counter() - start
+
+        return {
+            "backend": backend,
+            "engine": type(ai_model.active.model).__name__,
+            "load_s": load_s,
+            "row_ms": row_ms,
+            "batch_rows_per_s": len(batch) / batch_s,
+            # ru_maxrss is in KB on Linux
+            "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        }
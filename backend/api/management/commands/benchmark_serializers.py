@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from api.models import Planet, Star
+from api.serializers import FastCatalogSerializer, PlanetSerializer, StarSerializer
+
+
+class Command(BaseCommand):
+    help = "Compare DRF serializers with the fast catalog path on the current database (read-only)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=3)
+
+    def best_of(self, repeat, func):
+        best, output = None, None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            output = JSONRenderer().render(func())
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, output
+
+    def handle(self, *args, **options):
+        repeat = options["repeat"]
+        catalogs = [
+            ("planets", Planet.objects.all(), PlanetSerializer),
+            ("stars", Star.objects.all(), StarSerializer),
+        ]
+
+        for name, queryset, serializer_class in catalogs:
+            queryset = queryset.order_by("id")
+            count = queryset.count()
+
+            drf_time, drf_bytes = self.best_of(repeat, lambda: serializer_class(queryset, many=True).data)
+            fast_time, fast_bytes = self.best_of(
+                repeat, lambda: FastCatalogSerializer(serializer_class).serialize(queryset)
+            )
+            if drf_bytes != fast_bytes:
+                raise CommandError(f"❌ {name}: fast serializer output differs from {serializer_class.__name__}")
+
+            speedup = drf_time / fast_time if fast_time else float("inf")
+            self.stdout.write(
+                f"📊 {name}: {count} rows, {len(fast_bytes) / 1024:.0f} KB | "
+                f"DRF {drf_time * 1000:.1f} ms | fast {fast_time * 1000:.1f} ms | {speedup:.1f}x"
+            )
+        self.stdout.write(self.style.SUCCESS("✅ Output is byte-identical"))
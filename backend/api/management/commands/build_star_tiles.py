@@ -0,0 +1,24 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from api.tiles import rebuild_all_tiles
+
+
+class Command(BaseCommand):
+    help = (
+        "Precompute the level-of-detail star tiles served by /api/stars/tiles/ "
+        "(levels 0..STAR_TILE_MAX_LEVEL). load_data rebuilds them itself; stars saved "
+        "through the API invalidate only the tiles they fall in."
+    )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        counts = rebuild_all_tiles(settings.STAR_TILE_MAX_LEVEL, settings.STAR_TILE_GRID)
+        elapsed = time.perf_counter() - start
+
+        for level, count in counts.items():
+            self.stdout.write(f"🗺️  level {level}: {count} tiles")
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Built {sum(counts.values())} star tiles in {elapsed:.2f}s"
+        ))
@@ -0,0 +1,22 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from api import ai_model
+
+
+class Command(BaseCommand):
+    help = "Export model.keras, the scaler and the label encoder to model.onnx for the onnx inference backend"
+
+    def handle(self, *args, **options):
+        try:
+            import onnx  # noqa: F401
+        except ImportError:
+            raise CommandError("Exporting needs the onnx package: pip install onnx")
+
+        if not os.path.exists(ai_model.MODEL_PATH) and not ai_model.shared_weights_are_fresh():
+            self.stdout.write(f"Model not found at {ai_model.MODEL_PATH}, downloading...")
+            ai_model.download_missing_files()
+
+        path = ai_model.export_onnx_model()
+        size_kb = os.path.getsize(path) / 1024
+        self.stdout.write(self.style.SUCCESS(f"✅ Exported ONNX model to {path} ({size_kb:.1f} KB)"))
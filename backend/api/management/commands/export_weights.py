@@ -0,0 +1,17 @@
+import os
+
+from django.core.management.base import BaseCommand
+from api import ai_model
+
+
+class Command(BaseCommand):
+    help = "Export model.keras, the scaler and the label encoder to a memory-mappable weights file"
+
+    def handle(self, *args, **options):
+        if not os.path.exists(ai_model.MODEL_PATH):
+            self.stdout.write(f"Model not found at {ai_model.MODEL_PATH}, downloading...")
+            ai_model.download_missing_files()
+
+        path = ai_model.export_shared_weights()
+        size_kb = os.path.getsize(path) / 1024
+        self.stdout.write(self.style.SUCCESS(f"✅ Exported shared weights to {path} ({size_kb:.1f} KB)"))
@@ -1,62 +1,86 @@
-import pandas as pd
-from django.core.management.base import BaseCommand
-from api.models import Star, Planet
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from api import catalog
+from api.tiles import rebuild_all_tiles
+
+
 class Command(BaseCommand):
-    help = "Load stars.csv and planets.csv into the database"
+    help = (
+        "Load stars.csv and planets.csv into the database. Rows are upserted by "
+        "name in chunks; user-inputted stars and planets are left untouched. "
+        "The star tiles are rebuilt afterwards."
+    )
 
     def add_arguments(self, parser):
         parser.add_argument("--stars", type=str, default="stars.csv")
         parser.add_argument("--planets", type=str, default="planets.csv")
+        parser.add_argument("--chunk-size", type=int, default=5000, help="CSV rows read at a time")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Rows per upsert transaction")
+        parser.add_argument(
+            "--copy", action="store_true",
+            help="Postgres only: COPY each chunk into a staging table and upsert it in one statement",
+        )
+        parser.add_argument(
+            "--sync", action="store_true",
+            help="Only write rows whose content changed and delete catalog rows missing from the CSVs",
+        )
+
+    def report(self, label, stats):
+        line = (
+            f"✅ {label}: {stats.rows} rows in {stats.elapsed:.2f}s ({stats.rows_per_second:,.0f} rows/s) | "
+            f"upserted {stats.upserted}, kept {stats.kept_user_inputted} user-inputted"
+        )
+        if stats.missing_star:
+            line += f", skipped {stats.missing_star} without a known star"
+        self.stdout.write(self.style.SUCCESS(line))
+
+    def report_diff(self, label, stats):
+        line = (
+            f"🔄 {label}: +{stats.inserted} ~{stats.updated} -{stats.deleted} "
+            f"({stats.unchanged} unchanged, {stats.kept_user_inputted} user-inputted kept) "
+            f"in {stats.elapsed:.2f}s ({stats.rows_per_second:,.0f} rows/s)"
+        )
+        if stats.missing_star:
+            line += f", skipped {stats.missing_star} without a known star"
+        self.stdout.write(self.style.SUCCESS(line))
+
+    def rebuild_tiles(self):
+        start = time.perf_counter()
+        counts = rebuild_all_tiles(settings.STAR_TILE_MAX_LEVEL, settings.STAR_TILE_GRID)
+        self.stdout.write(self.style.SUCCESS(
+            f"🗺️  Rebuilt {sum(counts.values())} star tiles in {time.perf_counter() - start:.2f}s"
+        ))
+
+    def sync(self, options):
+        sync = catalog.CatalogSync(chunk_size=options["chunk_size"], batch_size=options["batch_size"])
+        self.stdout.write(f"📂 Syncing stars from {options['stars']}")
+        sync.sync_stars(options["stars"])
+        self.stdout.write(f"📂 Syncing planets from {options['planets']}")
+        planet_stats = sync.sync_planets(options["planets"])
+        # Stale stars go last so planets that moved to another star aren't cascaded away
+        self.report_diff("Stars", sync.finish())
+        self.report_diff("Planets", planet_stats)
+        self.rebuild_tiles()
 
     def handle(self, *args, **options):
-        stars_path = options["stars"]
-        planets_path = options["planets"]
-
-        self.stdout.write(f"📂 Loading stars from {stars_path}")
-        stars_df = pd.read_csv(stars_path)
-
-        # Build Star objects
-        stars = [
-            Star(
-                name=row["name"],
-                ra=row["ra"],
-                dec=row["dec"],
-                sy_dist=row["sy_dist"],
-                star_temp=row["star_temp"],
-                star_radius=row["star_radius"],
-            )
-            for _, row in stars_df.iterrows()
-        ]
-
-        Star.objects.all().delete()  # optional: clear old data
-        Star.objects.bulk_create(stars, batch_size=1000, ignore_conflicts=True)
-        self.stdout.write(self.style.SUCCESS(f"✅ Inserted {len(stars)} stars"))
-
-        self.stdout.write(f"📂 Loading planets from {planets_path}")
-        planets_df = pd.read_csv(planets_path)
-
-        # Build Planet objects (requires star lookup by name)
-        star_lookup = {s.name: s for s in Star.objects.all()}
-
-        planets = []
-        for _, row in planets_df.iterrows():
-            star = star_lookup.get(row["star_name"])
-            if not star:
-                continue
-            planets.append(
-                Planet(
-                    star=star,
-                    name=row["name"],
-                    orbital_period=row.get("orbital_period"),
-                    radius=row.get("radius"),
-                    ra=row.get("ra"),
-                    dec=row.get("dec"),
-                    duration=row.get("duration"),
-                    transit_depth=row.get("transit_depth"),
-                    model_snr=row.get("model_snr"),
-                )
-            )
-
-        Planet.objects.all().delete()  # optional: clear old data
-        Planet.objects.bulk_create(planets, batch_size=1000, ignore_conflicts=True)
-        self.stdout.write(self.style.SUCCESS(f"✅ Inserted {len(planets)} planets"))
+        use_copy = options["copy"]
+        if use_copy and options["sync"]:
+            raise CommandError("--copy and --sync can't be combined")
+        if use_copy and not catalog.copy_supported():
+            raise CommandError("--copy needs a PostgreSQL database")
+        if options["chunk_size"] <= 0 or options["batch_size"] <= 0:
+            raise CommandError("--chunk-size and --batch-size must be positive")
+        if options["sync"]:
+            self.sync(options)
+            return
+        sizes = {"chunk_size": options["chunk_size"], "batch_size": options["batch_size"], "use_copy": use_copy}
+
+        # Stars first: planets are linked to them by name
+        self.stdout.write(f"📂 Loading stars from {options['stars']}")
+        self.report("Stars", catalog.load_stars(options["stars"], **sizes))
+
+        self.stdout.write(f"📂 Loading planets from {options['planets']}")
+        self.report("Planets", catalog.load_planets(options["planets"], **sizes))
+        self.rebuild_tiles()
@@ -0,0 +1,68 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from api import ai_model
+from api.model_registry import OPTIONAL_FILES, REQUIRED_FILES
+
+
+class Command(BaseCommand):
+    help = "Add, list, verify and promote versioned model bundles (ML_MODEL_REGISTRY_DIR)"
+
+    def add_arguments(self, parser):
+        subcommands = parser.add_subparsers(dest="action", required=True)
+
+        add = subcommands.add_parser("add", help="Store the model files in a folder as a new version")
+        add.add_argument("directory", nargs="?", help="Folder with model.keras, scaler.joblib, ... (default: api/)")
+        add.add_argument("--version", help="Version name (default: hash of the files)")
+        add.add_argument("--promote", action="store_true", help="Make it the current version")
+
+        subcommands.add_parser("list", help="List the stored versions")
+
+        verify = subcommands.add_parser("verify", help="Check a version's files against its manifest")
+        verify.add_argument("version", nargs="?", help="Default: the current version")
+
+        promote = subcommands.add_parser("promote", help="Make a version current; workers switch to it")
+        promote.add_argument("version")
+
+    def handle(self, *args, **options):
+        registry = ai_model.get_registry()
+        if registry is None:
+            raise CommandError("ML_MODEL_REGISTRY_DIR is not set")
+        try:
+            getattr(self, f"handle_{options['action']}")(registry, options)
+        except ValueError as e:
+            raise CommandError(f"❌ {e}")
+
+    def handle_add(self, registry, options):
+        directory = options["directory"] or ai_model.BASE_DIR
+        if not options["directory"]:
+            ai_model.download_missing_files()
+        files = {
+            name: os.path.join(directory, name) for name in REQUIRED_FILES + OPTIONAL_FILES
+            if name in REQUIRED_FILES or os.path.exists(os.path.join(directory, name))
+        }
+        manifest = registry.add(files, version=options["version"])
+        self.stdout.write(self.style.SUCCESS(f"✅ Stored model version {manifest['version']}"))
+        if options["promote"]:
+            self.handle_promote(registry, {"version": manifest["version"]})
+
+    def handle_list(self, registry, options):
+        current = registry.current_version()
+        for manifest in registry.versions():
+            marker = "*" if manifest["version"] == current else " "
+            size_kb = sum(entry["size"] for entry in manifest["files"].values()) / 1024
+            self.stdout.write(f"{marker} {manifest['version']}  {manifest['created_at']}  {size_kb:.1f} KB")
+
+    def handle_verify(self, registry, options):
+        version = options["version"] or registry.current_version()
+        if version is None:
+            raise CommandError("No version given and none promoted")
+        registry.verify(version)
+        self.stdout.write(self.style.SUCCESS(f"✅ Model version {version} matches its manifest"))
+
+    def handle_promote(self, registry, options):
+        registry.promote(options["version"])
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Promoted model version {options['version']}; workers switch within "
+            f"ML_MODEL_RELOAD_INTERVAL seconds"
+        ))
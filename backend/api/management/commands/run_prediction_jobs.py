@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from api import jobs
+
+
+class Command(BaseCommand):
+    help = "Run a prediction job worker (for ML_PREDICTION_JOBS IN_PROCESS=0, or extra capacity)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Exit when no job is left instead of polling")
+
+    def handle(self, *args, **options):
+        worker = jobs.worker_name()
+        self.stdout.write(f"⚙️ Prediction job worker {worker} started")
+        count = jobs.work(worker, wait=not options["once"])
+        self.stdout.write(self.style.SUCCESS(f"✅ Ran {count} job(s)"))
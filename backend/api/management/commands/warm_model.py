@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from api import ai_model
+
+
+class Command(BaseCommand):
+    help = "Load (and download if needed) the model, scaler and label encoder"
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        ai_model.load_resources()
+        elapsed = time.perf_counter() - start
+
+        status = ai_model.get_status()
+        if not status["ready"]:
+            raise CommandError(f"Failed to load ML resources: {status['error']}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Model ready ({status['backend']} backend) in {elapsed:.2f}s"
+        ))
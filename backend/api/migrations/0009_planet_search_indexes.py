@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:27
+
+from django.db import migrations, models
+
+
+# name__icontains compiles to UPPER("name"::text) LIKE UPPER('%...%') on Postgres,
+# so the trigram index is on that same expression.
+TRIGRAM_INDEX = "planet_name_trgm_idx"
+
+
+def create_trigram_index(apps, schema_editor):
+    """
+    pg_trgm GIN index for substring search. Skipped on SQLite and other
+    backends, and on Postgres servers that don't ship the pg_trgm extension.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {TRIGRAM_INDEX} ON api_planet '
+        'USING gin ((UPPER("name"::text)) gin_trgm_ops)'
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(f"DROP INDEX IF EXISTS {TRIGRAM_INDEX}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_alter_planet_name'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='planet',
+            index=models.Index(fields=['classification'], name='planet_classification_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='planet',
+            index=models.Index(fields=['star', 'classification'], name='planet_star_class_idx'),
+        ),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_planet_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StarTile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.PositiveSmallIntegerField()),
+                ('x', models.PositiveIntegerField()),
+                ('y', models.PositiveIntegerField()),
+                ('star_count', models.PositiveIntegerField(default=0)),
+                ('body', models.TextField()),
+                ('etag', models.CharField(max_length=64)),
+                ('built_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('level', 'x', 'y'), name='star_tile_unique_xyz')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_star_tile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='planet',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=16),
+        ),
+        migrations.AddField(
+            model_name='star',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=16),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_catalog_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='planet',
+            name='model_version',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
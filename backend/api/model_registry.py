@@ -0,0 +1,161 @@
+"""
+Local registry of versioned model bundles.
+
+    <root>/
+        CURRENT                     name of the promoted version
+        versions/<version>/
+            manifest.json           version, created_at, sha256 and size per file
+            model.keras, scaler.joblib, label_encoder.joblib, preprocessing.json
+
+A version is added by copying its files into a temporary directory under
+versions/ and renaming it into place, and promoted by replacing CURRENT, so
+readers never see a half-written bundle or pointer. Workers poll CURRENT (see
+ai_model.load_resources) and swap to the promoted version without a restart.
+
+Files a backend derives from a bundle (model_weights.bin, model.onnx) are
+written next to it but are not part of the manifest.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+MANIFEST_NAME = "manifest.json"
+CURRENT_NAME = "CURRENT"
+
+# Files a bundle must contain, and the ones it may contain
+REQUIRED_FILES = ("model.keras", "scaler.joblib", "label_encoder.joblib")
+OPTIONAL_FILES = ("preprocessing.json",)
+
+
+def file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_atomic(path, data):
+    """Write `data` (bytes) to a temporary file next to `path`, then rename it over `path`."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class ModelRegistry:
+    def __init__(self, root):
+        self.root = str(root)
+        self.versions_dir = os.path.join(self.root, "versions")
+
+    def version_dir(self, version):
+        return os.path.join(self.versions_dir, version)
+
+    def path(self, version, filename):
+        return os.path.join(self.version_dir(version), filename)
+
+    def manifest(self, version):
+        """The manifest of `version`; ValueError if there is no such version."""
+        try:
+            with open(self.path(version, MANIFEST_NAME)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise ValueError(f"Unknown model version: {version}")
+
+    def versions(self):
+        """Manifests of every version, oldest first."""
+        if not os.path.isdir(self.versions_dir):
+            return []
+        manifests = [
+            self.manifest(name) for name in os.listdir(self.versions_dir)
+            if os.path.exists(self.path(name, MANIFEST_NAME))
+        ]
+        return sorted(manifests, key=lambda manifest: (manifest["created_at"], manifest["version"]))
+
+    def add(self, files, version=None):
+        """
+        Store a bundle as a new version.
+
+        Args:
+            files (dict): File name in the bundle (REQUIRED_FILES, and any of
+                OPTIONAL_FILES) -> path to copy it from.
+            version (str): Version name. Defaults to a hash of the files'
+                contents, so adding the same bundle twice is a no-op.
+
+        Returns:
+            dict: The version's manifest.
+        """
+        missing = [name for name in REQUIRED_FILES if name not in files]
+        unknown = [name for name in files if name not in REQUIRED_FILES + OPTIONAL_FILES]
+        if missing or unknown:
+            raise ValueError(f"Bundle files: missing {missing}, unexpected {unknown}")
+
+        checksums = {name: {"sha256": file_sha256(path), "size": os.path.getsize(path)} for name, path in files.items()}
+        if version is None:
+            combined = json.dumps(checksums, sort_keys=True).encode("utf-8")
+            version = hashlib.sha256(combined).hexdigest()[:12]
+        if not version or os.sep in version or version.startswith("."):
+            raise ValueError(f"Invalid model version name: {version!r}")
+        if os.path.exists(self.version_dir(version)):
+            if self.manifest(version)["files"] != checksums:
+                raise ValueError(f"Model version {version} already exists with different files")
+            return self.manifest(version)
+
+        os.makedirs(self.versions_dir, exist_ok=True)
+        staging = tempfile.mkdtemp(dir=self.versions_dir, prefix=".staging-")
+        try:
+            for name, source in files.items():
+                shutil.copyfile(source, os.path.join(staging, name))
+                if file_sha256(os.path.join(staging, name)) != checksums[name]["sha256"]:
+                    raise ValueError(f"{source} changed while it was being copied")
+            manifest = {
+                "version": version,
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "files": checksums,
+            }
+            with open(os.path.join(staging, MANIFEST_NAME), "w") as f:
+                json.dump(manifest, f, indent=2)
+            os.rename(staging, self.version_dir(version))
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        return manifest
+
+    def verify(self, version):
+        """Check every file of `version` against its manifest; ValueError on a mismatch."""
+        manifest = self.manifest(version)
+        for name, expected in manifest["files"].items():
+            path = self.path(version, name)
+            if not os.path.exists(path):
+                raise ValueError(f"Model version {version}: {name} is missing")
+            if os.path.getsize(path) != expected["size"] or file_sha256(path) != expected["sha256"]:
+                raise ValueError(f"Model version {version}: checksum mismatch for {name}")
+        return manifest
+
+    def current_version(self):
+        """The promoted version, or None if nothing has been promoted yet."""
+        try:
+            with open(os.path.join(self.root, CURRENT_NAME)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def promote(self, version):
+        """Verify `version` and make it current, atomically."""
+        self.verify(version)
+        _write_atomic(os.path.join(self.root, CURRENT_NAME), f"{version}\n".encode("utf-8"))
+        return version
+
+    def files(self, version):
+        """Bundle file name -> path, for the files `version` has."""
+        return {name: self.path(version, name) for name in self.manifest(version)["files"]}
@@ -1,3 +1,5 @@
+import uuid
+
 from django.db import models
 
 class Star(models.Model):
@@ -8,6 +10,8 @@ class Star(models.Model):
     star_temp = models.FloatField(null=True, blank=True)
     star_radius = models.FloatField(null=True, blank=True)
     user_inputted = models.BooleanField(default=False)
+    # Hash of the catalog row last loaded into this star (see api/catalog.py)
+    content_hash = models.CharField(max_length=16, blank=True, default="", editable=False)
 
     def __str__(self):
         return self.name
@@ -26,10 +30,104 @@ class Planet(models.Model):
     model_snr = models.FloatField(null=True, blank=True)
     semi_major_axis = models.FloatField(null=True, blank=True)
     user_inputted = models.BooleanField(default=False)
+    content_hash = models.CharField(max_length=16, blank=True, default="", editable=False)
 
     classification = models.CharField(max_length=20)
     confidence = models.FloatField(null=True, blank=True)
+    # Model version (ai_model.LoadedModel.version) that produced the classification;
+    # blank for catalog imports
+    model_version = models.CharField(max_length=64, blank=True, default="")
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # PlanetList ?classification= filter
+            models.Index(fields=["classification"], name="planet_classification_idx"),
+            # Planets of one star, optionally by classification
+            models.Index(fields=["star", "classification"], name="planet_star_class_idx"),
+        ]
+        # Postgres also gets a pg_trgm GIN index for name__icontains (see migration 0009)
+
+    def __str__(self):
+        return self.name
+
+
+class StarTile(models.Model):
+    """
+    Pre-encoded level-of-detail tile for /api/stars/tiles/<level>/<x>/<y>/.
+
+    Built by the build_star_tiles command (or on first request), see api/tiles.py.
+    Deleted when a star in it changes, and rebuilt by load_data.
+    """
+    level = models.PositiveSmallIntegerField()
+    x = models.PositiveIntegerField()
+    y = models.PositiveIntegerField()
+    star_count = models.PositiveIntegerField(default=0)
+    body = models.TextField()
+    etag = models.CharField(max_length=64)
+    built_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["level", "x", "y"], name="star_tile_unique_xyz"),
+        ]
+
+    def __str__(self):
+        return f"{self.level}/{self.x}/{self.y}"
+
+
+
+class PredictionJob(models.Model):
+    """
+    Asynchronous classification of an uploaded CSV/NDJSON file (see api/jobs.py).
+
+    Rows are stored as PredictionJobRow and classified in chunks by a worker.
+    A worker holds the job while it keeps `heartbeat_at` fresh; a running job
+    whose heartbeat has gone stale (its worker died) is picked up again and
+    resumes from the first row without a result.
+    """
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [(QUEUED, "Queued"), (RUNNING, "Running"), (DONE, "Done"), (FAILED, "Failed")]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    total_rows = models.PositiveIntegerField(default=0)
+    processed_rows = models.PositiveIntegerField(default=0)
+    saved_rows = models.PositiveIntegerField(default=0)
+    error_rows = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default="")
+    # Worker holding the job and when it last reported progress
+    worker = models.CharField(max_length=100, blank=True, default="")
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Workers look for queued jobs, oldest first
+            models.Index(fields=["status", "created_at"], name="prediction_job_status_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.id} ({self.status})"
+
+
+class PredictionJobRow(models.Model):
+    """One input row of a PredictionJob and, once classified, its result."""
+    job = models.ForeignKey(PredictionJob, on_delete=models.CASCADE, related_name="rows")
+    index = models.PositiveIntegerField()
+    data = models.JSONField()
+    # Same shape as a PredictPlanetBatch result; null until classified
+    result = models.JSONField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["job", "index"], name="prediction_job_row_unique_index"),
+        ]
+
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return f"{self.job_id}#{self.index}"
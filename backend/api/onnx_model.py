@@ -0,0 +1,134 @@
+"""
+ONNX export of the classifier, run with ONNX Runtime.
+
+The exported graph is the folded network from NumpyMLP (Gemm + activation per
+layer) with the RobustScaler folded into the first Gemm, so it takes raw
+model features (features.MODEL_FEATURES) and returns class probabilities.
+The class labels and the preprocessing medians are stored in the model's
+metadata, which makes model.onnx the only file a worker needs.
+
+`onnx` is only needed to export and `onnxruntime` only to run; both are
+imported lazily.
+"""
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from .features import MODEL_FEATURES, Preprocessor
+from .inference import LabelClasses, ScalerParams
+
+ONNX_OPSET = 13
+INPUT_NAME = "features"
+OUTPUT_NAME = "probabilities"
+
+# Activation name (NumpyMLP) -> ONNX operator; linear layers have none
+_ACTIVATION_OPS = {"relu": "Relu", "softmax": "Softmax", "linear": None}
+
+
+def fold_scaler(mlp, scaler):
+    """
+    Layers of `mlp` with the scaler folded into the first one:
+    ((x - center) / scale) @ W + b == x @ (W / scale) + (b - (center / scale) @ W)
+    """
+    layers = [(np.asarray(k, dtype=np.float64), np.asarray(b, dtype=np.float64), a) for k, b, a in mlp.layers]
+    kernel, bias, activation = layers[0]
+    center = np.zeros(kernel.shape[0]) if scaler.center_ is None else np.asarray(scaler.center_, dtype=np.float64)
+    scale = np.ones(kernel.shape[0]) if scaler.scale_ is None else np.asarray(scaler.scale_, dtype=np.float64)
+    layers[0] = (kernel / scale[:, None], bias - (center / scale) @ kernel, activation)
+    return layers
+
+
+def build_onnx_model(mlp, scaler, label_encoder, preprocessor=None):
+    """Build the ONNX ModelProto for a NumpyMLP plus its scaler and labels."""
+    import onnx
+    from onnx import TensorProto, helper, numpy_helper
+
+    nodes, initializers = [], []
+    current = INPUT_NAME
+    layers = fold_scaler(mlp, scaler)
+    for index, (kernel, bias, activation) in enumerate(layers):
+        if activation not in _ACTIVATION_OPS:
+            raise ValueError(f"Unsupported activation for ONNX export: {activation}")
+        initializers += [
+            numpy_helper.from_array(kernel.astype(np.float32), f"kernel_{index}"),
+            numpy_helper.from_array(bias.astype(np.float32), f"bias_{index}"),
+        ]
+        last = index == len(layers) - 1
+        op = _ACTIVATION_OPS[activation]
+        dense_out = OUTPUT_NAME if last and op is None else f"dense_{index}"
+        nodes.append(helper.make_node("Gemm", [current, f"kernel_{index}", f"bias_{index}"], [dense_out]))
+        current = dense_out
+        if op is not None:
+            out = OUTPUT_NAME if last else f"{op.lower()}_{index}"
+            attributes = {"axis": 1} if op == "Softmax" else {}
+            nodes.append(helper.make_node(op, [current], [out], **attributes))
+            current = out
+
+    graph = helper.make_graph(
+        nodes, "exoplanet_classifier",
+        [helper.make_tensor_value_info(INPUT_NAME, TensorProto.FLOAT, [None, len(MODEL_FEATURES)])],
+        [helper.make_tensor_value_info(OUTPUT_NAME, TensorProto.FLOAT, [None, layers[-1][0].shape[1]])],
+        initializers,
+    )
+    onnx_model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", ONNX_OPSET)])
+    metadata = {
+        "classes": json.dumps([str(label) for label in label_encoder.classes_]),
+        "features": json.dumps(MODEL_FEATURES),
+    }
+    if preprocessor is not None:
+        metadata["preprocessing"] = json.dumps(preprocessor.to_dict())
+    helper.set_model_props(onnx_model, metadata)
+    onnx.checker.check_model(onnx_model)
+    return onnx_model
+
+
+def save_onnx_model(path, mlp, scaler, label_encoder, preprocessor=None):
+    """Export to `path`, written to a temporary name and renamed into place."""
+    onnx_model = build_onnx_model(mlp, scaler, label_encoder, preprocessor)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(onnx_model.SerializeToString())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class OnnxClassifier:
+    """ONNX Runtime session with the same predict() interface as NumpyMLP."""
+
+    def __init__(self, session, preprocessor=None):
+        self.session = session
+        self.preprocessor = preprocessor
+
+    def predict(self, x):
+        """Return class probabilities for a (rows, MODEL_FEATURES) matrix of unscaled features."""
+        x = np.ascontiguousarray(x, dtype=np.float32)
+        return self.session.run([OUTPUT_NAME], {INPUT_NAME: x})[0]
+
+
+def load_onnx_model(path, threads=1):
+    """
+    Open a file written by `save_onnx_model`.
+
+    Returns:
+        tuple: (OnnxClassifier, ScalerParams with no centering or scaling,
+            LabelClasses). The scaler is already part of the graph.
+    """
+    import onnxruntime
+
+    options = onnxruntime.SessionOptions()
+    options.intra_op_num_threads = threads
+    options.inter_op_num_threads = 1
+    session = onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+    metadata = session.get_modelmeta().custom_metadata_map
+    if json.loads(metadata.get("features", "null")) != MODEL_FEATURES:
+        raise ValueError("ONNX model was exported for a different feature list")
+    preprocessor = Preprocessor.from_dict(json.loads(metadata["preprocessing"])) if "preprocessing" in metadata else None
+    classes = LabelClasses(json.loads(metadata["classes"]))
+    return OnnxClassifier(session, preprocessor), ScalerParams(None, None), classes
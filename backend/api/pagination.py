@@ -0,0 +1,79 @@
+import base64
+import json
+
+from django.conf import settings
+
+
+class KeysetPagination:
+    """
+    Keyset ("seek") pagination on the primary key with opaque cursors.
+
+    Each page is `WHERE id > <last id> ORDER BY id LIMIT n`, so deep pages are
+    as cheap as the first one (unlike OFFSET). The cursor is the last id of the
+    previous page, base64-encoded so clients treat it as opaque.
+    """
+
+    max_limit = 5000
+
+    def __init__(self, request):
+        self.request = request
+        self.default_limit = settings.REST_FRAMEWORK.get("PAGE_SIZE", 500)
+
+    @staticmethod
+    def encode_cursor(last_id):
+        raw = json.dumps({"id": last_id}).encode("utf-8")
+        return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+    @staticmethod
+    def decode_cursor(cursor):
+        """Return the last id stored in a cursor. Raises ValueError if it is malformed."""
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            last_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))["id"]
+        except (ValueError, KeyError, TypeError, UnicodeError):
+            raise ValueError("Invalid cursor.")
+        if not isinstance(last_id, int):
+            raise ValueError("Invalid cursor.")
+        return last_id
+
+    def is_requested(self):
+        """Pagination is opt-in so existing clients still get the full list."""
+        params = self.request.query_params
+        return "cursor" in params or "limit" in params
+
+    def get_limit(self):
+        value = self.request.query_params.get("limit")
+        if value is None:
+            return self.default_limit
+        try:
+            limit = int(value)
+        except ValueError:
+            raise ValueError("limit must be a positive integer.")
+        if limit <= 0:
+            raise ValueError("limit must be a positive integer.")
+        return min(limit, self.max_limit)
+
+    def paginate(self, queryset, id_of=lambda item: item.pk):
+        """
+        Return (page, next_cursor) for the current request.
+
+        `id_of` reads the id from an item of the page; pass one when the
+        queryset yields `values_list` tuples rather than model instances.
+
+        Raises:
+            ValueError: if the cursor or limit is invalid.
+        """
+        limit = self.get_limit()
+        cursor = self.request.query_params.get("cursor")
+
+        queryset = queryset.order_by("id")
+        if cursor:
+            queryset = queryset.filter(id__gt=self.decode_cursor(cursor))
+
+        # Fetch one extra row to know whether there is a next page
+        page = list(queryset[:limit + 1])
+        next_cursor = None
+        if len(page) > limit:
+            page = page[:limit]
+            next_cursor = self.encode_cursor(id_of(page[-1]))
+        return page, next_cursor
@@ -0,0 +1,232 @@
+"""
+Saving user-submitted predictions as Star and Planet rows.
+
+A star is written with one INSERT ... ON CONFLICT (name) DO UPDATE whose
+update only touches the fields the user provided, and its planet is inserted
+in the same transaction. A batch checks its planet names with one IN query,
+writes its stars with one bulk upsert per set of provided fields (usually one)
+and its planets with one bulk insert.
+
+The stars' stored positions are read first, so the tiles holding them before
+and after the write can be invalidated once the transaction commits.
+"""
+from functools import partial
+
+from django.conf import settings
+from django.db import DataError, IntegrityError, transaction
+
+from .models import Planet, Star
+from .spatial import mark_stars_changed
+from .tiles import invalidate_tiles
+
+# User-submitted rows get this suffix so they never collide with catalog rows
+USER_INPUTTED_SUFFIX = " (user inputted)"
+
+STAR_FIELDS = ["ra", "dec", "star_temp", "star_radius", "sy_dist"]
+PLANET_FIELDS = [
+    "orbital_period", "radius", "ra", "dec", "duration", "transit_depth",
+    "star_temp", "star_radius", "model_snr", "semi_major_axis",
+]
+
+DUPLICATE_PLANET_ERROR = "A planet with this name already exists."
+SAVE_ERROR = "Could not save this row."
+
+# Errors caused by a row's values, as opposed to the database being unavailable
+ROW_ERRORS = (DataError, IntegrityError, ValueError, TypeError)
+
+
+def user_inputted_name(name):
+    return name + USER_INPUTTED_SUFFIX
+
+
+def _upsert_stars(provided):
+    """
+    Insert or update user-inputted stars, each with only the fields it provides.
+
+    Args:
+        provided (dict): Star name -> {field: value} of the fields to write.
+
+    Returns:
+        dict: Star name -> Star (with its pk).
+
+    One INSERT ... ON CONFLICT (name) DO UPDATE per distinct set of provided
+    fields (usually one for a whole batch), so fields nobody provided keep
+    whatever value is stored, even if another request wrote it meanwhile.
+    Stars are written in name order, so concurrent batches lock them in the
+    same order.
+    """
+    stored = {
+        name: {"ra": ra, "dec": dec}
+        for name, ra, dec in Star.objects.filter(name__in=provided).values_list("name", "ra", "dec")
+    }
+    positions = [(values["ra"], values["dec"]) for values in stored.values()]
+    for name, values in provided.items():
+        position = {**stored.get(name, {}), **values}
+        positions.append((position.get("ra"), position.get("dec")))
+
+    groups = {}
+    for name, values in provided.items():
+        groups.setdefault(tuple(sorted(values)), []).append(name)
+
+    stars = {}
+    for fields, names in sorted(groups.items()):
+        group = [
+            Star(name=name, user_inputted=True, **provided[name])
+            for name in sorted(names)
+        ]
+        Star.objects.bulk_create(
+            group, update_conflicts=True, unique_fields=["name"],
+            update_fields=list(fields) + ["user_inputted"], batch_size=1000,
+        )
+        stars.update((star.name, star) for star in group)
+
+    missing = {name: star for name, star in stars.items() if star.pk is None}
+    if missing:  # backends that can't return ids from an upsert
+        for name, star_id in Star.objects.filter(name__in=missing).values_list("name", "id"):
+            missing[name].pk = star_id
+    # Bulk writes don't send post_save; tell the cone-search index directly
+    transaction.on_commit(mark_stars_changed)
+    transaction.on_commit(partial(
+        invalidate_tiles, positions, settings.STAR_TILE_MAX_LEVEL, settings.STAR_TILE_GRID,
+    ))
+    return stars
+
+
+def _provided_star_fields(data):
+    return {field: data[field] for field in STAR_FIELDS if data.get(field) is not None}
+
+
+def _planet(data, prediction, star):
+    return Planet(
+        user_inputted=True,
+        star=star,
+        name=user_inputted_name(data["name"]),
+        classification=prediction["classification"],
+        confidence=prediction["confidence"],
+        model_version=prediction["model_version"],
+        **{field: data.get(field) for field in PLANET_FIELDS},
+    )
+
+
+def save_prediction(data, prediction):
+    """
+    Save one classified candidate and its star, atomically.
+
+    Args:
+        data (dict): Cleaned PredictPlanet input with "name" and "star_name".
+            Star fields that are None are left as they are on an existing star.
+        prediction (dict): "classification", "confidence" and "model_version".
+
+    Returns:
+        Planet: The new planet.
+
+    Raises:
+        ValueError: if a planet with this name already exists (nothing is saved).
+    """
+    star_name = user_inputted_name(data["star_name"])
+    try:
+        with transaction.atomic():
+            star = _upsert_stars({star_name: _provided_star_fields(data)})[star_name]
+            planet = _planet(data, prediction, star)
+            planet.save(force_insert=True)
+    except IntegrityError:
+        raise ValueError(DUPLICATE_PLANET_ERROR)
+    return planet
+
+
+def _without_duplicates(rows, results, savable):
+    """
+    Drop the rows whose planet name exists (in the database or earlier in
+    `savable`) from `savable`, giving them an "error" result instead.
+    """
+    planet_names = {i: user_inputted_name(rows[i]["name"]) for i in savable}
+    existing_planets = set(
+        Planet.objects.filter(name__in=planet_names.values()).values_list("name", flat=True)
+    )
+    seen_planets = set()
+    kept = []
+    for i in savable:
+        name = planet_names[i]
+        if name in existing_planets or name in seen_planets:
+            results[i]["error"] = DUPLICATE_PLANET_ERROR
+        else:
+            kept.append(i)
+        seen_planets.add(name)
+    return kept
+
+
+def _save_rows(rows, results, savable, attempts):
+    """Save the `savable` rows in one transaction; see save_predictions."""
+    for attempt in range(1, attempts + 1):
+        try:
+            with transaction.atomic():
+                savable = _without_duplicates(rows, results, savable)
+                if not savable:
+                    return []
+
+                star_names = {i: user_inputted_name(rows[i]["star_name"]) for i in savable}
+                provided = {}
+                for i in savable:
+                    provided.setdefault(star_names[i], {}).update(_provided_star_fields(rows[i]))
+                stars = _upsert_stars(provided)
+
+                planets = [_planet(rows[i], results[i], stars[star_names[i]]) for i in savable]
+                Planet.objects.bulk_create(planets, batch_size=1000)
+        except IntegrityError:
+            if attempt == attempts:
+                raise
+            continue
+        return list(zip(savable, planets))
+
+
+def _row_error(exception):
+    print("⚠️ Could not save a prediction row:", exception)
+    # Field conversion errors name the field; database errors may contain SQL
+    return str(exception) if isinstance(exception, (ValueError, TypeError)) else SAVE_ERROR
+
+
+def save_predictions(rows, results, attempts=2):
+    """
+    Save the classified rows that have both a planet and a star name, atomically.
+
+    Rows whose planet name already exists (in the database or earlier in the
+    batch) get an "error" in their result instead. Later rows for the same star
+    override the star fields they provide; fields no row provides are left as
+    they are.
+
+    If the batch can't be written because of a row's values (a value the
+    database rejects, or planet names that keep colliding), the rows are saved
+    one at a time and the failing ones get an "error" instead, so one bad row
+    doesn't lose the others.
+
+    Args:
+        rows (list[dict]): Cleaned PredictPlanet inputs.
+        results (list[dict]): One prediction or {"error": ...} per row.
+        attempts (int): Tries when a concurrent request inserts one of the
+            planet names between the duplicate check and the insert; the next
+            try reports it as a duplicate.
+
+    Returns:
+        list: (index, Planet) for each saved row, in order.
+
+    Raises:
+        DatabaseError: for errors that aren't about the rows (lost connection...).
+    """
+    savable = [
+        i for i, (row, result) in enumerate(zip(rows, results))
+        if "error" not in result and row.get("star_name") and row.get("name")
+    ]
+    try:
+        return _save_rows(rows, results, savable, attempts)
+    except ROW_ERRORS as e:
+        if len(savable) == 1:
+            results[savable[0]]["error"] = _row_error(e)
+            return []
+
+    saved = []
+    for i in savable:
+        try:
+            saved += _save_rows(rows, results, [i], attempts)
+        except ROW_ERRORS as e:
+            results[i]["error"] = _row_error(e)
+    return saved
@@ -0,0 +1,126 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+class LocalLRUCache:
+    """In-process LRU cache with a per-entry TTL."""
+
+    def __init__(self, max_entries=10000, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                expires_at, value = entry
+                if expires_at is not None and expires_at < now:
+                    del self._entries[key]
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = value
+        return found
+
+    def set_many(self, items):
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            for key, value in items.items():
+                self._entries[key] = (expires_at, value)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DjangoCacheBackend:
+    """Stores predictions in a Django cache (shared across workers with Redis/Memcached/DB caches)."""
+
+    def __init__(self, alias="default", ttl=3600):
+        from django.core.cache import caches
+
+        self.cache = caches[alias]
+        self.ttl = ttl
+
+    def get_many(self, keys):
+        return self.cache.get_many(keys)
+
+    def set_many(self, items):
+        self.cache.set_many(items, timeout=self.ttl or None)
+
+    def clear(self):
+        self.cache.clear()
+
+
+class PredictionCache:
+    """
+    Cache of (classification, confidence) keyed on the rounded feature vector
+    plus the model version, so a new model never serves stale predictions.
+    """
+
+    def __init__(self, backend, precision=6):
+        self.backend = backend
+        self.precision = precision
+        self.hits = 0
+        self.misses = 0
+        self._counter_lock = threading.Lock()
+
+    def make_key(self, features, model_version):
+        """Key for one feature row, rounded to `precision` significant digits."""
+        vector = ",".join(f"{float(value):.{self.precision}g}" for value in features)
+        digest = hashlib.sha1(vector.encode("utf-8")).hexdigest()
+        return f"exoplanet-prediction:{model_version}:{digest}"
+
+    def get_many(self, keys):
+        found = self.backend.get_many(keys)
+        with self._counter_lock:
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def set_many(self, items):
+        if items:
+            self.backend.set_many(items)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        stats = {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+        if isinstance(self.backend, LocalLRUCache):
+            stats["entries"] = len(self.backend)
+        return stats
+
+
+def build_prediction_cache(config):
+    """
+    Build a PredictionCache from the ML_PREDICTION_CACHE setting, or return
+    None when the cache is disabled.
+    """
+    backend_name = config.get("BACKEND", "local")
+    ttl = config.get("TTL", 3600)
+    if backend_name in (None, "", "none"):
+        return None
+    if backend_name == "local":
+        backend = LocalLRUCache(max_entries=config.get("MAX_ENTRIES", 10000), ttl=ttl)
+    elif backend_name == "django":
+        backend = DjangoCacheBackend(alias=config.get("ALIAS", "default"), ttl=ttl)
+    else:
+        raise ValueError(f"Unknown prediction cache backend: {backend_name!r}")
+    return PredictionCache(backend, precision=config.get("PRECISION", 6))
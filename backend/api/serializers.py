@@ -1,4 +1,5 @@
-from rest_framework import serializers
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
 import math
 from .models import Star, Planet
 
@@ -20,7 +21,7 @@ class StarSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Star
-        fields = "__all__"
+        exclude = ["content_hash"]
 
 class PlanetSerializer(serializers.ModelSerializer):
     orbital_period = SafeFloatField()
@@ -34,4 +35,89 @@ class PlanetSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Planet
-        fields = "__all__"
\ No newline at end of file
+        exclude = ["content_hash"]
+
+
+def _safe_float_column(column):
+    """SafeFloatField.to_representation for a whole column at once."""
+    isfinite = math.isfinite
+    return [
+        None if value is None or not isfinite(value) else float(value)
+        for value in column
+    ]
+
+
+def _datetime_column(field):
+    """
+    DateTimeField.to_representation for a whole column.
+
+    The field's timezone is resolved once per column instead of once per
+    value. Anything but ISO 8601 output of aware datetimes goes through DRF.
+    """
+    def convert(column):
+        output_format = getattr(field, "format", api_settings.DATETIME_FORMAT)
+        if output_format is None or output_format.lower() != ISO_8601:
+            return [field.to_representation(value) for value in column]
+
+        field_timezone = field.timezone if hasattr(field, "timezone") else field.default_timezone()
+        output = []
+        for value in column:
+            if not value:
+                output.append(None)
+            elif field_timezone is None or value.tzinfo is None:
+                output.append(field.to_representation(value))
+            else:
+                text = value.astimezone(field_timezone).isoformat()
+                output.append(text[:-6] + "Z" if text.endswith("+00:00") else text)
+        return output
+    return convert
+
+
+class FastCatalogSerializer:
+    """
+    Read-only fast path for the catalog list endpoints.
+
+    Produces the same output as `serializer_class(queryset, many=True).data`
+    but skips per-field DRF calls: rows come straight from `values_list()`
+    and each float/datetime column is converted in one pass. The `id`
+    column is always fetched (for keyset paging) even when not requested.
+    """
+
+    def __init__(self, serializer_class, fields=None):
+        declared = serializer_class().fields
+        self.fields = list(fields) if fields else list(declared)
+        self.columns = self.fields if "id" in self.fields else ["id"] + self.fields
+        self.id_index = self.columns.index("id")
+
+        self._converters = []
+        for name in self.fields:
+            field = declared[name]
+            if isinstance(field, serializers.FloatField):
+                convert = _safe_float_column
+            elif isinstance(field, serializers.DateTimeField):
+                convert = _datetime_column(field)
+            else:
+                convert = None  # ids, strings and booleans come out of the DB as-is
+            self._converters.append((self.columns.index(name), convert))
+
+    def rows(self, queryset):
+        """The queryset as `values_list` tuples in `self.columns` order."""
+        return queryset.values_list(*self.columns)
+
+    def id_of(self, row):
+        return row[self.id_index]
+
+    def to_representation(self, rows):
+        """Convert `rows()` tuples into a list of dicts."""
+        if not rows:
+            return []
+        columns = list(zip(*rows))
+        output = [
+            columns[index] if convert is None else convert(columns[index])
+            for index, convert in self._converters
+        ]
+        fields = self.fields
+        return [dict(zip(fields, values)) for values in zip(*output)]
+
+    def serialize(self, queryset):
+        return self.to_representation(list(self.rows(queryset)))
@@ -0,0 +1,111 @@
+import threading
+import time
+
+import numpy as np
+from django.db.models import Count, Max, Sum
+from django.db.models.signals import post_delete, post_save
+
+from .models import Star
+
+# How often (seconds) to re-check the stars table for changes made by other
+# processes (bulk loads, other workers). Changes made through this process's
+# ORM saves/deletes are picked up immediately through signals.
+CHECK_INTERVAL = 60
+
+
+def radec_to_unit_vectors(ra, dec):
+    """RA/Dec in degrees -> (n, 3) unit vectors on the celestial sphere."""
+    ra = np.radians(np.asarray(ra, dtype=np.float64))
+    dec = np.radians(np.asarray(dec, dtype=np.float64))
+    cos_dec = np.cos(dec)
+    return np.column_stack([cos_dec * np.cos(ra), cos_dec * np.sin(ra), np.sin(dec)])
+
+
+class StarIndex:
+    """
+    KD-tree over star positions as 3D unit vectors.
+
+    Euclidean (chord) distance between unit vectors is monotonic in angular
+    distance, so a nearest-neighbour query bounded by the chord of the search
+    radius returns the stars in the cone, closest first.
+    """
+
+    def __init__(self, ids, ra, dec):
+        from scipy.spatial import cKDTree
+
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.tree = cKDTree(radec_to_unit_vectors(ra, dec)) if len(self.ids) else None
+
+    @classmethod
+    def from_database(cls):
+        rows = np.array(
+            list(Star.objects.filter(ra__isnull=False, dec__isnull=False).values_list("id", "ra", "dec")),
+            dtype=np.float64,
+        ).reshape(-1, 3)
+        rows = rows[np.isfinite(rows).all(axis=1)]
+        return cls(rows[:, 0], rows[:, 1], rows[:, 2])
+
+    def __len__(self):
+        return len(self.ids)
+
+    def cone(self, ra, dec, radius, limit=100):
+        """
+        Stars within `radius` degrees of (ra, dec), nearest first.
+
+        Returns:
+            list[tuple]: (star_id, angular distance in degrees), at most `limit`.
+        """
+        if self.tree is None:
+            return []
+        radius = min(radius, 180.0)
+        chord = 2.0 * np.sin(np.radians(radius) / 2.0)
+        k = min(limit, len(self.ids))
+        # Tiny slack so stars exactly on the edge aren't lost to rounding
+        distances, indices = self.tree.query(
+            radec_to_unit_vectors([ra], [dec])[0], k=k, distance_upper_bound=chord + 1e-12
+        )
+        distances, indices = np.atleast_1d(distances), np.atleast_1d(indices)
+        found = np.isfinite(distances)
+        angles = np.degrees(2.0 * np.arcsin(np.clip(distances[found] / 2.0, 0.0, 1.0)))
+        return list(zip(self.ids[indices[found]].tolist(), angles.tolist()))
+
+
+_index = None
+_fingerprint = None
+_checked_at = 0.0
+_dirty = True
+_lock = threading.Lock()
+
+
+def _stars_fingerprint():
+    """Cheap summary that changes when stars are added, removed or moved."""
+    summary = Star.objects.aggregate(count=Count("id"), max_id=Max("id"), ra=Sum("ra"), dec=Sum("dec"))
+    # str() so NaN sums compare equal to themselves
+    return tuple(str(value) for value in summary.values())
+
+
+def get_star_index():
+    """Return the process-wide StarIndex, rebuilding it when stars changed."""
+    global _index, _fingerprint, _checked_at, _dirty
+    with _lock:
+        now = time.monotonic()
+        if _index is not None and not _dirty and now - _checked_at < CHECK_INTERVAL:
+            return _index
+
+        fingerprint = _stars_fingerprint()
+        if _index is None or _dirty or fingerprint != _fingerprint:
+            _index = StarIndex.from_database()
+            _fingerprint = fingerprint
+            _dirty = False
+        _checked_at = now
+        return _index
+
+
+def mark_stars_changed(**kwargs):
+    """Signal receiver: rebuild the index on next use."""
+    global _dirty
+    _dirty = True
+
+
+post_save.connect(mark_stars_changed, sender=Star, dispatch_uid="star_index_post_save")
+post_delete.connect(mark_stars_changed, sender=Star, dispatch_uid="star_index_post_delete")
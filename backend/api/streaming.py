@@ -0,0 +1,82 @@
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+def dumps(row):
+    """Compact JSON, same separators and unicode handling as DRF's JSONRenderer."""
+    return json.dumps(row, separators=(",", ":"), ensure_ascii=False)
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Newline-delimited JSON, one object per line.
+
+    Registering it on a view makes DRF accept `?format=ndjson` and
+    `Accept: application/x-ndjson`. Catalog views stream their rows themselves;
+    this renderer only handles regular (e.g. error) responses.
+    """
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        rows = data if isinstance(data, list) else [data]
+        return "".join(dumps(row) + "\n" for row in rows).encode("utf-8")
+
+
+def iter_rows(queryset, serializer, chunk_size=2000):
+    """
+    Yield one dict per row, `chunk_size` rows per query.
+
+    `serializer` is a FastCatalogSerializer. Chunks are fetched by primary key
+    (`id > last_id ORDER BY id`) instead of a server-side cursor, which keeps
+    memory flat and also works behind transaction-pooling proxies such as
+    PgBouncer/Neon's pooler.
+    """
+    queryset = serializer.rows(queryset.order_by("id"))
+
+    last_id = None
+    while True:
+        chunk = queryset if last_id is None else queryset.filter(id__gt=last_id)
+        rows = list(chunk[:chunk_size])
+        if not rows:
+            return
+        yield from serializer.to_representation(rows)
+        if len(rows) < chunk_size:
+            return
+        last_id = serializer.id_of(rows[-1])
+
+
+def stream_ndjson(rows):
+    """Encode rows as NDJSON lines, one at a time."""
+    for row in rows:
+        yield dumps(row) + "\n"
+
+
+def stream_json_array(rows):
+    """Encode rows as one JSON array without building it in memory."""
+    yield "["
+    first = True
+    for row in rows:
+        if first:
+            first = False
+            yield dumps(row)
+        else:
+            yield "," + dumps(row)
+    yield "]"
+
+
+def buffered(chunks, size=64 * 1024):
+    """Join small string chunks into ~`size` byte pieces to cut write calls."""
+    buffer = []
+    length = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield "".join(buffer)
+            buffer = []
+            length = 0
+    if buffer:
+        yield "".join(buffer)
@@ -1,7 +1,42 @@
-from django.test import TestCase
+import hashlib
+import importlib.util
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import uuid
+from datetime import timedelta
+from unittest import mock, skipUnless
+
+import numpy as np
+from django.apps import apps as django_apps
+from django.core.signals import request_started
+from django.db import OperationalError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.core.management import CommandError, call_command
 from django.contrib.auth.models import User
 from rest_framework.test import APIClient
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from sklearn.preprocessing import LabelEncoder, RobustScaler
+
+from . import ai_model, apps, catalog, features, jobs, persistence, spatial, views
+from .batching import MicroBatcher
+from .prediction_cache import LocalLRUCache
+from .views import CatalogStreamMixin
+from .inference import NumpyMLP, load_shared_weights, save_shared_weights
+from .fetcher import fetch_files
+from .model_registry import ModelRegistry
+
+HAS_TENSORFLOW = importlib.util.find_spec("tensorflow") is not None
+HAS_ONNX = all(importlib.util.find_spec(name) is not None for name in ("onnx", "onnxruntime"))
+from .models import Planet, PredictionJob, Star, StarTile
+from .serializers import FastCatalogSerializer, PlanetSerializer, StarSerializer
 
 # Create your tests here.
 class UserAuthTests(TestCase):
@@ -69,4 +104,1519 @@ class UserAuthTests(TestCase):
             "password": "wrongpassword"
         }
         response = self.client.post(self.loginUrl, invalidLoginData)
-        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+class FakeModel:
+    """Stand-in for the Keras model: confidence follows the first scaled feature."""
+
+    def __init__(self):
+        self.rows_seen = 0
+
+    def predict(self, x, verbose=0):
+        self.rows_seen += len(x)
+        x = np.asarray(x)
+        first = 1.0 / (1.0 + np.exp(-x[:, 0]))
+        return np.stack([first, 1.0 - first, np.zeros(len(x))], axis=1)
+
+
+def make_fake_resources():
+    """Build a small scaler, label encoder and fake model for the classifier."""
+    rng = np.random.default_rng(0)
+    scaler = RobustScaler().fit(rng.normal(size=(50, 7)))
+    label_encoder = LabelEncoder().fit(["candidate", "confirmed", "false_positive"])
+    preprocessor = features.Preprocessor(dict(zip(features.RAW_FEATURES, [10, 3, 500, 2, 5700, 1, 25])))
+    return {
+        "active": ai_model.LoadedModel(FakeModel(), scaler, label_encoder, preprocessor, "test-model"),
+        # Start every test with an empty prediction cache
+        "_prediction_cache": None,
+    }
+
+
+VALID_ROW = {
+    "orbital_period": "10.5", "duration": "3.2", "transit_depth": "500",
+    "radius": "2.1", "star_temp": "5700", "star_radius": "1.0", "model_snr": "25",
+}
+
+
+class ClassifyBatchTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.multiple(ai_model, **make_fake_resources())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def testBatchMatchesSingleClassify(self):
+        rows = [dict(VALID_ROW, orbital_period=str(p)) for p in (1, 10, 100, 1000)]
+        results = ai_model.classify_batch(rows, chunk_size=3)
+        for row, result in zip(rows, results):
+            label, confidence, version = ai_model.classify(row, return_version=True)
+            self.assertEqual(result, {"classification": label, "confidence": confidence, "model_version": version})
+
+    def testInvalidRowsReportedPerRow(self):
+        rows = [VALID_ROW, dict(VALID_ROW, radius="abc"), dict(VALID_ROW, model_snr=None, duration=None)]
+        results = ai_model.classify_batch(rows)
+        self.assertIn("classification", results[0])
+        self.assertIn("error", results[1])
+        self.assertIn("error", results[2])
+
+    def testInfinityIsImputedLikeAMissingField(self):
+        imputed = ai_model.classify_batch([dict(VALID_ROW, radius=None)])[0]
+        for value in ("inf", "-inf", "nan"):
+            result = ai_model.classify_batch([dict(VALID_ROW, radius=value)])[0]
+            self.assertEqual(result, imputed)
+            self.assertTrue(np.isfinite(result["confidence"]))
+        self.assertIn("error", ai_model.classify_batch([dict(VALID_ROW, radius="inf", duration="inf")])[0])
+        np.testing.assert_array_equal(features.mask_invalid([[np.inf, -np.inf, 1, 1, 1, 1, 1]])[0, :2], [np.nan] * 2)
+
+
+class PredictBatchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = "/api/predict/batch/"
+        patcher = mock.patch.multiple(ai_model, **make_fake_resources())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def testBatchSavesRowsAndReportsErrors(self):
+        rows = [
+            dict(VALID_ROW, name="b", star_name="Sun", ra="10"),
+            dict(VALID_ROW, name="c", star_name="Sun", sy_dist="4.2"),
+            dict(VALID_ROW, radius="", model_snr=""),
+            dict(VALID_ROW),
+        ]
+        response = self.client.post(self.url, {"rows": rows}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        results = response.data["results"]
+        self.assertEqual(response.data["saved"], 2)
+        self.assertEqual(response.data["errors"], 1)
+        self.assertEqual(results[0]["name"], "b (user inputted)")
+        self.assertIn("error", results[2])
+        self.assertNotIn("id", results[3])
+        self.assertIn("classification", results[3])
+
+        star = Star.objects.get(name="Sun (user inputted)")
+        self.assertEqual(star.ra, 10)
+        self.assertEqual(star.sy_dist, 4.2)
+        self.assertEqual(star.planets.count(), 2)
+
+    def testDuplicatePlanetNameIsRowError(self):
+        rows = [dict(VALID_ROW, name="b", star_name="Sun")] * 2
+        response = self.client.post(self.url, rows, format="json")
+        self.assertEqual(response.data["saved"], 1)
+        self.assertIn("error", response.data["results"][1])
+        self.assertEqual(Planet.objects.count(), 1)
+
+    def testInvalidSaveFieldIsRowError(self):
+        rows = [
+            dict(VALID_ROW, name="b", star_name="Sun", ra="abc"),
+            dict(VALID_ROW, name="c", star_name="Sun", dec="inf"),
+            dict(VALID_ROW, name="d", star_name="Sun", ra="12.5", sy_dist=3),
+        ]
+        response = self.client.post(self.url, rows, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data["saved"], response.data["errors"]), (1, 2))
+        results = response.data["results"]
+        self.assertEqual(results[0], {"error": "Invalid numeric value for: ra."})
+        self.assertEqual(results[1], {"error": "Invalid numeric value for: dec."})
+        self.assertEqual(Planet.objects.get().name, "d (user inputted)")
+        self.assertEqual(Star.objects.get().ra, 12.5)
+
+    def testRejectsNonListBody(self):
+        response = self.client.post(self.url, {"rows": "nope"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def testStarsWrittenWithOneUpsert(self):
+        Star.objects.create(name="Sun (user inputted)", ra=1, dec=2, star_temp=5000)
+        rows = [dict(VALID_ROW, name=f"p{i}", star_name=f"S{i % 3}") for i in range(30)]
+        rows += [dict(VALID_ROW, name="q", star_name="Sun", star_temp="", dec="3")]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, rows, format="json")
+        self.assertEqual(response.data["saved"], 31)
+        writes = [q["sql"] for q in queries.captured_queries if not q["sql"].startswith(("SAVEPOINT", "RELEASE"))]
+        # Planet name check, star positions (for the tiles), one star upsert per
+        # set of provided star fields (star_temp + star_radius, dec + star_radius),
+        # planet insert
+        self.assertEqual(len(writes), 5, writes)
+
+        star = Star.objects.get(name="Sun (user inputted)")
+        self.assertEqual((star.ra, star.dec, star.star_temp, star.user_inputted), (1, 3, 5000, True))
+        self.assertEqual(Star.objects.count(), 4)
+
+
+    def testConcurrentlyInsertedPlanetIsRowError(self):
+        without_duplicates = persistence._without_duplicates
+        calls = []
+
+        def racing_check(rows, results, savable):
+            # The first check runs before another request's "c" is committed
+            kept = without_duplicates(rows, results, savable) if calls else list(savable)
+            calls.append(kept)
+            return kept
+
+        Planet.objects.create(name="c (user inputted)", classification="candidate")
+        rows = [dict(VALID_ROW, name=name, star_name="Sun") for name in "bcd"]
+        with mock.patch.object(persistence, "_without_duplicates", racing_check):
+            response = self.client.post(self.url, rows, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(calls, [[0, 1, 2], [0, 2]])
+        self.assertEqual(response.data["saved"], 2)
+        self.assertEqual(response.data["results"][1]["error"], "A planet with this name already exists.")
+        self.assertEqual(Planet.objects.filter(star__name="Sun (user inputted)").count(), 2)
+
+
+class PredictPlanetSaveTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = "/api/predict/"
+        patcher = mock.patch.multiple(ai_model, **make_fake_resources())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def testExistingStarOnlyGetsProvidedFields(self):
+        Star.objects.create(name="Sun (user inputted)", ra=1, dec=2, sy_dist=4.2)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, dict(VALID_ROW, name="b", star_name="Sun", dec="5"), format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        writes = [q["sql"] for q in queries.captured_queries if not q["sql"].startswith(("SAVEPOINT", "RELEASE"))]
+        self.assertEqual(len(writes), 3, writes)  # star positions (for the tiles), star upsert, planet insert
+
+        star = Star.objects.get(name="Sun (user inputted)")
+        self.assertEqual((star.ra, star.dec, star.sy_dist, star.user_inputted), (1, 5, 4.2, True))
+        self.assertEqual(response.data["star"], star.id)
+
+    def testInvalidSaveFieldIs400(self):
+        response = self.client.post(self.url, dict(VALID_ROW, name="b", star_name="Sun", ra="abc"), format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["error"], "Invalid numeric value for: ra.")
+        self.assertFalse(Star.objects.exists())
+
+    def testDuplicatePlanetLeavesStarUntouched(self):
+        self.client.post(self.url, dict(VALID_ROW, name="b", star_name="Sun", ra="1"), format="json")
+        response = self.client.post(self.url, dict(VALID_ROW, name="b", star_name="Sun", ra="9"), format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Star.objects.get().ra, 1)
+        self.assertEqual(Planet.objects.count(), 1)
+
+
+def to_csv(rows, columns):
+    lines = [",".join(columns)] + [",".join(str(row.get(column, "")) for column in columns) for row in rows]
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+@mock.patch.object(views.PredictPlanetUpload, "chunk_size", 2)
+class PredictUploadTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = "/api/predict/upload/"
+        patcher = mock.patch.multiple(ai_model, **make_fake_resources())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.columns = list(VALID_ROW) + ["name", "star_name"]
+        self.rows = [dict(VALID_ROW, name=f"p{i}", star_name="Sun") for i in range(4)]
+        self.rows.append(dict(VALID_ROW, radius="", model_snr=""))
+
+    def upload(self, body, **headers):
+        response = self.client.post(self.url, body, content_type=headers.pop("content_type", "text/csv"), headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        chunks = [chunk.decode("utf-8") for chunk in response.streaming_content]
+        return chunks, [json.loads(line) for line in "".join(chunks).splitlines()]
+
+    def testGzipCsvStreamsResultsPerChunk(self):
+        import gzip
+
+        chunks, lines = self.upload(gzip.compress(to_csv(self.rows, self.columns)), content_encoding="gzip")
+        self.assertEqual(len(chunks), 4)  # 3 chunks of rows, then the summary
+        self.assertEqual([line.get("row") for line in lines[:5]], [0, 1, 2, 3, 4])
+        self.assertEqual(lines[0]["name"], "p0 (user inputted)")
+        self.assertIn("error", lines[4])
+        self.assertEqual(lines[5], {"rows": 5, "saved": 4, "errors": 1})
+        self.assertEqual(Planet.objects.count(), 4)
+
+    def testRowsAreClassifiedAsTheyArrive(self):
+        body = to_csv(self.rows[:4], self.columns)
+        with mock.patch.object(views.PredictPlanetUpload, "classify_rows", autospec=True,
+                               side_effect=views.PredictPlanetUpload.classify_rows) as classify_rows:
+            self.upload(body)
+        self.assertEqual([len(call.args[1]) for call in classify_rows.call_args_list], [2, 2])
+
+    def testMissingColumnsRejectedUpFront(self):
+        response = self.client.post(self.url, to_csv(self.rows, ["name", "radius"]), content_type="text/csv")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("orbital_period", response.data["error"])
+
+    def testMalformedLineEndsStream(self):
+        body = "".join(json.dumps(row) + "\n" for row in self.rows[:3]) + "[1, 2]\n" + json.dumps(self.rows[3])
+        _, lines = self.upload(body.encode("utf-8"), content_type="application/x-ndjson")
+        self.assertEqual([line["row"] for line in lines], [0, 1, 2, 3])
+        self.assertEqual(lines[-1]["error"], "Line 4: expected a JSON object.")
+        self.assertEqual(Planet.objects.count(), 3)
+
+    def testFailedChunkGetsErrorLineAndSummary(self):
+        body = to_csv(self.rows, self.columns)
+        save_batch = views.PredictPlanetUpload.save_batch
+
+        def failing_second_chunk(view, rows, results):
+            if rows[0]["name"] == "p2":
+                raise OperationalError("connection lost")
+            return save_batch(view, rows, results)
+
+        with mock.patch.object(views.PredictPlanetUpload, "save_batch", autospec=True,
+                               side_effect=failing_second_chunk):
+            _, lines = self.upload(body)
+        self.assertEqual([line.get("row") for line in lines[:2]], [0, 1])
+        self.assertEqual(lines[2], {"error": "Error while saving.", "row": 2, "rows": 2})
+        self.assertEqual(lines[3]["row"], 4)
+        self.assertEqual(lines[4], {"rows": 5, "saved": 2, "errors": 3})
+
+    def testRejectsUnknownEncoding(self):
+        response = self.client.post(self.url, b"x", content_type="text/csv", headers={"content-encoding": "br"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(ML_PREDICTION_JOBS={"IN_PROCESS": False, "CHUNK_SIZE": 2, "MAX_ROWS": 10})
+class PredictionJobTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = "/api/predict/jobs/"
+        patcher = mock.patch.multiple(ai_model, **make_fake_resources())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.rows = [dict(VALID_ROW, name=f"p{i}", star_name="Sun") for i in range(4)]
+        self.rows.append(dict(VALID_ROW, radius="", model_snr=""))
+        self.columns = list(VALID_ROW) + ["name", "star_name"]
+
+    def submit(self, body, content_type="text/csv"):
+        response = self.client.post(self.url, body, content_type=content_type)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        return response.data
+
+    def testCsvJobRunsToCompletion(self):
+        job = self.submit(to_csv(self.rows, self.columns))
+        self.assertEqual((job["status"], job["total_rows"]), ("queued", 5))
+        self.assertEqual(jobs.work("test-worker"), 1)
+
+        response = self.client.get(job["url"], {"limit": 3})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["status"], "done")
+        self.assertEqual(
+            [response.data[key] for key in ("processed_rows", "saved_rows", "error_rows", "progress")],
+            [5, 4, 1, 1.0],
+        )
+        self.assertEqual([result["row"] for result in response.data["results"]], [0, 1, 2])
+        self.assertEqual(response.data["results"][0]["name"], "p0 (user inputted)")
+
+        rest = self.client.get(job["url"], {"cursor": response.data["next"]}).data
+        self.assertEqual([result["row"] for result in rest["results"]], [3, 4])
+        self.assertIn("error", rest["results"][1])
+        self.assertIsNone(rest["next"])
+        self.assertEqual(Planet.objects.filter(star__name="Sun (user inputted)").count(), 4)
+
+    def testNdjsonUpload(self):
+        body = "".join(json.dumps(row) + "\n" for row in self.rows[:2]).encode("utf-8")
+        job = self.submit(body, content_type="application/x-ndjson")
+        jobs.work("test-worker")
+        self.assertEqual(PredictionJob.objects.get(pk=job["id"]).saved_rows, 2)
+
+    def testBadRowsAreRowErrorsNotJobFailures(self):
+        rows = [dict(VALID_ROW, name=f"p{i}", star_name="Sun") for i in range(10)]
+        rows[3]["ra"] = "abc"  # caught before classification
+        rows[6]["star_name"] = ["not", "a", "name"]  # only fails when saved
+        body = "".join(json.dumps(row) + "\n" for row in rows).encode("utf-8")
+        job = self.submit(body, content_type="application/x-ndjson")
+        jobs.work("test-worker")
+
+        job = PredictionJob.objects.get(pk=job["id"])
+        self.assertEqual(job.status, PredictionJob.DONE)
+        self.assertEqual((job.processed_rows, job.saved_rows, job.error_rows), (10, 8, 2))
+        errors = {row.index: row.result["error"] for row in job.rows.all() if "error" in row.result}
+        self.assertEqual(set(errors), {3, 6})
+        self.assertIn("ra", errors[3])
+        # The other row of the failing chunk is still saved
+        self.assertTrue(Planet.objects.filter(name="p7 (user inputted)").exists())
+
+    def testRejectsBadUploads(self):
+        for body, content_type in [
+            (to_csv(self.rows, self.columns), "application/json"),
+            (b"{not json}\n", "application/x-ndjson"),
+            (to_csv(self.rows * 3, self.columns), "text/csv"),
+            (b"", "text/csv"),
+        ]:
+            response = self.client.post(self.url, body, content_type=content_type)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, body[:20])
+        self.assertFalse(PredictionJob.objects.exists())
+
+    def testCrashedJobResumesFromLastChunk(self):
+        job = PredictionJob.objects.get(pk=self.submit(to_csv(self.rows, self.columns))["id"])
+        claimed = jobs.claim_job("worker-a")
+
+        # The worker dies during its second chunk
+        classify_rows = views.PredictPlanetBatch.classify_rows
+        calls = []
+
+        def dying_classify_rows(view, rows):
+            calls.append(len(rows))
+            if len(calls) == 2:
+                raise SystemExit("worker killed")
+            return classify_rows(view, rows)
+
+        with mock.patch.object(views.PredictPlanetBatch, "classify_rows", dying_classify_rows):
+            with self.assertRaises(SystemExit):
+                jobs.process_job(claimed, "worker-a")
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed_rows), ("running", 2))
+
+        # Still heartbeating recently: nobody else may take it over
+        self.assertIsNone(jobs.claim_job("worker-b"))
+
+        PredictionJob.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now() - timedelta(minutes=5))
+        with mock.patch.object(views.PredictPlanetBatch, "classify_rows", autospec=True,
+                               side_effect=classify_rows) as resumed:
+            self.assertEqual(jobs.work("worker-b"), 1)
+        self.assertEqual([len(call.args[1]) for call in resumed.call_args_list], [2, 1])
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker, job.processed_rows, job.saved_rows), ("done", "worker-b", 5, 4))
+        self.assertEqual(Planet.objects.count(), 4)
+
+        # worker-a's lease is gone, so it can't write any more
+        with self.assertRaises(jobs.JobLost):
+            jobs._heartbeat(job, "worker-a")
+
+    def testUnknownJob(self):
+        response = self.client.get(f"{self.url}{uuid.uuid4()}/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+def build_keras_classifier(seed=0):
+    """Same architecture as network/NN.py, with randomized BatchNorm statistics."""
+    import tensorflow as tf
+    from tensorflow import keras
+    from tensorflow.keras import layers  # type: ignore
+
+    tf.keras.utils.set_random_seed(seed)
+    inputs = keras.Input(shape=(7,))
+    x = layers.Dense(128, activation="relu")(inputs)
+    x = layers.BatchNormalization()(x)
+    x = layers.Dropout(0.3)(x)
+    x = layers.Dense(64, activation="relu")(x)
+    x = layers.BatchNormalization()(x)
+    x = layers.Dropout(0.2)(x)
+    x = layers.Dense(32, activation="relu")(x)
+    outputs = layers.Dense(3, activation="softmax")(x)
+    model = keras.Model(inputs, outputs)
+
+    rng = np.random.default_rng(seed)
+    for layer in model.layers:
+        if isinstance(layer, layers.BatchNormalization):
+            size = layer.gamma.shape[0]
+            layer.set_weights([
+                rng.uniform(0.5, 1.5, size), rng.normal(size=size),
+                rng.normal(size=size), rng.uniform(0.5, 2.0, size),
+            ])
+    return model
+
+
+@skipUnless(HAS_TENSORFLOW, "TensorFlow is not installed")
+class NumpyBackendParityTests(TestCase):
+    def testMatchesKerasOutputs(self):
+        keras_model = build_keras_classifier()
+        numpy_model = NumpyMLP.from_keras(keras_model)
+        x = np.random.default_rng(1).normal(size=(256, 7)) * 3
+
+        expected = keras_model.predict(x, verbose=0)
+        actual = numpy_model.predict(x)
+        np.testing.assert_allclose(actual, expected, atol=1e-5)
+        np.testing.assert_array_equal(actual.argmax(axis=1), expected.argmax(axis=1))
+
+    def testFoldsBatchNormIntoLinearDense(self):
+        from tensorflow import keras
+        from tensorflow.keras import layers  # type: ignore
+
+        inputs = keras.Input(shape=(7,))
+        x = layers.Dense(16)(inputs)
+        x = layers.BatchNormalization()(x)
+        outputs = layers.Dense(3, activation="softmax")(x)
+        keras_model = keras.Model(inputs, outputs)
+        bn = keras_model.layers[2]
+        rng = np.random.default_rng(2)
+        bn.set_weights([rng.uniform(0.5, 1.5, 16), rng.normal(size=16), rng.normal(size=16), rng.uniform(0.5, 2, 16)])
+
+        numpy_model = NumpyMLP.from_keras(keras_model)
+        self.assertEqual(len(numpy_model.layers), 2)
+        x = rng.normal(size=(32, 7))
+        np.testing.assert_allclose(numpy_model.predict(x), keras_model.predict(x, verbose=0), atol=1e-5)
+
+
+class ModelReadinessTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = "/api/ready/"
+
+    def testNotReadyReturns503(self):
+        with mock.patch.multiple(ai_model, active=None):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertFalse(response.data["ready"])
+
+    def testReadyReturns200(self):
+        with mock.patch.multiple(ai_model, **make_fake_resources()):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data["ready"])
+
+    def testImportingViewsSkipsHeavyModules(self):
+        code = (
+            "import sys, django; django.setup(); import api.views; "
+            "print('heavy:', [m for m in ('tensorflow', 'pandas', 'joblib') if m in sys.modules])"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True,
+            env={**os.environ, "DJANGO_SETTINGS_MODULE": "site_settings.settings", "ML_WARMUP_ON_STARTUP": "0"},
+        )
+        self.assertIn("heavy: []", result.stdout)
+
+
+def make_random_mlp(seed=0):
+    rng = np.random.default_rng(seed)
+    sizes = [7, 16, 8, 3]
+    activations = ["relu", "relu", "softmax"]
+    return NumpyMLP([
+        (rng.normal(size=(n_in, n_out)), rng.normal(size=n_out), activation)
+        for n_in, n_out, activation in zip(sizes, sizes[1:], activations)
+    ])
+
+
+class BackgroundThreadStartupTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.multiple(apps, _started_in_pid=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(request_started.disconnect, dispatch_uid="api_background_threads")
+        for name, target, attribute in [("warm_up", ai_model, "warm_up_in_background"),
+                                        ("start_workers", jobs, "start_workers")]:
+            patcher = mock.patch.object(target, attribute)
+            setattr(self, name, patcher.start())
+            self.addCleanup(patcher.stop)
+
+    def ready(self, *argv):
+        with mock.patch.object(sys, "argv", list(argv)):
+            django_apps.get_app_config("api").ready()
+
+    def testForkingServerStartsThreadsInTheWorker(self):
+        self.ready("/usr/bin/gunicorn", "site_settings.wsgi", "--preload")
+        self.warm_up.assert_not_called()
+
+        # First request in the worker (or gunicorn's post_worker_init hook)
+        request_started.send(sender=None)
+        request_started.send(sender=None)
+        self.warm_up.assert_called_once()
+        self.start_workers.assert_called_once()
+
+        # A process forked from this one starts its own
+        with mock.patch("api.apps.os.getpid", return_value=os.getpid() + 1):
+            request_started.send(sender=None)
+        self.assertEqual(self.warm_up.call_count, 2)
+
+    def testNonForkingServerStartsAtOnce(self):
+        self.ready("/usr/bin/uvicorn", "site_settings.asgi:application")
+        self.warm_up.assert_called_once()
+
+    def testManagementCommandsStartNothing(self):
+        self.ready("manage.py", "migrate")
+        request_started.send(sender=None)
+        self.warm_up.assert_not_called()
+        self.start_workers.assert_not_called()
+
+
+class SharedWeightsTests(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = os.path.join(self.tmpdir.name, "model_weights.bin")
+        loaded = make_fake_resources()["active"]
+        self.mlp = make_random_mlp()
+        self.scaler = loaded.scaler
+        self.label_encoder = loaded.label_encoder
+
+    def testRoundTripIsMemoryMappedAndReadOnly(self):
+        save_shared_weights(self.path, self.mlp, self.scaler, self.label_encoder)
+        mlp, scaler, label_encoder = load_shared_weights(self.path)
+
+        x = np.random.default_rng(1).normal(size=(20, 7))
+        np.testing.assert_array_equal(mlp.predict(x), self.mlp.predict(x))
+        np.testing.assert_allclose(scaler.center_, self.scaler.center_, rtol=1e-6)
+        self.assertEqual(list(label_encoder.inverse_transform([2, 0])), ["false_positive", "candidate"])
+
+        kernel = mlp.layers[0][0]
+        self.assertIsInstance(kernel.base, np.memmap)
+        self.assertFalse(kernel.flags.writeable)
+
+    def testFileVersionIgnoresDerivedExports(self):
+        paths = ai_model.ArtifactPaths.in_directory(self.tmpdir.name)
+        for path in (paths.model, paths.scaler, paths.encoder):
+            with open(path, "wb") as f:
+                f.write(b"trained")
+        version = ai_model.file_version(paths)
+
+        # The first worker to load the model writes the exports
+        save_shared_weights(paths.shared_weights, self.mlp, self.scaler, self.label_encoder)
+        with open(paths.onnx, "wb") as f:
+            f.write(b"onnx")
+        self.assertEqual(ai_model.file_version(paths), version)
+
+        with open(paths.scaler, "wb") as f:
+            f.write(b"retrained")
+        self.assertNotEqual(ai_model.file_version(paths), version)
+
+    def testFileVersionOfExportsAlone(self):
+        paths = ai_model.ArtifactPaths.in_directory(self.tmpdir.name)
+        empty = ai_model.file_version(paths)
+        save_shared_weights(paths.shared_weights, self.mlp, self.scaler, self.label_encoder)
+        self.assertNotEqual(ai_model.file_version(paths), empty)
+
+    def testLoadResourcesUsesSharedFileWithoutKeras(self):
+        save_shared_weights(self.path, self.mlp, self.scaler, self.label_encoder)
+        missing = os.path.join(self.tmpdir.name, "missing")
+        with mock.patch.multiple(
+            ai_model, active=None,
+            SHARED_WEIGHTS_PATH=self.path, MODEL_PATH=missing + ".keras",
+            SCALER_PATH=missing + ".joblib", ENCODER_PATH=missing + ".joblib",
+            PREPROCESSING_PATH=missing + ".json",
+            download_missing_files=mock.DEFAULT,
+        ) as mocks:
+            ai_model.load_resources()
+            self.assertTrue(ai_model.is_ready())
+            self.assertIsInstance(ai_model.active.model, NumpyMLP)
+            mocks["download_missing_files"].assert_not_called()
+            label, confidence = ai_model.classify(VALID_ROW)
+        self.assertIn(label, ["candidate", "confirmed", "false_positive"])
+
+
+@skipUnless(HAS_ONNX, "onnx and onnxruntime are not installed")
+class OnnxBackendTests(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        loaded = make_fake_resources()["active"]
+        self.mlp = make_random_mlp()
+        self.scaler = loaded.scaler
+        self.label_encoder = loaded.label_encoder
+        self.preprocessor = loaded.preprocessor
+
+    def testMatchesNumpyWithScalerFolded(self):
+        from .onnx_model import load_onnx_model, save_onnx_model
+
+        path = os.path.join(self.tmpdir.name, "model.onnx")
+        save_onnx_model(path, self.mlp, self.scaler, self.label_encoder, self.preprocessor)
+        onnx_model, scaler, label_encoder = load_onnx_model(path)
+
+        x = np.random.default_rng(1).normal(size=(64, 7)) * 3
+        expected = self.mlp.predict(self.scaler.transform(x))
+        np.testing.assert_allclose(onnx_model.predict(x), expected, atol=1e-5)
+        self.assertIsNone(scaler.center_)
+        self.assertEqual(list(label_encoder.classes_), list(self.label_encoder.classes_))
+        self.assertEqual(onnx_model.preprocessor.to_dict(), self.preprocessor.to_dict())
+
+    def testLoadResourcesExportsFromSharedWeights(self):
+        shared_path = os.path.join(self.tmpdir.name, "model_weights.bin")
+        save_shared_weights(shared_path, self.mlp, self.scaler, self.label_encoder)
+        missing = os.path.join(self.tmpdir.name, "missing")
+        with override_settings(ML_INFERENCE_BACKEND="onnx"), mock.patch.multiple(
+            ai_model, active=None,
+            SHARED_WEIGHTS_PATH=shared_path, ONNX_MODEL_PATH=os.path.join(self.tmpdir.name, "model.onnx"),
+            MODEL_PATH=missing + ".keras", SCALER_PATH=missing + ".joblib", ENCODER_PATH=missing + ".joblib",
+            PREPROCESSING_PATH=missing + ".json", _prediction_cache=None,
+        ):
+            ai_model.load_resources()
+            self.assertTrue(ai_model.is_ready())
+            self.assertEqual(type(ai_model.active.model).__name__, "OnnxClassifier")
+            self.assertEqual(ai_model.get_inference_backend(), "onnx")
+            onnx_result = ai_model.classify(VALID_ROW)
+
+            with mock.patch.multiple(ai_model, active=None):
+                with override_settings(ML_INFERENCE_BACKEND="numpy"):
+                    ai_model.load_resources()
+                    self.assertIsInstance(ai_model.active.model, NumpyMLP)
+                    ai_model._prediction_cache = None
+                    numpy_result = ai_model.classify(VALID_ROW)
+        self.assertEqual(onnx_result[0], numpy_result[0])
+        self.assertAlmostEqual(onnx_result[1], numpy_result[1], places=3)
+
+    def testAutoFallsBackToNumpyWithoutExport(self):
+        with override_settings(ML_INFERENCE_BACKEND="auto"), \
+                mock.patch.object(ai_model, "ONNX_MODEL_PATH", os.path.join(self.tmpdir.name, "none.onnx")):
+            self.assertEqual(ai_model.get_inference_backend(), "numpy")
+        with override_settings(ML_INFERENCE_BACKEND="tflite"):
+            with self.assertRaises(ValueError):
+                ai_model.get_inference_backend()
+
+
+class ModelRegistryTests(TestCase):
+    def setUp(self):
+        import joblib
+
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.registry = ModelRegistry(os.path.join(self.tmpdir.name, "registry"))
+        loaded = make_fake_resources()["active"]
+        self.scaler, self.label_encoder = loaded.scaler, loaded.label_encoder
+        self.sources = os.path.join(self.tmpdir.name, "sources")
+        os.makedirs(self.sources)
+        joblib.dump(self.scaler, os.path.join(self.sources, "scaler.joblib"))
+        joblib.dump(self.label_encoder, os.path.join(self.sources, "label_encoder.joblib"))
+        loaded.preprocessor.save(os.path.join(self.sources, "preprocessing.json"))
+
+    def addVersion(self, seed):
+        """A bundle whose network is make_random_mlp(seed), pre-exported so loading skips TensorFlow."""
+        with open(os.path.join(self.sources, "model.keras"), "wb") as f:
+            f.write(f"model {seed}".encode())
+        files = {name: os.path.join(self.sources, name) for name in os.listdir(self.sources)}
+        version = self.registry.add(files)["version"]
+        save_shared_weights(
+            self.registry.path(version, "model_weights.bin"), make_random_mlp(seed), self.scaler, self.label_encoder
+        )
+        return version
+
+    def testAddIsIdempotentAndPromoteVerifiesChecksums(self):
+        version = self.addVersion(0)
+        self.assertEqual(self.addVersion(0), version)
+        self.assertEqual([m["version"] for m in self.registry.versions()], [version])
+        self.assertIsNone(self.registry.current_version())
+
+        self.registry.promote(version)
+        self.assertEqual(self.registry.current_version(), version)
+
+        other = self.addVersion(1)
+        with open(self.registry.path(other, "scaler.joblib"), "ab") as f:
+            f.write(b"corrupt")
+        with self.assertRaisesMessage(ValueError, "checksum mismatch for scaler.joblib"):
+            self.registry.promote(other)
+        self.assertEqual(self.registry.current_version(), version)
+
+    def testPromotedVersionIsSwappedInWithoutRestart(self):
+        first, second = self.addVersion(0), self.addVersion(1)
+        self.registry.promote(first)
+        with override_settings(ML_MODEL_REGISTRY_DIR=self.registry.root, ML_MODEL_RELOAD_INTERVAL=0), \
+                mock.patch.multiple(ai_model, active=None, _swap_thread=None, _failed_version=None,
+                                    _prediction_cache=None):
+            ai_model.load_resources()
+            old = ai_model.active
+            self.assertEqual(old.version, first)
+
+            self.registry.promote(second)
+            ai_model.load_resources()
+            ai_model._swap_thread.join(timeout=30)
+            self.assertEqual(ai_model.active.version, second)
+            # A request that started on the old version can still finish on it
+            x = np.ones((1, 7))
+            self.assertFalse(np.allclose(
+                old.model.predict(x), ai_model.active.model.predict(x)
+            ))
+            self.assertEqual(ai_model.classify(VALID_ROW, return_version=True)[2], second)
+
+            response = APIClient().post("/api/predict/", dict(VALID_ROW, name="b", star_name="Sun"), format="json")
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(Planet.objects.get(name="b (user inputted)").model_version, second)
+
+
+class ArtifactServer:
+    """
+    Local stand-in for the model host, serving `files` with Range support and
+    counting the requests that return a body.
+
+    - mode "direct": 200 with the SHA-256 in X-Linked-Etag;
+    - mode "huggingface": like huggingface.co's resolve URLs, names in `lfs`
+      are a 302 carrying X-Linked-Etag to a CDN URL that has no checksum,
+      other files are served directly with their git blob SHA-1 as ETag;
+    - mode "none": no checksum at all.
+
+    The first response for a name in `drop_once` is cut off halfway through,
+    and names in `tamper` are served with one byte changed.
+    """
+
+    def __init__(self, files, mode="direct", lfs=(), drop_once=(), tamper=()):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        self.files = files
+        self.drop_once = set(drop_once)
+        self.requests = []
+        server = self
+
+        def git_blob_sha1(body):
+            return hashlib.sha1(f"blob {len(body)}\0".encode("ascii") + body).hexdigest()
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                via_cdn = self.path.startswith("/cdn/")
+                name = self.path.rsplit("/", 1)[1]
+                body = server.files[name]
+                if mode == "huggingface" and name in lfs and not via_cdn:
+                    self.send_response(302)
+                    self.send_header("Location", f"/cdn/{name}")
+                    self.send_header("X-Linked-Etag", f'"{hashlib.sha256(body).hexdigest()}"')
+                    self.send_header("ETag", '"not-the-file-hash"')
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+
+                range_header = self.headers.get("Range")
+                server.requests.append((name, range_header))
+                start = int(range_header.split("=")[1].rstrip("-")) if range_header else 0
+                self.send_response(206 if range_header else 200)
+                if range_header:
+                    self.send_header("Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}")
+                self.send_header("Content-Length", str(len(body) - start))
+                if mode == "direct":
+                    self.send_header("X-Linked-Etag", f'"{hashlib.sha256(body).hexdigest()}"')
+                elif mode == "huggingface" and not via_cdn:
+                    self.send_header("ETag", f'"{git_blob_sha1(body)}"')
+                self.end_headers()
+                if name in tamper:
+                    body = bytes([body[0] ^ 1]) + body[1:]
+                if name in server.drop_once:
+                    server.drop_once.discard(name)
+                    self.wfile.write(body[start:len(body) // 2])
+                    self.wfile.flush()
+                    self.close_connection = True
+                    return
+                self.wfile.write(body[start:])
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def urls(self):
+        return {name: f"http://127.0.0.1:{self.httpd.server_port}/{name}" for name in self.files}
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class ArtifactFetcherTests(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        rng = np.random.default_rng(0)
+        self.files = {name: rng.bytes(size) for name, size in (
+            ("model.keras", 300_000), ("scaler.joblib", 1_000), ("label_encoder.joblib", 500),
+        )}
+
+    def serve(self, **options):
+        server = ArtifactServer(self.files, **options)
+        self.addCleanup(server.close)
+        return server
+
+    def assertFilesMatch(self):
+        for name, body in self.files.items():
+            with open(os.path.join(self.tmpdir.name, name), "rb") as f:
+                self.assertEqual(f.read(), body)
+        self.assertFalse([name for name in os.listdir(self.tmpdir.name) if name.endswith(".part")])
+
+    def testDownloadsMissingFilesOnce(self):
+        server = self.serve()
+        downloaded = fetch_files(server.urls(), self.tmpdir.name)
+        self.assertEqual(sorted(downloaded), sorted(self.files))
+        self.assertFilesMatch()
+        self.assertEqual(fetch_files(server.urls(), self.tmpdir.name), [])
+        self.assertEqual(len(server.requests), 3)
+
+    def testResumesAfterDroppedConnection(self):
+        server = self.serve(drop_once=["model.keras"])
+        fetch_files(server.urls(), self.tmpdir.name)
+        self.assertFilesMatch()
+        model_requests = [range_header for name, range_header in server.requests if name == "model.keras"]
+        self.assertEqual(len(model_requests), 2)
+        self.assertIsNone(model_requests[0])
+        self.assertRegex(model_requests[1], r"^bytes=[1-9][0-9]*-$")
+
+    def testChecksumMismatchKeepsNothing(self):
+        server = self.serve()
+        with self.assertRaisesMessage(ValueError, "checksum mismatch"):
+            fetch_files(server.urls(), self.tmpdir.name, checksums={"scaler.joblib": "0" * 64})
+        self.assertFalse(os.path.exists(os.path.join(self.tmpdir.name, "scaler.joblib")))
+        self.assertFalse(os.path.exists(os.path.join(self.tmpdir.name, "scaler.joblib.part")))
+
+    def testVerifiesThroughHuggingFaceRedirects(self):
+        server = self.serve(mode="huggingface", lfs=["model.keras"])
+        fetch_files(server.urls(), self.tmpdir.name, require_checksum=True)
+        self.assertFilesMatch()
+
+        # The LFS file is checked against the redirect's X-Linked-Etag, the
+        # others against their git blob ETag
+        for name in ("model.keras", "scaler.joblib"):
+            os.remove(os.path.join(self.tmpdir.name, name))
+            server = self.serve(mode="huggingface", lfs=["model.keras"], tamper=[name])
+            with self.assertRaisesMessage(ValueError, f"{name}: checksum mismatch"):
+                fetch_files(server.urls(), self.tmpdir.name, require_checksum=True)
+            self.assertFalse(os.path.exists(os.path.join(self.tmpdir.name, name)))
+
+    def testRequiredChecksumRejectsUnverifiableFiles(self):
+        server = self.serve(mode="none")
+        with self.assertRaisesMessage(ValueError, "no checksum to verify"):
+            fetch_files(server.urls(), self.tmpdir.name, require_checksum=True)
+        self.assertEqual(os.listdir(self.tmpdir.name), [".download.lock"])
+
+        pins = {name: hashlib.sha256(body).hexdigest() for name, body in self.files.items()}
+        fetch_files(server.urls(), self.tmpdir.name, checksums=pins, require_checksum=True)
+        self.assertFilesMatch()
+
+    def testConcurrentWorkersDownloadOnce(self):
+        server = self.serve()
+        barrier = threading.Barrier(4)
+        errors = []
+
+        def worker():
+            barrier.wait()
+            try:
+                fetch_files(server.urls(), self.tmpdir.name)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=30)
+        self.assertEqual(errors, [])
+        self.assertFilesMatch()
+        self.assertEqual(sorted(name for name, _ in server.requests), sorted(self.files))
+
+
+class MicroBatcherTests(TestCase):
+    def testConcurrentRowsShareBatchesAndGetOwnResults(self):
+        batch_sizes = []
+        release = threading.Event()
+
+        def predict(matrix):
+            release.wait(1)
+            batch_sizes.append(len(matrix))
+            return matrix[:, 0].astype(str), matrix[:, 0]
+
+        batcher = MicroBatcher(predict, max_wait_ms=50, max_batch_size=8)
+        futures = [batcher.submit([float(i)] * 7) for i in range(20)]
+        release.set()
+        results = [future.result(timeout=5) for future in futures]
+
+        self.assertEqual([confidence for _, confidence in results], list(range(20)))
+        self.assertEqual(sum(batch_sizes), 20)
+        self.assertLessEqual(max(batch_sizes), 8)
+        self.assertLess(len(batch_sizes), 20)
+
+        stats = batcher.stats()
+        self.assertEqual(stats["rows"], 20)
+        self.assertEqual(sum(stats["batch_size_histogram"].values()), stats["batches"])
+
+    def testErrorsPropagateToEveryCaller(self):
+        def predict(matrix):
+            raise RuntimeError("boom")
+
+        batcher = MicroBatcher(predict, max_wait_ms=1)
+        with self.assertRaises(RuntimeError):
+            batcher.submit([0.0] * 7).result(timeout=5)
+
+    @override_settings(ML_MICROBATCH_ENABLED=True, ML_MICROBATCH_MAX_WAIT_MS=1)
+    def testClassifyThroughBatcherMatchesDirect(self):
+        with mock.patch.multiple(ai_model, _batcher=None, **make_fake_resources()):
+            batched = ai_model.classify(VALID_ROW)
+            self.assertEqual(ai_model.get_metrics()["microbatch"]["rows"], 1)
+            with override_settings(ML_MICROBATCH_ENABLED=False):
+                self.assertEqual(ai_model.classify(VALID_ROW), batched)
+
+
+class PredictionCacheTests(TestCase):
+    def setUp(self):
+        self.resources = make_fake_resources()
+        patcher = mock.patch.multiple(ai_model, **self.resources)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def testRepeatedCandidatesHitCache(self):
+        model = self.resources["active"].model
+        first = ai_model.classify(VALID_ROW)
+        self.assertEqual(ai_model.classify(dict(VALID_ROW, duration="3.2000000001")), first)
+        self.assertEqual(model.rows_seen, 1)
+
+        rows = [VALID_ROW, dict(VALID_ROW, radius="5"), dict(VALID_ROW, radius="5")]
+        results = ai_model.classify_batch(rows)
+        self.assertEqual((results[0]["classification"], results[0]["confidence"]), first)
+        self.assertEqual(model.rows_seen, 3)
+
+        stats = ai_model.get_metrics()["prediction_cache"]
+        self.assertEqual(stats["hits"], 2)
+        self.assertEqual(stats["misses"], 3)
+
+    def testModelVersionChangeInvalidates(self):
+        loaded = self.resources["active"]
+        ai_model.classify(VALID_ROW)
+        new_version = ai_model.LoadedModel(
+            loaded.model, loaded.scaler, loaded.label_encoder, loaded.preprocessor, "new-model"
+        )
+        with mock.patch.object(ai_model, "active", new_version):
+            ai_model.classify(VALID_ROW)
+        self.assertEqual(loaded.model.rows_seen, 2)
+
+    @override_settings(ML_PREDICTION_CACHE={"BACKEND": "django", "ALIAS": "default"})
+    def testDjangoCacheBackend(self):
+        model = self.resources["active"].model
+        ai_model.classify(VALID_ROW)
+        ai_model.classify(VALID_ROW)
+        self.assertEqual(model.rows_seen, 1)
+        self.assertEqual(ai_model.get_metrics()["prediction_cache"]["backend"], "DjangoCacheBackend")
+
+    def testLocalCacheEvictsAndExpires(self):
+        cache = LocalLRUCache(max_entries=2, ttl=60)
+        cache.set_many({"a": 1, "b": 2})
+        cache.get_many(["a"])
+        cache.set_many({"c": 3})
+        self.assertEqual(cache.get_many(["a", "b", "c"]), {"a": 1, "c": 3})
+
+        with mock.patch("api.prediction_cache.time.monotonic", return_value=10 ** 9):
+            self.assertEqual(cache.get_many(["a", "c"]), {})
+
+
+class PlanetListPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = "/api/planets/"
+        star = Star.objects.create(name="Sun")
+        Planet.objects.bulk_create([
+            Planet(star=star, name=f"p{i}", ra=float(i), dec=-float(i),
+                   classification="confirmed" if i % 2 else "candidate")
+            for i in range(7)
+        ])
+
+    def testWalksAllPagesWithCursor(self):
+        names = []
+        params = {"limit": 3}
+        while True:
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            names += [planet["name"] for planet in response.data["results"]]
+            if response.data["next"] is None:
+                break
+            params = {"limit": 3, "cursor": response.data["next"]}
+        self.assertEqual(names, [f"p{i}" for i in range(7)])
+
+    def testUnpaginatedListUnchanged(self):
+        response = self.client.get(self.url, {"classification": "confirmed"})
+        self.assertEqual([planet["name"] for planet in response.data], ["p1", "p3", "p5"])
+
+    def testFieldsProjectionSelectsOnlyRequestedColumns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {"fields": "id,name,ra", "limit": 2})
+        self.assertEqual(set(response.data["results"][0]), {"id", "name", "ra"})
+        sql = queries.captured_queries[0]["sql"]
+        self.assertNotIn("transit_depth", sql)
+        self.assertNotIn("classification", sql)
+
+    def testRejectsBadCursorAndFields(self):
+        self.assertEqual(self.client.get(self.url, {"cursor": "nope"}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.url, {"fields": "id,password"}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(self.url, {"limit": "0"}).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@mock.patch.object(CatalogStreamMixin, "stream_chunk_size", 2)
+class CatalogStreamingTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        stars = Star.objects.bulk_create([
+            Star(name=f"s{i}", ra=float(i), dec=float("nan") if i == 1 else 1.0, sy_dist=float("inf"))
+            for i in range(5)
+        ])
+        Planet.objects.create(star=stars[0], name="p0", classification="confirmed", radius=float("nan"))
+
+    def streamed_body(self, response):
+        self.assertFalse(hasattr(response, "data"))
+        return b"".join(response.streaming_content).decode("utf-8")
+
+    def testStarsNdjsonMatchesSerializer(self):
+        expected = self.client.get("/api/stars/").json()
+        response = self.client.get("/api/stars/", {"format": "ndjson"})
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = self.streamed_body(response).splitlines()
+        self.assertEqual([json.loads(line) for line in lines], expected)
+        self.assertIsNone(expected[1]["dec"])
+
+    def testPlanetsJsonArrayStreamMatchesSerializer(self):
+        expected = self.client.get("/api/planets/").json()
+        response = self.client.get("/api/planets/", {"stream": "true"})
+        self.assertEqual(json.loads(self.streamed_body(response)), expected)
+
+    def testStreamRespectsFiltersAndFields(self):
+        response = self.client.get("/api/planets/", {"format": "ndjson", "fields": "name,radius", "search": "p"})
+        self.assertEqual(self.streamed_body(response), '{"name":"p0","radius":null}\n')
+
+
+class FastCatalogSerializerTests(TestCase):
+    def setUp(self):
+        star = Star.objects.create(name="Sün", ra=1.5, dec=float("nan"), sy_dist=float("-inf"))
+        Star.objects.create(name="Empty")
+        Planet.objects.create(star=star, name="p0", classification="confirmed", radius=float("nan"),
+                              orbital_period=3.0, confidence=0.91, user_inputted=True)
+        Planet.objects.create(name="p1", classification="candidate", transit_depth=float("inf"))
+
+    def testByteIdenticalToDrfSerializers(self):
+        for queryset, serializer_class in [
+            (Planet.objects.order_by("id"), PlanetSerializer),
+            (Star.objects.order_by("id"), StarSerializer),
+        ]:
+            expected = JSONRenderer().render(serializer_class(queryset, many=True).data)
+            actual = JSONRenderer().render(FastCatalogSerializer(serializer_class).serialize(queryset))
+            self.assertEqual(actual, expected)
+
+    def testStarPlanetList(self):
+        client = APIClient()
+        star = Star.objects.get(name="Sün")
+        response = client.get(f"/api/stars/{star.id}/planets/")
+        self.assertEqual([planet["name"] for planet in response.data], ["p0"])
+        self.assertEqual(client.get("/api/stars/999999/planets/").status_code, status.HTTP_404_NOT_FOUND)
+
+
+class PlanetSearchIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        stars = Star.objects.bulk_create([Star(name=f"star {i}") for i in range(50)])
+        classifications = ["candidate", "confirmed", "false_positive"]
+        Planet.objects.bulk_create([
+            Planet(star=stars[i % 50], name=f"Kepler-{i} b", classification=classifications[i % 3])
+            for i in range(3000)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def testClassificationFilterUsesIndex(self):
+        plan = Planet.objects.filter(classification="confirmed").explain()
+        self.assertIn("planet_classification_idx", plan)
+
+    def testStarAndClassificationUsesCompositeIndex(self):
+        star = Star.objects.get(name="star 7")
+        plan = Planet.objects.filter(star=star, classification="confirmed").explain()
+        self.assertIn("planet_star_class_idx", plan)
+
+    @skipUnless(connection.vendor == "postgresql", "pg_trgm index is Postgres-only")
+    def testNameSearchUsesTrigramIndex(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_indexes WHERE indexname = 'planet_name_trgm_idx'")
+            if cursor.fetchone() is None:
+                self.skipTest("pg_trgm is not available on this server")
+            cursor.execute("SET enable_seqscan = off")
+        plan = Planet.objects.filter(name__icontains="pler-12").explain()
+        self.assertIn("planet_name_trgm_idx", plan)
+
+
+class StarConeSearchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.url = "/api/stars/cone/"
+        Star.objects.bulk_create([
+            Star(name="origin", ra=0.0, dec=0.0),
+            Star(name="wrap", ra=359.5, dec=0.0),
+            Star(name="north", ra=0.0, dec=2.0),
+            Star(name="far", ra=180.0, dec=0.0),
+            Star(name="nowhere"),
+        ])
+        patcher = mock.patch.multiple(spatial, _index=None, _dirty=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def testReturnsStarsInConeNearestFirst(self):
+        response = self.client.get(self.url, {"ra": "0.2", "dec": "0", "radius": "3"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([star["name"] for star in response.data], ["origin", "wrap", "north"])
+        self.assertAlmostEqual(response.data[0]["distance"], 0.2, places=6)
+        self.assertAlmostEqual(response.data[1]["distance"], 0.7, places=6)
+
+    def testLimitAndRebuildOnSave(self):
+        response = self.client.get(self.url, {"ra": "180", "dec": "0", "radius": "1", "limit": "1"})
+        self.assertEqual([star["name"] for star in response.data], ["far"])
+
+        Star.objects.create(name="closer", ra=180.0, dec=0.0001)
+        Star.objects.filter(name="far").delete()
+        response = self.client.get(self.url, {"ra": "180", "dec": "0", "radius": "1"})
+        self.assertEqual([star["name"] for star in response.data], ["closer"])
+
+    def testRejectsInvalidParameters(self):
+        for params in [{"ra": "0", "dec": "0"}, {"ra": "0", "dec": "95", "radius": "1"},
+                       {"ra": "x", "dec": "0", "radius": "1"}, {"ra": "0", "dec": "0", "radius": "0"}]:
+            self.assertEqual(self.client.get(self.url, params).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(STAR_TILE_MAX_LEVEL=2, STAR_TILE_GRID=2)
+class StarTileTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        Star.objects.bulk_create([
+            Star(name="near-a", ra=10.0, dec=10.0, sy_dist=5.0, star_radius=1.0),
+            Star(name="near-b", ra=11.0, dec=12.0, sy_dist=8.0, star_radius=2.0),
+            Star(name="far", ra=12.0, dec=11.0, sy_dist=500.0),
+            Star(name="west", ra=200.0, dec=-45.0),
+            Star(name="pole", ra=360.0, dec=90.0, sy_dist=20.0),
+            Star(name="nowhere", sy_dist=1.0),
+        ])
+
+    def tile(self, level, x, y, **headers):
+        return self.client.get(f"/api/stars/tiles/{level}/{x}/{y}/", **headers)
+
+    def testCoarseLevelAggregatesByCellAndDistance(self):
+        data = json.loads(self.tile(0, 0, 0).content)
+        self.assertEqual(data["detail"], "aggregate")
+        self.assertEqual(data["count"], 5)
+        points = {point["name"]: point for point in data["stars"]}
+        # near-a and near-b share a cell and distance band; far is in another band
+        self.assertEqual(set(points), {"near-a", "far", "west", "pole"})
+        self.assertEqual(points["near-a"]["count"], 2)
+        self.assertAlmostEqual(points["near-a"]["ra"], 10.5)
+        self.assertAlmostEqual(points["near-a"]["sy_dist"], 6.5)
+        self.assertEqual(points["near-a"]["star_radius"], 1.0)
+        self.assertIsNone(points["west"]["sy_dist"])
+
+    def testFinestLevelReturnsFullRows(self):
+        data = json.loads(self.tile(2, 0, 2).content)
+        self.assertEqual(data["detail"], "full")
+        self.assertEqual([star["name"] for star in data["stars"]], ["near-a", "near-b", "far"])
+        self.assertEqual(data["stars"][0], StarSerializer(Star.objects.get(name="near-a")).data)
+        self.assertEqual(json.loads(self.tile(2, 3, 3).content)["stars"][0]["name"], "pole")
+
+    def testPrecomputedTilesMatchOnDemandTilesAndServe304(self):
+        on_demand = {(level, x, y): self.tile(level, x, y).content
+                     for level in range(3) for x in range(2 ** level) for y in range(2 ** level)}
+        call_command("build_star_tiles", stdout=io.StringIO())
+        self.assertEqual(StarTile.objects.filter(level=2).count(), 3)
+
+        for key, content in on_demand.items():
+            if StarTile.objects.filter(level=key[0], x=key[1], y=key[2]).exists():
+                self.assertEqual(self.tile(*key).content, content)
+
+        response = self.tile(1, 0, 1)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("max-age", response["Cache-Control"])
+        cached = self.tile(1, 0, 1, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(cached.content, b"")
+
+    def testOutOfRangeTileIs404(self):
+        for level, x, y in [(3, 0, 0), (1, 2, 0), (0, 0, 1)]:
+            self.assertEqual(self.tile(level, x, y).status_code, status.HTTP_404_NOT_FOUND)
+
+    def predict(self, **fields):
+        with mock.patch.multiple(ai_model, **make_fake_resources()), \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post("/api/predict/", dict(VALID_ROW, **fields), format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def names(self, level, x, y):
+        return [star["name"] for star in json.loads(self.tile(level, x, y).content)["stars"]]
+
+    def testSavedStarShowsUpInItsTile(self):
+        call_command("build_star_tiles", stdout=io.StringIO())
+        etag = self.tile(2, 0, 2)["ETag"]
+
+        self.predict(name="Nova b", star_name="Nova", ra="10.5", dec="11")
+
+        self.assertFalse(StarTile.objects.filter(level=2, x=0, y=2).exists())
+        self.assertTrue(StarTile.objects.filter(level=2, x=3, y=3).exists())  # untouched
+        self.assertIn("Nova (user inputted)", self.names(2, 0, 2))
+        self.assertNotEqual(self.tile(2, 0, 2)["ETag"], etag)
+        self.assertEqual(json.loads(self.tile(0, 0, 0).content)["count"], 6)
+
+    def testMovedStarLeavesItsOldTile(self):
+        self.predict(name="Nova b", star_name="Nova", ra="10.5", dec="11")
+        self.assertIn("Nova (user inputted)", self.names(2, 0, 2))
+
+        self.predict(name="Nova c", star_name="Nova", ra="300")
+        self.assertNotIn("Nova (user inputted)", self.names(2, 0, 2))
+        self.assertEqual(self.names(2, 3, 2), ["Nova (user inputted)"])
+
+    def testStarSavedThroughTheOrmClearsTiles(self):
+        call_command("build_star_tiles", stdout=io.StringIO())
+        Star.objects.filter(name="far").get().delete()
+        self.assertFalse(StarTile.objects.exists())
+        self.assertEqual(self.names(2, 0, 2), ["near-a", "near-b"])
+
+
+
+class LoadDataTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.stars_path = os.path.join(directory.name, "stars.csv")
+        self.planets_path = os.path.join(directory.name, "planets.csv")
+
+    def write_csvs(self, stars, planets):
+        with open(self.stars_path, "w") as f:
+            f.write("id,name,ra,dec,star_temp,star_radius,sy_dist\n" + stars)
+        with open(self.planets_path, "w") as f:
+            f.write("id,name,star_name,orbital_period,radius,ra,dec,duration,transit_depth,model_snr\n" + planets)
+
+    def load(self, *args):
+        output = io.StringIO()
+        call_command("load_data", "--stars", self.stars_path, "--planets", self.planets_path,
+                     "--chunk-size", "2", "--batch-size", "2", *args, stdout=output)
+        return output.getvalue()
+
+    def checkUpsertKeepsUserInputted(self, *args):
+        Star.objects.create(name="Mine", ra=1.0, user_inputted=True)
+        mine = Planet.objects.create(name="Mine b", star=Star.objects.get(name="Mine"), radius=9.0,
+                                     classification="candidate", user_inputted=True)
+        self.write_csvs(
+            "0,Alpha,10,20,5000,1,30\n1,Beta,11,21,,2,\n2,Mine,99,99,1,1,1\n3,Alpha,12,22,5100,1,31\n",
+            "0,Alpha b,Alpha,3.5,1.1,10,20,2,100,\n1,Ghost b,Ghost,1,1,1,1,1,1,\n2,Mine b,Mine,1,1,1,1,1,1,\n",
+        )
+        output = self.load(*args)
+        self.assertIn("rows/s", output)
+        self.assertIn("skipped 1 without a known star", output)
+        self.assertIn("Rebuilt", output)
+        self.assertEqual(json.loads(StarTile.objects.get(level=0).body)["count"], 2)  # Mine has no dec
+
+        alpha = Star.objects.get(name="Alpha")
+        self.assertEqual((alpha.ra, alpha.star_temp), (12.0, 5100.0))  # last duplicate wins
+        self.assertIsNone(Star.objects.get(name="Beta").star_temp)
+        self.assertEqual(Star.objects.get(name="Mine").ra, 1.0)
+        self.assertEqual(Planet.objects.get(pk=mine.pk).radius, 9.0)
+        self.assertFalse(Planet.objects.filter(name="Ghost b").exists())
+
+        planet = Planet.objects.get(name="Alpha b")
+        self.assertEqual(planet.star_id, alpha.id)
+        self.assertIsNone(planet.model_snr)
+        planet.classification = "confirmed"
+        planet.save()
+
+        # Reload updates in place: same ids, classification kept
+        self.write_csvs("0,Alpha,15,25,5200,1,32\n", "0,Alpha b,Alpha,4.0,1.1,10,20,2,100,7\n")
+        self.load(*args)
+        self.assertEqual(Star.objects.get(name="Alpha").id, alpha.id)
+        self.assertEqual(Star.objects.count(), 3)
+        planet = Planet.objects.get(name="Alpha b")
+        self.assertEqual((planet.orbital_period, planet.model_snr, planet.classification), (4.0, 7.0, "confirmed"))
+
+    def testUpsertKeepsUserInputted(self):
+        self.checkUpsertKeepsUserInputted()
+
+    def testLargeBatchesStayUnderTheParameterLimit(self):
+        # 5000 planet rows x 15 parameters exceed Postgres's 65535 per statement
+        # when parameters are bound server-side (psycopg 3)
+        count = 5000
+        self.write_csvs(
+            "".join(f"{i},S{i},{i % 360},0,5000,1,10\n" for i in range(count)),
+            "".join(f"{i},P{i},S{i},1,1,1,1,1,1,1\n" for i in range(count)),
+        )
+        call_command("load_data", "--stars", self.stars_path, "--planets", self.planets_path,
+                     "--chunk-size", str(count), "--batch-size", str(count), stdout=io.StringIO())
+        self.assertEqual(Planet.objects.count(), count)
+
+        frame = next(catalog.read_chunks(self.stars_path, catalog.STAR_COLUMNS, 7))
+        with mock.patch.object(connection.features, "max_query_params", 30), \
+                CaptureQueriesContext(connection) as queries:
+            catalog.upsert_stars(frame, catalog.LoadStats())
+        inserts = [q for q in queries.captured_queries if q["sql"].startswith("INSERT")]
+        self.assertEqual(len(inserts), 3)  # 8 parameters per star, 3 stars per statement
+
+    def testUpsertKeepsUserInputtedRowsInsertedMidBatch(self):
+        self.write_csvs("0,Alpha,10,20,5000,1,30\n1,Mine,99,99,1,1,1\n", "0,Mine b,Mine,1,1,1,1,1,1,\n")
+        upsert = catalog._upsert_catalog_rows
+
+        def racing_upsert(model, *args, **kwargs):
+            # A user saves a star and planet after the batch was read, right before its write
+            star, _ = Star.objects.get_or_create(name="Mine", defaults={"ra": 1.0, "user_inputted": True})
+            if model is Planet:
+                Planet.objects.create(name="Mine b", star=star, radius=9.0, user_inputted=True)
+            return upsert(model, *args, **kwargs)
+
+        with mock.patch.object(catalog, "_upsert_catalog_rows", side_effect=racing_upsert):
+            output = self.load()
+        self.assertIn("upserted 1, kept 1 user-inputted", output)
+        self.assertIn("upserted 0, kept 1 user-inputted", output)
+        self.assertEqual(Star.objects.get(name="Mine").ra, 1.0)
+        self.assertEqual(Planet.objects.get(name="Mine b").radius, 9.0)
+        self.assertEqual(Star.objects.get(name="Alpha").ra, 10.0)
+
+    @skipUnless(connection.vendor == "postgresql", "COPY needs PostgreSQL")
+    def testCopyUpsertKeepsUserInputted(self):
+        self.checkUpsertKeepsUserInputted("--copy")
+
+    @skipUnless(importlib.util.find_spec("pyarrow"), "pyarrow is not installed")
+    def testLoadsColumnarFiles(self):
+        import pyarrow as pa
+        import pyarrow.feather as feather
+        import pyarrow.parquet as pq
+
+        stars = pa.table({"id": [0, 1], "name": ["Alpha", "Beta"], "ra": [10.0, None], "dec": [20.0, 21.0],
+                          "star_temp": [5000.0, 5100.0], "star_radius": [1.0, 2.0], "sy_dist": [30.0, None]})
+        planets = pa.table({"id": [0], "name": ["Alpha b"], "star_name": ["Alpha"], "orbital_period": [3.5]})
+        csv_paths = self.stars_path, self.planets_path
+        self.stars_path = self.stars_path.replace(".csv", ".parquet")
+        self.planets_path = self.planets_path.replace(".csv", ".arrow")
+        pq.write_table(stars, self.stars_path)
+        feather.write_feather(planets, self.planets_path, compression="uncompressed")
+
+        self.load()
+        self.assertIsNone(Star.objects.get(name="Beta").ra)
+        planet = Planet.objects.get(name="Alpha b")
+        self.assertEqual((planet.star.name, planet.orbital_period, planet.radius), ("Alpha", 3.5, None))
+
+        # Same content as CSV hashes the same
+        self.stars_path, self.planets_path = csv_paths
+        self.write_csvs("0,Alpha,10,20,5000,1,30\n1,Beta,,21,5100,2,\n", "0,Alpha b,Alpha,3.5,,,,,,\n")
+        output = self.load("--sync")
+        self.assertIn("Stars: +0 ~0 -0 (2 unchanged", output)
+        self.assertIn("Planets: +0 ~0 -0 (1 unchanged", output)
+
+    def testCopyNeedsPostgres(self):
+        if connection.vendor == "postgresql":
+            self.skipTest("COPY is available")
+        self.write_csvs("", "")
+        with self.assertRaises(CommandError):
+            self.load("--copy")
+
+    def testSyncWritesOnlyChangedRows(self):
+        self.write_csvs(
+            "0,Alpha,10,20,5000,1,30\n1,Beta,11,21,,2,\n2,Gamma,12,22,1,1,1\n3,Delta,1,1,1,1,1\n",
+            "0,Alpha b,Alpha,3.5,1.1,10,20,2,100,\n1,Gamma b,Gamma,1,1,1,1,1,1,\n",
+        )
+        self.load()
+        Planet.objects.create(name="Mine", star=Star.objects.get(name="Delta"), user_inputted=True)
+        # Not in the CSV: an unchanged row must not be rewritten
+        Star.objects.filter(name="Beta").update(ra=99.0)
+
+        self.write_csvs(
+            "0,Alpha,10,20,5000,1,30\n1,Beta,11,21,,2,\n2,Epsilon,5,5,5,5,5\n3,Alpha2,1,2,3,4,5\n",
+            "0,Alpha b,Alpha,4.0,1.1,10,20,2,100,\n1,Epsilon b,Epsilon,1,1,1,1,1,1,\n",
+        )
+        output = self.load("--sync")
+        self.assertIn("Stars: +2 ~0 -1 (2 unchanged, 0 user-inputted kept)", output)
+        self.assertIn("Planets: +1 ~1 -1 (0 unchanged, 0 user-inputted kept)", output)
+
+        self.assertEqual(Star.objects.get(name="Beta").ra, 99.0)
+        self.assertFalse(Star.objects.filter(name="Gamma").exists())
+        # Delta is gone from the CSV but keeps its user-inputted planet
+        self.assertTrue(Planet.objects.filter(name="Mine", star__name="Delta").exists())
+        self.assertEqual(Planet.objects.get(name="Alpha b").orbital_period, 4.0)
+        self.assertEqual(Planet.objects.get(name="Epsilon b").star.name, "Epsilon")
+
+        output = self.load("--sync")
+        self.assertIn("Stars: +0 ~0 -0 (4 unchanged", output)
+        self.assertIn("Planets: +0 ~0 -0 (2 unchanged", output)
+
+    def testSyncKeepsUserInputtedRowsInsertedMidSync(self):
+        self.write_csvs("0,Alpha,10,20,5000,1,30\n1,Mine,99,99,1,1,1\n", "0,Mine b,Mine,1,1,1,1,1,1,\n")
+        upsert = catalog._upsert_catalog_rows
+
+        def racing_upsert(model, *args, **kwargs):
+            # A user saves a star and planet after the sync read the table, right before its write
+            star, _ = Star.objects.get_or_create(name="Mine", defaults={"ra": 1.0, "user_inputted": True})
+            if model is Planet:
+                Planet.objects.create(name="Mine b", star=star, radius=9.0, user_inputted=True)
+            return upsert(model, *args, **kwargs)
+
+        with mock.patch.object(catalog, "_upsert_catalog_rows", side_effect=racing_upsert):
+            output = self.load("--sync")
+        self.assertIn("Stars: +1 ~0 -0 (0 unchanged, 1 user-inputted kept)", output)
+        self.assertIn("Planets: +0 ~0 -0 (0 unchanged, 1 user-inputted kept)", output)
+        self.assertEqual(Star.objects.get(name="Mine").ra, 1.0)
+        self.assertEqual(Planet.objects.get(name="Mine b").radius, 9.0)
+
+
+class FeaturePreparationTests(TestCase):
+    def makeFrame(self, rows=200):
+        import pandas as pd
+
+        rng = np.random.default_rng(0)
+        frame = pd.DataFrame(rng.normal(5, 5, (rows, len(features.RAW_FEATURES))), columns=features.RAW_FEATURES)
+        frame[frame > 12] = np.nan
+        frame["disposition"] = rng.integers(0, 3, rows)
+        for flag in features.FP_FLAGS:
+            frame[flag] = rng.choice([0.0, 1.0, np.nan], rows, p=[0.8, 0.1, 0.1])
+        return frame
+
+    def testMatchesRowWiseTrainingPreparation(self):
+        frame = self.makeFrame()
+
+        # The original NN.py preparation
+        any_fp_flag = frame[features.FP_FLAGS].sum(axis=1) > 0
+        expected_labels = [
+            "confirmed" if disposition == 1 else "false_positive" if disposition == 0 and flagged else "candidate"
+            for disposition, flagged in zip(frame["disposition"], any_fp_flag)
+        ]
+        X = frame[features.RAW_FEATURES].copy()
+        for c in features.POSITIVE_FEATURES:
+            X.loc[X[c] <= 0, c] = np.nan
+        for c in features.NON_NEGATIVE_FEATURES:
+            X.loc[X[c] < 0, c] = np.nan
+        X = X.fillna(X.median())
+        X["transit_depth_log"] = np.log1p(X["transit_depth"])
+        X["planet_radius_log"] = np.log1p(X["planet_radius"])
+        X = X.drop(columns=["transit_depth", "planet_radius"])
+
+        matrix, labels, medians = features.prepare_training_data(frame)
+        self.assertEqual(labels.tolist(), expected_labels)
+        self.assertEqual(list(X.columns), features.MODEL_FEATURES)
+        np.testing.assert_array_equal(matrix, X.to_numpy())
+        self.assertEqual(medians.shape, (len(features.RAW_FEATURES),))
+
+    def testServingUsesTrainingColumnOrder(self):
+        raw = [[1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0]]
+        self.assertEqual(ai_model._extract_features(dict(zip(
+            ["orbital_period", "duration", "transit_depth", "radius", "star_temp", "star_radius", "model_snr"],
+            raw[0],
+        ))), raw[0])
+        np.testing.assert_allclose(
+            features.to_model_features(raw), [[1.0, 2.0, 5.0, 6.0, 7.0, np.log1p(3.0), np.log1p(4.0)]]
+        )
+
+
+class PreprocessingArtifactTests(TestCase):
+    def setUp(self):
+        self.resources = make_fake_resources()
+        patcher = mock.patch.multiple(ai_model, **self.resources)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def testMissingAndInvalidFieldsGetTrainingMedians(self):
+        medians = self.resources["active"].preprocessor.medians
+        complete = dict(VALID_ROW, model_snr=str(medians[6]), radius=str(medians[3]))
+        expected = ai_model.classify(complete)
+        self.assertEqual(ai_model.classify(dict(complete, model_snr=None)), expected)
+        # Out-of-range values are masked like in training
+        self.assertEqual(ai_model.classify(dict(complete, radius="-1")), expected)
+
+        with self.assertRaisesMessage(ValueError, "Missing one or more fields"):
+            ai_model.classify(dict(complete, model_snr=None, duration=None))
+        with override_settings(ML_MAX_IMPUTED_FIELDS=0):
+            with self.assertRaisesMessage(ValueError, "Missing one or more fields"):
+                ai_model.classify(dict(complete, model_snr=None))
+
+    def testBatchEndpointClassifiesRowsWithoutSnr(self):
+        rows = [dict(VALID_ROW, model_snr=None, orbital_period=str(p)) for p in (1, 10, 100)]
+        response = APIClient().post("/api/predict/batch/", rows, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["errors"], 0)
+        self.assertEqual(self.resources["active"].model.rows_seen, 3)
+
+    def testSaveLoadRoundTrip(self):
+        preprocessor = self.resources["active"].preprocessor
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "preprocessing.json")
+            preprocessor.save(path)
+            loaded = features.Preprocessor.load(path)
+        self.assertEqual(loaded.to_dict(), preprocessor.to_dict())
+
+    def testScalerMediansMatchTrainingMedians(self):
+        import pandas as pd
+
+        rng = np.random.default_rng(1)
+        frame = pd.DataFrame(rng.lognormal(1, 1, (301, len(features.RAW_FEATURES))), columns=features.RAW_FEATURES)
+        frame.iloc[::7, 6] = np.nan
+        frame.iloc[::11, 0] = -1.0
+        frame["disposition"] = 1
+        for flag in features.FP_FLAGS:
+            frame[flag] = 0.0
+        matrix, _, medians = features.prepare_training_data(frame)
+        scaler = RobustScaler().fit(pd.DataFrame(matrix, columns=features.MODEL_FEATURES))
+
+        np.testing.assert_allclose(features.Preprocessor.from_scaler(scaler).medians, medians)
+
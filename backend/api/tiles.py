@@ -0,0 +1,263 @@
+import hashlib
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+
+from .models import Star, StarTile
+from .serializers import FastCatalogSerializer, StarSerializer
+from .streaming import dumps
+
+# sy_dist band edges in parsecs. Stars are only aggregated with stars in the
+# same band so coarse tiles keep their depth in the 3D view; stars without a
+# distance get their own band.
+DISTANCE_BANDS = (10.0, 100.0, 1000.0)
+UNKNOWN_DISTANCE_BAND = len(DISTANCE_BANDS) + 1
+
+# Above this many affected tiles, invalidate_tiles() drops them all instead
+MAX_TARGETED_INVALIDATION = 500
+
+
+def tile_count(level):
+    """Tiles per axis at `level`: RA and Dec are each split 2**level ways."""
+    return 2 ** level
+
+
+def tile_bounds(level, x, y):
+    """RA/Dec box of a tile. x runs along RA from 0°, y along Dec from -90°."""
+    n = tile_count(level)
+    return {
+        "ra_min": 360.0 * x / n,
+        "ra_max": 360.0 * (x + 1) / n,
+        "dec_min": -90.0 + 180.0 * y / n,
+        "dec_max": -90.0 + 180.0 * (y + 1) / n,
+    }
+
+
+def grid_indices(ra, dec, cells):
+    """Cell of each star on a `cells` x `cells` RA/Dec raster (the last cell includes 360°/90°)."""
+    gx = np.clip(np.floor(ra / 360.0 * cells), 0, cells - 1).astype(np.int64)
+    gy = np.clip(np.floor((dec + 90.0) / 180.0 * cells), 0, cells - 1).astype(np.int64)
+    return gx, gy
+
+
+def distance_bands(sy_dist):
+    bands = np.searchsorted(DISTANCE_BANDS, sy_dist, side="right")
+    return np.where(np.isfinite(sy_dist), bands, UNKNOWN_DISTANCE_BAND)
+
+
+class StarPositions:
+    """Serialized star rows with a position, plus the columns tiling needs as arrays."""
+
+    def __init__(self, rows):
+        self.rows = [row for row in rows if row["ra"] is not None and row["dec"] is not None]
+        self.ids = np.array([row["id"] for row in self.rows], dtype=np.int64)
+        self.ra = self._column("ra")
+        self.dec = self._column("dec")
+        self.sy_dist = self._column("sy_dist")
+        self.star_radius = self._column("star_radius")
+
+    def _column(self, name):
+        # None -> NaN
+        return np.array([row[name] for row in self.rows], dtype=np.float64).reshape(-1)
+
+    @classmethod
+    def from_queryset(cls, queryset):
+        return cls(FastCatalogSerializer(StarSerializer).serialize(queryset.order_by("id")))
+
+    def __len__(self):
+        return len(self.rows)
+
+
+def _optional(value):
+    return round(float(value), 6) if np.isfinite(value) else None
+
+
+def aggregate_level(stars, level, grid):
+    """
+    Representative points for every non-empty tile at `level`.
+
+    Each tile is rastered into `grid` x `grid` cells; the stars of one cell and
+    distance band become one point at their mean position and distance. The
+    point carries the id, name and radius of the band's nearest star so the
+    client can still link to a real star, plus a `count`.
+
+    Returns:
+        dict: (x, y) -> (list of points, number of stars in the tile)
+    """
+    if not len(stars):
+        return {}
+    gx, gy = grid_indices(stars.ra, stars.dec, tile_count(level) * grid)
+    bands = distance_bands(stars.sy_dist)
+    nearest_first = np.where(np.isfinite(stars.sy_dist), stars.sy_dist, np.inf)
+
+    # Group by (cell, band); within a group the nearest star (then lowest id) comes first
+    order = np.lexsort((stars.ids, nearest_first, bands, gy, gx))
+    gx, gy, bands = gx[order], gy[order], bands[order]
+    changed = np.ones(len(order), dtype=bool)
+    changed[1:] = (gx[1:] != gx[:-1]) | (gy[1:] != gy[:-1]) | (bands[1:] != bands[:-1])
+    starts = np.flatnonzero(changed)
+
+    counts = np.diff(np.append(starts, len(order)))
+    mean_ra = np.add.reduceat(stars.ra[order], starts) / counts
+    mean_dec = np.add.reduceat(stars.dec[order], starts) / counts
+    sy_dist = stars.sy_dist[order]
+    known = np.isfinite(sy_dist)
+    known_counts = np.add.reduceat(known.astype(np.int64), starts)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean_dist = np.add.reduceat(np.where(known, sy_dist, 0.0), starts) / known_counts
+
+    tiles = {}
+    for i, start in enumerate(starts):
+        index = order[start]
+        representative = stars.rows[index]
+        key = (int(gx[start] // grid), int(gy[start] // grid))
+        points, total = tiles.get(key, ([], 0))
+        points.append({
+            "id": representative["id"],
+            "name": representative["name"],
+            "ra": round(float(mean_ra[i]), 6),
+            "dec": round(float(mean_dec[i]), 6),
+            "sy_dist": _optional(mean_dist[i]),
+            "star_radius": _optional(stars.star_radius[index]),
+            "count": int(counts[i]),
+        })
+        tiles[key] = (points, total + int(counts[i]))
+    return tiles
+
+
+def full_level(stars, level):
+    """Full star rows for every non-empty tile at `level`: (x, y) -> (rows, count)."""
+    tiles = {}
+    if not len(stars):
+        return tiles
+    gx, gy = grid_indices(stars.ra, stars.dec, tile_count(level))
+    for row, x, y in zip(stars.rows, gx.tolist(), gy.tolist()):
+        rows, _ = tiles.setdefault((x, y), ([], 0))
+        rows.append(row)
+    return {key: (rows, len(rows)) for key, (rows, _) in tiles.items()}
+
+
+def encode_tile(level, x, y, detail, stars, star_count, max_level):
+    """Tile payload as (JSON text, ETag)."""
+    body = dumps({
+        "level": level,
+        "x": x,
+        "y": y,
+        "max_level": max_level,
+        "detail": detail,
+        "bounds": tile_bounds(level, x, y),
+        "count": star_count,
+        "stars": stars,
+    })
+    return body, '"' + hashlib.sha1(body.encode("utf-8")).hexdigest() + '"'
+
+
+def build_tiles(stars, level, max_level, grid):
+    """Encoded StarTile objects (unsaved) for every non-empty tile at `level`."""
+    if level >= max_level:
+        detail, tiles = "full", full_level(stars, level)
+    else:
+        detail, tiles = "aggregate", aggregate_level(stars, level, grid)
+
+    built = []
+    for (x, y), (points, star_count) in sorted(tiles.items()):
+        body, etag = encode_tile(level, x, y, detail, points, star_count, max_level)
+        built.append(StarTile(level=level, x=x, y=y, star_count=star_count, body=body, etag=etag))
+    return built
+
+
+def build_tile(level, x, y, max_level, grid):
+    """Build a single tile straight from the stars inside it (empty tiles too)."""
+    bounds = tile_bounds(level, x, y)
+    # Query a slightly larger box and let grid_indices() decide membership,
+    # so stars on a tile edge land in the same tile as in a full build
+    margin = 1e-9
+    queryset = Star.objects.filter(
+        ra__gte=bounds["ra_min"] - margin,
+        ra__lte=bounds["ra_max"] + margin,
+        dec__gte=bounds["dec_min"] - margin,
+        dec__lte=bounds["dec_max"] + margin,
+    )
+    stars = StarPositions.from_queryset(queryset)
+    for tile in build_tiles(stars, level, max_level, grid):
+        if (tile.x, tile.y) == (x, y):
+            return tile
+
+    detail = "full" if level >= max_level else "aggregate"
+    body, etag = encode_tile(level, x, y, detail, [], 0, max_level)
+    return StarTile(level=level, x=x, y=y, star_count=0, body=body, etag=etag)
+
+
+def get_tile(level, x, y, max_level, grid):
+    """Stored tile, built and stored on first request if the command hasn't made it."""
+    tile = StarTile.objects.filter(level=level, x=x, y=y).first()
+    if tile is not None:
+        return tile
+    tile = build_tile(level, x, y, max_level, grid)
+    # Another worker may have stored it meanwhile; either copy is the same
+    StarTile.objects.bulk_create([tile], ignore_conflicts=True)
+    return tile
+
+
+def rebuild_all_tiles(max_level, grid, batch_size=500):
+    """
+    Replace every stored tile with a fresh build of levels 0..max_level.
+
+    Returns:
+        dict: level -> number of non-empty tiles
+    """
+    stars = StarPositions.from_queryset(Star.objects.all())
+    per_level = {level: build_tiles(stars, level, max_level, grid) for level in range(max_level + 1)}
+    with transaction.atomic():
+        StarTile.objects.all().delete()
+        for tiles in per_level.values():
+            StarTile.objects.bulk_create(tiles, batch_size=batch_size)
+    return {level: len(tiles) for level, tiles in per_level.items()}
+
+
+def tiles_containing(positions, max_level, grid):
+    """(level, x, y) of the tile holding each (ra, dec) position, at every level."""
+    positions = [
+        (float(ra), float(dec)) for ra, dec in positions
+        if ra is not None and dec is not None and np.isfinite(float(ra)) and np.isfinite(float(dec))
+    ]
+    keys = set()
+    if not positions:
+        return keys
+    ra, dec = np.array(positions, dtype=np.float64).T
+    for level in range(max_level + 1):
+        gx, gy = grid_indices(ra, dec, tile_count(level))
+        keys.update(zip([level] * len(positions), gx.tolist(), gy.tolist()))
+        if level < max_level:
+            # aggregate_level places stars through the finer raster
+            gx, gy = grid_indices(ra, dec, tile_count(level) * grid)
+            keys.update(zip([level] * len(positions), (gx // grid).tolist(), (gy // grid).tolist()))
+    return keys
+
+
+def invalidate_tiles(positions, max_level, grid):
+    """
+    Drop the stored tiles holding any of `positions` (old and new positions of
+    changed stars); get_tile() rebuilds them on their next request.
+    """
+    keys = tiles_containing(positions, max_level, grid)
+    if not keys:
+        return
+    if len(keys) > MAX_TARGETED_INVALIDATION:
+        StarTile.objects.all().delete()
+        return
+    query = Q()
+    for level, x, y in keys:
+        query |= Q(level=level, x=x, y=y)
+    StarTile.objects.filter(query).delete()
+
+
+def clear_tiles(**kwargs):
+    """Signal receiver: an ORM save/delete doesn't tell where the star was, so drop every tile."""
+    StarTile.objects.all().delete()
+
+
+post_save.connect(clear_tiles, sender=Star, dispatch_uid="star_tiles_post_save")
+post_delete.connect(clear_tiles, sender=Star, dispatch_uid="star_tiles_post_delete")
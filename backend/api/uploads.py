@@ -0,0 +1,125 @@
+"""
+Read uploaded candidate files row by row.
+
+    columns, rows = open_upload(request.stream, request.content_type,
+                                request.headers.get("Content-Encoding"))
+
+CSV files need a header row; NDJSON files have one JSON object per line.
+Either may be gzip-compressed (Content-Encoding: gzip). The body is read and
+decompressed a line at a time, so a large upload is never held in memory.
+"""
+import csv
+import gzip
+import json
+
+CSV = "csv"
+NDJSON = "ndjson"
+
+UPLOAD_FORMATS = {
+    "text/csv": CSV,
+    "application/csv": CSV,
+    "application/x-ndjson": NDJSON,
+    "application/ndjson": NDJSON,
+    "application/jsonl": NDJSON,
+}
+
+# Longest line accepted, so one runaway line can't use unbounded memory
+MAX_LINE_BYTES = 1 << 20
+
+
+def upload_format(content_type):
+    """CSV or NDJSON for a Content-Type header; ValueError for anything else."""
+    media_type = (content_type or "").split(";", 1)[0].strip().lower()
+    try:
+        return UPLOAD_FORMATS[media_type]
+    except KeyError:
+        raise ValueError(
+            f"Unsupported Content-Type {media_type or '(none)'!r}; send text/csv or application/x-ndjson."
+        )
+
+
+def _decompressed(stream, content_encoding):
+    """Wrap the request stream to undo its Content-Encoding."""
+    encoding = (content_encoding or "identity").strip().lower()
+    if encoding in ("gzip", "x-gzip"):
+        return gzip.GzipFile(fileobj=stream, mode="rb") if stream is not None else None
+    if encoding != "identity":
+        raise ValueError(f"Unsupported Content-Encoding {encoding!r}; send gzip or no encoding.")
+    return stream
+
+
+def _iter_lines(stream):
+    """Decode a binary stream into text lines (newlines kept, BOM dropped)."""
+    if stream is None:
+        return
+    first = True
+    while True:
+        try:
+            line = stream.readline(MAX_LINE_BYTES + 1)
+        except (OSError, EOFError) as e:  # gzip.BadGzipFile, truncated gzip stream, dropped client
+            raise ValueError(f"Could not read the upload: {e}")
+        if not line:
+            return
+        if len(line) > MAX_LINE_BYTES:
+            raise ValueError(f"Line longer than {MAX_LINE_BYTES} bytes.")
+        text = line.decode("utf-8")
+        if first:
+            text = text.lstrip("\ufeff")
+            first = False
+        yield text
+
+
+def iter_csv_rows(reader, header):
+    """Yield one dict per CSV record, keyed by the header names."""
+    try:
+        for record in reader:
+            if not any(value.strip() for value in record):
+                continue  # blank line
+            if len(record) > len(header):
+                raise ValueError(f"Line {reader.line_num}: more values than header columns.")
+            yield dict(zip(header, (value.strip() for value in record)))
+    except csv.Error as e:
+        raise ValueError(f"Line {reader.line_num}: {e}")
+
+
+def iter_ndjson_rows(lines):
+    """Yield one dict per non-blank NDJSON line."""
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            raise ValueError(f"Line {line_number}: invalid JSON.")
+        if not isinstance(row, dict):
+            raise ValueError(f"Line {line_number}: expected a JSON object.")
+        yield row
+
+
+def open_upload(stream, content_type, content_encoding=None):
+    """
+    Start reading an uploaded file.
+
+    Returns:
+        tuple: (columns, rows). `columns` is the CSV header (None for NDJSON),
+            already read so it can be checked before any row; `rows` lazily
+            yields one dict per row.
+
+    Raises:
+        ValueError: for an unsupported type or encoding, or an unreadable
+            header. A malformed line further on raises ValueError from `rows`
+            when it is reached, after the rows before it were yielded.
+    """
+    lines = _iter_lines(_decompressed(stream, content_encoding))
+    if upload_format(content_type) == NDJSON:
+        return None, iter_ndjson_rows(lines)
+
+    reader = csv.reader(lines)
+    try:
+        header = next(reader, None)
+    except csv.Error as e:
+        raise ValueError(f"Invalid CSV header: {e}")
+    if header is None:
+        return [], iter(())
+    header = [name.strip() for name in header]
+    return header, iter_csv_rows(reader, header)
@@ -3,7 +3,15 @@ from .views import *
 
 urlpatterns = [
     path('predict/', PredictPlanet.as_view()),
+    path('predict/batch/', PredictPlanetBatch.as_view()),
+    path('predict/upload/', PredictPlanetUpload.as_view()),
+    path('predict/jobs/', PredictionJobCreate.as_view()),
+    path('predict/jobs/<uuid:job_id>/', PredictionJobDetail.as_view(), name='prediction-job'),
+    path('ready/', ModelReady.as_view()),
+    path('metrics/', ModelMetrics.as_view()),
     path('planets/', PlanetList.as_view()),
     path('stars/', StarList.as_view()),
+    path('stars/cone/', StarConeSearch.as_view()),
+    path('stars/tiles/<int:level>/<int:x>/<int:y>/', StarTileView.as_view()),
     path('stars/<int:star_id>/planets/', StarPlanetList.as_view(), name='star-planet-list'),
 ]
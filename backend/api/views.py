@@ -1,9 +1,24 @@
+import math
+
+from django.db import transaction
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from .models import Planet, Star
-from .serializers import PlanetSerializer, StarSerializer
-from .ai_model import classify
+from rest_framework.settings import api_settings
+from .models import Planet, PredictionJob, Star
+from .persistence import save_prediction, save_predictions
+from .pagination import KeysetPagination
+from .spatial import get_star_index
+from .tiles import get_tile, tile_count
+from .streaming import NDJSONRenderer, buffered, dumps, iter_rows, stream_json_array, stream_ndjson
+from .serializers import FastCatalogSerializer, PlanetSerializer, StarSerializer
+from .uploads import open_upload
+from . import ai_model, jobs
+from .ai_model import classify, classify_batch, CLASSIFICATION_FIELDS
 
 
 class PredictPlanet(APIView):
@@ -11,6 +26,18 @@ class PredictPlanet(APIView):
     authentication_classes = []
     permission_classes = []
 
+    classification_fields = CLASSIFICATION_FIELDS
+
+    # All fields that might be saved to Star or Planet models
+    save_fields = classification_fields + [
+        "name", "ra", "dec", "star_name",
+        "sy_dist",          # ✅ New: Star System Distance
+        "semi_major_axis",  # ✅ New: Planet Semi-Major Axis
+    ]
+
+    # Save-only fields stored as numbers; the classification fields are checked by the model
+    numeric_save_fields = ["ra", "dec", "sy_dist", "semi_major_axis"]
+
     def clean_input(self, data):
         """Convert empty strings to None for cleaner validation."""
         # Use a list of values to consider as "empty"
@@ -20,29 +47,52 @@ class PredictPlanet(APIView):
             for k, v in data.items()
         }
 
+    def coerce_save_fields(self, data):
+        """
+        Convert the save-only numeric fields of a cleaned row to floats, in place.
+
+        Returns:
+            str: An error message naming the fields that are not finite numbers,
+                or None if all of them are valid (or absent).
+        """
+        invalid = []
+        for field in self.numeric_save_fields:
+            if data.get(field) is None:
+                continue
+            try:
+                value = float(data[field])
+            except (TypeError, ValueError):
+                value = None
+            if value is None or not math.isfinite(value):
+                invalid.append(field)
+            else:
+                data[field] = value
+        if invalid:
+            return f"Invalid numeric value for: {', '.join(invalid)}."
+        return None
+
+    def has_classification_fields(self, data):
+        """
+        Check that the fields needed by the classifier are present and non-null.
+        Up to ML_MAX_IMPUTED_FIELDS of them may be left out; the model fills
+        those with the training medians.
+        """
+        missing = sum(
+            1 for field in self.classification_fields
+            if field not in data or data[field] is None
+        )
+        return missing <= ai_model.max_imputed_fields()
+
     def post(self, request):
         data = self.clean_input(request.data)
         print("Cleaned request data:", data)
 
-        classification_fields = [
-            "orbital_period", "radius", "duration",
-            "transit_depth", "star_temp", "star_radius", "model_snr"
-        ]
-
-        # All fields that might be saved to Star or Planet models
-        save_fields = classification_fields + [
-            "name", "ra", "dec", "star_name",
-            "sy_dist",          # ✅ New: Star System Distance
-            "semi_major_axis",  # ✅ New: Planet Semi-Major Axis
-        ]
+        invalid = self.coerce_save_fields(data)
+        if invalid:
+            return Response({"error": invalid}, status=status.HTTP_400_BAD_REQUEST)
 
         # Only require classification fields to exist and be non-null for classification
-        has_classification_fields = all(
-            field in data and data[field] is not None
-            for field in classification_fields
-        )
-
-        if not has_classification_fields:
+        if not self.has_classification_fields(data):
             return Response(
                 {"error": "Missing one or more fields required for classification."},
                 status=status.HTTP_400_BAD_REQUEST
@@ -50,7 +100,7 @@ class PredictPlanet(APIView):
 
         # Run ML model classification
         try:
-            classification, confidence = classify(data)
+            classification, confidence, model_version = classify(data, return_version=True)
         except ValueError as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
@@ -63,47 +113,11 @@ class PredictPlanet(APIView):
         can_save_star_and_planet = data.get("star_name") and data.get("name") # Only save if both names are provided
 
         if can_save_star_and_planet:
-            # Save Star first
-            star_name = data["star_name"] + " (user inputted)"
-            star, created = Star.objects.get_or_create(
-                name=star_name,
-                defaults={
-                    "ra": data.get("ra"),
-                    "dec": data.get("dec"),
-                    "star_temp": data.get("star_temp"),
-                    "star_radius": data.get("star_radius"),
-                    "sy_dist": data.get("sy_dist"), # ✅ Save sy_dist to Star
-                    "user_inputted": True,
-                }
-            )
-            if not created:
-                # If star already exists, update user_inputted flag and sy_dist if provided
-                star.user_inputted = True
-                if data.get("ra") is not None: star.ra = data["ra"]
-                if data.get("dec") is not None: star.dec = data["dec"]
-                if data.get("star_temp") is not None: star.star_temp = data["star_temp"]
-                if data.get("star_radius") is not None: star.star_radius = data["star_radius"]
-                if data.get("sy_dist") is not None: star.sy_dist = data["sy_dist"] # ✅ Update sy_dist
-                star.save()
-
-            # Save Planet
-            planet = Planet.objects.create(
-                user_inputted=True,
-                star=star,
-                name=data.get("name") + " (user inputted)",
-                orbital_period=data.get("orbital_period"),
-                radius=data.get("radius"),
-                ra=data.get("ra"),
-                dec=data.get("dec"),
-                duration=data.get("duration"),
-                transit_depth=data.get("transit_depth"),
-                star_temp=data.get("star_temp"), # These are properties of the star, but might be duplicated for planet data completeness
-                star_radius=data.get("star_radius"),
-                model_snr=data.get("model_snr"),
-                semi_major_axis=data.get("semi_major_axis"),
-                classification=classification,
-                confidence=confidence,
-            )
+            prediction = {"classification": classification, "confidence": confidence, "model_version": model_version}
+            try:
+                planet = save_prediction(data, prediction)
+            except ValueError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
             serializer = PlanetSerializer(planet)
             response_data = serializer.data
             response_data['classification'] = classification
@@ -111,17 +125,331 @@ class PredictPlanet(APIView):
             return Response(response_data, status=status.HTTP_201_CREATED)
 
         return Response(
-            {"classification": classification, "confidence": confidence},
+            {"classification": classification, "confidence": confidence, "model_version": model_version},
+            status=status.HTTP_200_OK
+        )
+
+
+class PredictPlanetBatch(PredictPlanet):
+    """
+    Classify many planet candidates in one request.
+
+    Accepts either a JSON list of rows or {"rows": [...]}, where each row has
+    the same fields as `PredictPlanet`. Rows are classified together and rows
+    with a planet and star name are bulk-inserted. Results come back per row,
+    in order, so one bad row does not fail the whole batch.
+    """
+    max_rows = 10000
+
+    def post(self, request):
+        rows = request.data.get("rows") if isinstance(request.data, dict) else request.data
+        if not isinstance(rows, list):
+            return Response(
+                {"error": "Expected a list of rows."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(rows) > self.max_rows:
+            return Response(
+                {"error": f"Too many rows (max {self.max_rows})."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            rows, results = self.classify_rows(rows)
+        except Exception as e:
+            print("❌ Batch classification error:", e)
+            return Response({"error": "Error during classification."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        saved = self.save_batch(rows, results)
+
+        return Response(
+            {
+                "results": results,
+                "saved": saved,
+                "errors": sum(1 for result in results if "error" in result),
+            },
             status=status.HTTP_200_OK
         )
 
+    def classify_rows(self, rows):
+        """
+        Clean and classify raw input rows.
+
+        Returns the cleaned rows and one result per row: a prediction, or an
+        "error" for rows that are not dicts, have a non-numeric save-only field
+        or lack the classification fields (those are not sent to the model).
+        """
+        rows = [self.clean_input(row) if isinstance(row, dict) else {} for row in rows]
+
+        # Invalid rows are reported but not sent to the model, so nothing of theirs is saved
+        results = []
+        to_classify = []
+        for i, row in enumerate(rows):
+            error = self.coerce_save_fields(row)
+            if error is None and not self.has_classification_fields(row):
+                error = "Missing one or more fields required for classification."
+            results.append({"error": error})
+            if error is None:
+                to_classify.append(i)
+        predictions = classify_batch([rows[i] for i in to_classify])
+
+        for index, prediction in zip(to_classify, predictions):
+            results[index] = prediction
+        return rows, results
 
-class PlanetList(APIView):
+    def save_batch(self, rows, results):
+        """
+        Save the classified rows that have both a planet and a star name
+        (persistence.save_predictions: a planet name check, the star upserts and
+        one planet insert). Saved rows have their result replaced by the
+        serialized planet; rows the database rejects get an "error" instead.
+        Returns the number saved.
+        """
+        saved = save_predictions(rows, results)
+        for i, planet in saved:
+            response_data = PlanetSerializer(planet).data
+            response_data["classification"] = results[i]["classification"]
+            response_data["confidence"] = results[i]["confidence"]
+            results[i] = response_data
+        return len(saved)
+
+
+class PredictPlanetUpload(PredictPlanetBatch):
+    """
+    Classify an uploaded file while it is being received.
+
+    The body is CSV (Content-Type: text/csv, with a header row) or NDJSON
+    (application/x-ndjson), optionally gzip-compressed (Content-Encoding: gzip).
+    It is parsed line by line and every `chunk_size` rows are classified and
+    saved like a `PredictPlanetBatch` request, so memory stays flat however
+    big the file is. A CSV header lacking the classification columns is
+    rejected with 400 before anything is processed.
+
+    The response is NDJSON, streamed as chunks finish: one line per row (its
+    batch result plus its `row` index), then a summary line with "rows",
+    "saved" and "errors". A chunk that can't be classified or saved gets one
+    "error" line with its first `row` and number of `rows` instead, and the
+    upload carries on. A malformed line ends the stream with an "error" line;
+    the rows before it have been processed.
+    """
+    chunk_size = 500
+
+    def check_columns(self, columns):
+        """ValueError if the CSV header lacks more classification columns than may be imputed."""
+        missing = [field for field in self.classification_fields if field not in columns]
+        if len(missing) > ai_model.max_imputed_fields():
+            raise ValueError(f"Missing column(s): {', '.join(missing)}.")
+
+    def post(self, request):
+        try:
+            columns, rows = open_upload(
+                request.stream, request.content_type, request.headers.get("Content-Encoding")
+            )
+            if columns is not None:
+                self.check_columns(columns)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return StreamingHttpResponse(self.stream_results(rows), content_type=NDJSONRenderer.media_type)
+
+    def stream_results(self, rows):
+        """Classify and save `rows` chunk by chunk, yielding NDJSON for each chunk."""
+        total = saved = errors = 0
+        while True:
+            chunk = []
+            try:
+                for row in rows:
+                    chunk.append(row)
+                    if len(chunk) >= self.chunk_size:
+                        break
+            except ValueError as e:
+                failure = {"error": str(e), "row": total + len(chunk)}
+            else:
+                failure = None
+
+            if chunk:
+                # Rows the model or database reject are per-row errors; this
+                # only catches the model or database being unavailable
+                chunk_error = "Error during classification."
+                try:
+                    cleaned, results = self.classify_rows(chunk)
+                    chunk_error = "Error while saving."
+                    saved += self.save_batch(cleaned, results)
+                except Exception as e:
+                    print("❌ Upload chunk error:", e)
+                    yield dumps({"error": chunk_error, "row": total, "rows": len(chunk)}) + "\n"
+                    errors += len(chunk)
+                else:
+                    errors += sum(1 for result in results if "error" in result)
+                    yield "".join(
+                        dumps(dict(result, row=total + offset)) + "\n" for offset, result in enumerate(results)
+                    )
+                total += len(chunk)
+
+            if failure is not None:
+                yield dumps(failure) + "\n"
+                return
+            if len(chunk) < self.chunk_size:
+                break
+        yield dumps({"rows": total, "saved": saved, "errors": errors}) + "\n"
+
+
+class PredictionJobCreate(APIView):
+    """
+    Start an asynchronous prediction job for a large upload.
+
+    The body is a CSV file (Content-Type: text/csv, with a header row) or
+    NDJSON (application/x-ndjson), optionally gzip-compressed, one candidate
+    per row with the same fields as `PredictPlanet`. The rows are stored and 202 is returned with the job
+    id right away; workers classify and save them in chunks (api/jobs.py).
+    """
+    authentication_classes = []
+    permission_classes = []
+
+    def post(self, request):
+        try:
+            _, rows = open_upload(request.stream, request.content_type, request.headers.get("Content-Encoding"))
+            job = jobs.create_job(rows)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if jobs.job_settings()["IN_PROCESS"]:
+            transaction.on_commit(jobs.start_workers)
+
+        url = reverse("prediction-job", args=[job.pk])
+        return Response(
+            {"id": str(job.pk), "status": job.status, "total_rows": job.total_rows, "url": url},
+            status=status.HTTP_202_ACCEPTED,
+            headers={"Location": url},
+        )
+
+
+class PredictionJobDetail(APIView):
+    """
+    Progress and results of a prediction job.
+
+    Results are keyset-paginated in row order (`limit=`, `cursor=`; see
+    KeysetPagination) and only cover rows classified so far. Each one is the
+    row's `PredictPlanetBatch` result plus its `row` index. While the job is
+    still running, `next` points past the last row returned, so polling with
+    it picks up where the previous page stopped.
+    """
     authentication_classes = []
     permission_classes = []
 
+    def get(self, request, job_id):
+        job = PredictionJob.objects.filter(pk=job_id).first()
+        if job is None:
+            return Response({"error": "Job not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        paginator = KeysetPagination(request)
+        classified = job.rows.filter(result__isnull=False).values_list("id", "index", "result")
+        try:
+            page, next_cursor = paginator.paginate(classified, id_of=lambda row: row[0])
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if next_cursor is None and job.status in (PredictionJob.QUEUED, PredictionJob.RUNNING):
+            next_cursor = paginator.encode_cursor(page[-1][0]) if page else request.query_params.get("cursor")
+
+        return Response({
+            "id": str(job.pk),
+            "status": job.status,
+            "total_rows": job.total_rows,
+            "processed_rows": job.processed_rows,
+            "saved_rows": job.saved_rows,
+            "error_rows": job.error_rows,
+            "progress": round(job.processed_rows / job.total_rows, 4) if job.total_rows else 0.0,
+            "error": job.error or None,
+            "created_at": job.created_at,
+            "started_at": job.started_at,
+            "finished_at": job.finished_at,
+            "results": [dict(result, row=index) for _, index, result in page],
+            "next": next_cursor,
+        })
+
+
+class ModelReady(APIView):
+    """
+    Readiness probe: 200 once the ML assets are loaded, 503 while loading.
+    """
+    authentication_classes = []
+    permission_classes = []
+
+    def get(self, request):
+        model_status = ai_model.get_status()
+        if model_status["ready"]:
+            return Response(model_status, status=status.HTTP_200_OK)
+        return Response(model_status, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+class ModelMetrics(APIView):
+    """
+    Inference counters (micro-batch queue depth and batch-size histograms).
+    """
+    authentication_classes = []
+    permission_classes = []
+
+    def get(self, request):
+        return Response(ai_model.get_metrics())
+
+
+class CatalogStreamMixin:
+    """
+    Streaming output for the full catalogs.
+
+    `?format=ndjson` (or `Accept: application/x-ndjson`) streams one JSON object
+    per line; `?stream=true` streams a regular JSON array. Rows are read in
+    fixed-size chunks and encoded as they go, so memory stays flat however big
+    the catalog is.
+    """
+    renderer_classes = list(api_settings.DEFAULT_RENDERER_CLASSES) + [NDJSONRenderer]
+    stream_chunk_size = 2000
+
+    def wants_stream(self, request):
+        return (
+            request.accepted_renderer.format == NDJSONRenderer.format
+            or request.query_params.get('stream') in ('1', 'true')
+        )
+
+    def stream_response(self, request, queryset, serializer):
+        rows = iter_rows(queryset, serializer, chunk_size=self.stream_chunk_size)
+        if request.accepted_renderer.format == NDJSONRenderer.format:
+            return StreamingHttpResponse(buffered(stream_ndjson(rows)), content_type=NDJSONRenderer.media_type)
+        return StreamingHttpResponse(buffered(stream_json_array(rows)), content_type="application/json")
+
+
+class PlanetList(CatalogStreamMixin, APIView):
+    """
+    List planets, optionally filtered by `classification` and `search`.
+
+    - `fields=id,name,ra,dec,classification` only selects and returns those columns.
+    - `limit=` and/or `cursor=` switch to keyset pagination; the response is then
+      {"results": [...], "next": <cursor or null>}. Without them the full list
+      is returned as before.
+    - `format=ndjson` / `stream=true` stream the whole (filtered) list.
+    """
+    authentication_classes = []
+    permission_classes = []
+
+    def get_fields(self, request):
+        """Parse the `fields=` projection. Returns None when not given."""
+        fields = request.query_params.get('fields')
+        if not fields:
+            return None
+        fields = [field.strip() for field in fields.split(',') if field.strip()]
+        unknown = set(fields) - set(PlanetSerializer().fields)
+        if unknown:
+            raise ValueError(f"Unknown field(s): {', '.join(sorted(unknown))}")
+        return fields
+
     def get(self, request):
-        planets = Planet.objects.all().select_related('star')
+        try:
+            fields = self.get_fields(request)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Rows are read with values_list(), so a `fields=` projection happens in the query
+        serializer = FastCatalogSerializer(PlanetSerializer, fields)
+        planets = Planet.objects.all()
 
         classification = request.query_params.get('classification')
         if classification:
@@ -131,17 +459,108 @@ class PlanetList(APIView):
         if search:
             planets = planets.filter(name__icontains=search)
 
-        serializer = PlanetSerializer(planets, many=True)
-        return Response(serializer.data)
+        if self.wants_stream(request):
+            return self.stream_response(request, planets, serializer)
 
-class StarList(APIView):
+        paginator = KeysetPagination(request)
+        if paginator.is_requested():
+            try:
+                rows, next_cursor = paginator.paginate(serializer.rows(planets), id_of=serializer.id_of)
+            except ValueError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({"results": serializer.to_representation(rows), "next": next_cursor})
+
+        return Response(serializer.serialize(planets))
+
+class StarList(CatalogStreamMixin, APIView):
     authentication_classes = []
     permission_classes = []
 
     def get(self, request):
         stars = Star.objects.all()
-        serializer = StarSerializer(stars, many=True)
-        return Response(serializer.data)
+        serializer = FastCatalogSerializer(StarSerializer)
+        if self.wants_stream(request):
+            return self.stream_response(request, stars, serializer)
+
+        return Response(serializer.serialize(stars))
+
+class StarConeSearch(APIView):
+    """
+    Stars within `radius` degrees of (`ra`, `dec`), nearest first.
+
+    Backed by an in-memory KD-tree on unit vectors (see api/spatial.py), so it
+    doesn't scan the catalog. Each star has an extra `distance` in degrees.
+    """
+    authentication_classes = []
+    permission_classes = []
+    max_limit = 5000
+
+    def parse(self, request):
+        params = request.query_params
+        try:
+            ra = float(params["ra"])
+            dec = float(params["dec"])
+            radius = float(params["radius"])
+            limit = int(params.get("limit", 100))
+        except (KeyError, ValueError):
+            raise ValueError("ra, dec and radius are required numbers; limit must be an integer.")
+        if not 0 <= ra <= 360 or not -90 <= dec <= 90:
+            raise ValueError("ra must be in [0, 360] and dec in [-90, 90].")
+        if not 0 < radius <= 180:
+            raise ValueError("radius must be in (0, 180] degrees.")
+        if limit <= 0:
+            raise ValueError("limit must be a positive integer.")
+        return ra, dec, radius, min(limit, self.max_limit)
+
+    def get(self, request):
+        try:
+            ra, dec, radius, limit = self.parse(request)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        matches = get_star_index().cone(ra, dec, radius, limit)
+        stars = {
+            star["id"]: star
+            for star in FastCatalogSerializer(StarSerializer).serialize(
+                Star.objects.filter(id__in=[star_id for star_id, _ in matches])
+            )
+        }
+        results = []
+        for star_id, distance in matches:
+            star = stars.get(star_id)
+            if star is not None:  # deleted since the index was built
+                star["distance"] = distance
+                results.append(star)
+        return Response(results)
+
+
+
+class StarTileView(APIView):
+    """
+    Level-of-detail tile of the star catalog for the Galaxy view.
+
+    Level L splits RA and Dec into 2**L x 2**L tiles (x along RA, y along Dec
+    from -90°). Levels below STAR_TILE_MAX_LEVEL return aggregated points with
+    a `count`; STAR_TILE_MAX_LEVEL returns full star rows. Tiles are stored
+    pre-encoded (build_star_tiles) and carry an ETag, so unchanged tiles are
+    answered with 304.
+    """
+    authentication_classes = []
+    permission_classes = []
+
+    def get(self, request, level, x, y):
+        max_level = settings.STAR_TILE_MAX_LEVEL
+        if level > max_level or x >= tile_count(level) or y >= tile_count(level):
+            return Response({"error": "Tile not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        tile = get_tile(level, x, y, max_level, settings.STAR_TILE_GRID)
+        response = get_conditional_response(request, etag=tile.etag)
+        if response is None:
+            response = HttpResponse(tile.body, content_type="application/json")
+        response["ETag"] = tile.etag
+        patch_cache_control(response, public=True, max_age=settings.STAR_TILE_MAX_AGE)
+        return response
+
 
 class StarPlanetList(APIView):
     """
@@ -151,22 +570,16 @@ class StarPlanetList(APIView):
     permission_classes = []
 
     def get(self, request, star_id):
-        try:
-            # Find the star by its primary key (id)
-            star = Star.objects.get(pk=star_id)
-        except Star.DoesNotExist:
+        # Check the star exists by its primary key (id)
+        if not Star.objects.filter(pk=star_id).exists():
             # If the star doesn't exist, return a 404 Not Found response
             return Response(
                 {"error": "Star not found."},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        # Get all planets related to this star using the 'related_name' from the model
-        planets = star.planets.all()
-
-        # Serialize the list of planets
-        serializer = PlanetSerializer(planets, many=True)
+        # Get all planets related to this star
+        planets = Planet.objects.filter(star_id=star_id)
 
-        # Return the serialized data in the response
-        print(serializer.data)
-        return Response(serializer.data)
\ No newline at end of file
+        # Serialize the list of planets straight from the query rows
+        return Response(FastCatalogSerializer(PlanetSerializer).serialize(planets))
\ No newline at end of file
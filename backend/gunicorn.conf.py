@@ -0,0 +1,9 @@
+# Loaded by gunicorn from the working directory (backend/).
+
+
+def post_worker_init(worker):
+    # Start the model warm-up and job worker threads in each worker, after the
+    # fork: with --preload, Django's AppConfig.ready() ran in the master
+    from api.apps import start_background_threads
+
+    start_background_threads()
@@ -44,6 +44,84 @@ REST_FRAMEWORK = {
     "PAGE_SIZE": 500
 }
 
+# ML inference backend: "numpy" runs the folded Dense/BatchNorm weights with
+# plain matmuls, "keras" goes through model.predict, "onnx" runs api/model.onnx
+# (python manage.py export_onnx) with ONNX Runtime. "auto" uses ONNX Runtime
+# when it is installed and model.onnx exists, else numpy.
+ML_INFERENCE_BACKEND = os.getenv("ML_INFERENCE_BACKEND", "numpy")
+
+# With the numpy backend, export the weights once to api/model_weights.bin and
+# memory-map it in every worker instead of loading TensorFlow per process
+ML_SHARED_WEIGHTS = os.getenv("ML_SHARED_WEIGHTS", "1") == "1"
+
+# Threads TensorFlow may use when the keras backend is active
+ML_TF_INTRA_OP_THREADS = int(os.getenv("ML_TF_INTRA_OP_THREADS", "1"))
+ML_TF_INTER_OP_THREADS = int(os.getenv("ML_TF_INTER_OP_THREADS", "1"))
+
+# Threads for the ONNX Runtime session when the onnx backend is active
+ML_ONNX_THREADS = int(os.getenv("ML_ONNX_THREADS", "1"))
+
+# Micro-batching: concurrent /api/predict/ requests within MAX_WAIT_MS are run
+# as one matrix (up to MAX_ROWS). Only useful with threaded/async workers.
+ML_MICROBATCH_ENABLED = os.getenv("ML_MICROBATCH_ENABLED", "0") == "1"
+ML_MICROBATCH_MAX_WAIT_MS = float(os.getenv("ML_MICROBATCH_MAX_WAIT_MS", "2"))
+ML_MICROBATCH_MAX_ROWS = int(os.getenv("ML_MICROBATCH_MAX_ROWS", "64"))
+
+# Cache of predictions keyed on the rounded feature vector + model version.
+# BACKEND: "local" (per-process LRU), "django" (the CACHES alias below, shared
+# across workers) or "none"
+ML_PREDICTION_CACHE = {
+    "BACKEND": os.getenv("ML_PREDICTION_CACHE_BACKEND", "local"),
+    "ALIAS": os.getenv("ML_PREDICTION_CACHE_ALIAS", "default"),
+    "MAX_ENTRIES": int(os.getenv("ML_PREDICTION_CACHE_MAX_ENTRIES", "10000")),
+    "TTL": int(os.getenv("ML_PREDICTION_CACHE_TTL", "3600")),
+    "PRECISION": 6,
+}
+
+# How many of the seven classification fields a candidate may leave out. Missing
+# (or out-of-range) values get the training median, as they did in training:
+# the TESS and K2 tables have no model_snr at all.
+ML_MAX_IMPUTED_FIELDS = int(os.getenv("ML_MAX_IMPUTED_FIELDS", "1"))
+
+# Expected SHA-256 of the downloaded model files, as "model.keras=<hex>,...".
+# Files without a pin are checked against the checksum Hugging Face reports.
+ML_MODEL_FILE_SHA256 = dict(
+    pin.split("=", 1) for pin in os.getenv("ML_MODEL_FILE_SHA256", "").split(",") if "=" in pin
+)
+
+# Versioned model bundles (python manage.py model_registry). Once a version is
+# promoted, workers load it instead of the files in api/, and switch to a newly
+# promoted one within RELOAD_INTERVAL seconds without a restart.
+ML_MODEL_REGISTRY_DIR = os.getenv("ML_MODEL_REGISTRY_DIR", str(BASE_DIR / "model_registry"))
+ML_MODEL_RELOAD_INTERVAL = float(os.getenv("ML_MODEL_RELOAD_INTERVAL", "2"))
+
+# Asynchronous prediction jobs (/api/predict/jobs/, see api/jobs.py). The queue
+# is a database table; IN_PROCESS runs WORKERS threads in each server process,
+# otherwise run `python manage.py run_prediction_jobs`. A job whose worker
+# hasn't reported progress for STALE_AFTER seconds is resumed by another one.
+ML_PREDICTION_JOBS = {
+    "IN_PROCESS": os.getenv("ML_PREDICTION_JOBS_IN_PROCESS", "1") == "1",
+    "WORKERS": int(os.getenv("ML_PREDICTION_JOBS_WORKERS", "1")),
+    "CHUNK_SIZE": int(os.getenv("ML_PREDICTION_JOBS_CHUNK_SIZE", "1000")),
+    "MAX_ROWS": int(os.getenv("ML_PREDICTION_JOBS_MAX_ROWS", "200000")),
+    "STALE_AFTER": int(os.getenv("ML_PREDICTION_JOBS_STALE_AFTER", "60")),
+    "POLL_INTERVAL": 1.0,
+}
+
+# Load the model in a background thread when a server process starts, so the
+# first /api/predict/ request doesn't pay for it. This thread and the in-process
+# job workers start in each serving process: at startup for runserver and the
+# ASGI servers; for gunicorn and uWSGI, which may import the app in a master and
+# fork (--preload), in each worker's post_worker_init hook (gunicorn.conf.py)
+# or else on its first request. The master never loads the model.
+ML_WARMUP_ON_STARTUP = os.getenv("ML_WARMUP_ON_STARTUP", "1") == "1"
+
+# Level-of-detail star tiles for the Galaxy view. Levels below MAX_LEVEL
+# aggregate stars on a GRID x GRID raster per tile; MAX_LEVEL has full rows.
+STAR_TILE_MAX_LEVEL = int(os.getenv("STAR_TILE_MAX_LEVEL", "6"))
+STAR_TILE_GRID = int(os.getenv("STAR_TILE_GRID", "16"))
+STAR_TILE_MAX_AGE = int(os.getenv("STAR_TILE_MAX_AGE", "300"))
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=30),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
@@ -5,6 +5,9 @@ import VisualizationShell from "../components/VisualizationShell";
 import ChartsPanel from "../components/ChartsPanel";
 import LoadingSpinner from "../components/LoadingSpinner";
 
+// Rows per /api/predict/batch/ request (the server accepts up to 10000)
+const CSV_BATCH_SIZE = 1000;
+
 function Home({ planets, setPlanets }) {
     const [predictionResults, setPredictionResults] = useState([]);
     const [csvData, setCsvData] = useState([]);
@@ -154,16 +157,22 @@ function Home({ planets, setPlanets }) {
 
         setLoadingCSV(true);
         try {
-            const promises = csvData.map((row) => api.post("/api/predict/", row));
-            const results = await Promise.allSettled(promises);
-            const predictions = results
-                .filter((r) => r.status === "fulfilled")
-                .map((r) => r.value.data); // Assuming value.data is where your prediction is
+            // Classify the rows in batches (errors come back per row); a failed
+            // batch only loses its own rows
+            const predictions = [];
+            for (let start = 0; start < csvData.length; start += CSV_BATCH_SIZE) {
+                try {
+                    const res = await api.post("/api/predict/batch/", {
+                        rows: csvData.slice(start, start + CSV_BATCH_SIZE),
+                    });
+                    predictions.push(...res.data.results.filter((r) => !r.error));
+                } catch (error) {
+                    console.error(`Rows ${start + 1}-${start + CSV_BATCH_SIZE} failed:`, error);
+                }
+            }
             setPredictionResults(predictions);
             setPlanets((prev) => [...prev, ...predictions]);
             getStars(); // Refresh stars to potentially show new star data
-        } catch (error) {
-            console.error(error);
         } finally {
             setLoadingCSV(false);
         }
@@ -1,3 +1,6 @@
+import os
+import sys
+
 import pandas as pd
 import numpy as np
 import joblib
@@ -13,60 +16,53 @@ from tensorflow import keras
 from tensorflow.keras import layers, callbacks, mixed_precision # type: ignore
 from tensorflow.keras.models import load_model # type: ignore
 
-mixed_precision.set_global_policy('mixed_float16')
-
-# --- Load Data ---
-df = pd.read_csv('Full Data.csv')
-print("Original DataFrame shape:", df.shape)
-print("Original DataFrame dtypes:\n", df.dtypes)
-
-# ---------------- Data Preprocessing ----------------
-fp_flags = ['fp_flag_nt','fp_flag_ss','fp_flag_co','fp_flag_ec']
-df['any_fp_flag'] = df[fp_flags].sum(axis=1) > 0
+from stage_cache import StageCache
+from storage import read_table
 
-def make_label(row):
-    if row['disposition'] == 1:
-        return 'confirmed'
-    elif row['disposition'] == 0 and row['any_fp_flag']:
-        return 'false_positive'
-    else:
-        return 'candidate'
+# Feature/label preparation is shared with the API (backend/api/features.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend'))
+from api import features as features_module
+from api.features import MODEL_FEATURES, RAW_FEATURES, Preprocessor, prepare_training_data, to_model_features
 
-df['label'] = df.apply(make_label, axis=1)
-print("\nLabel distribution:\n", df['label'].value_counts())
+mixed_precision.set_global_policy('mixed_float16')
 
-features = [
-    'period','duration','transit_depth','planet_radius',
-    'star_temp','star_radius','model_snr'
-]
-X = df[features].copy()
-y = df['label'].copy()
+# --- Load Data ---
+# Full Data.csv, or the .parquet/.arrow copy written by preprocessing.py --output
+# (.arrow reloads several times faster than CSV, see storage.py)
+DATA_PATH = os.getenv('FULL_DATA_PATH', 'Full Data.csv')
+# Preprocessing results are reused until the data file or the stage code changes
+# (STAGE_CACHE=0 to always recompute)
+cache = StageCache(os.getenv('STAGE_CACHE_DIR', '.stage_cache'), enabled=os.getenv('STAGE_CACHE', '1') == '1')
 
 
-num_cols = features.copy()
-for c in ['period','duration','planet_radius','star_radius','model_snr']:
-    X.loc[X[c] <= 0, c] = np.nan
-for c in ['transit_depth','star_temp']:
-    X.loc[X[c] < 0, c] = np.nan
+# ---------------- Data Preprocessing ----------------
+def prepare_features(path):
+    """Labels plus the cleaned, imputed and log-transformed feature matrix (see api/features.py)."""
+    df = read_table(path)
+    print("Original DataFrame shape:", df.shape)
+    print("Original DataFrame dtypes:\n", df.dtypes)
 
-for c in num_cols:
-    if X[c].isna().any():
-        X[c].fillna(X[c].median(), inplace=True)
-print(f"\nNaNs after median imputation: {X.isna().sum().sum()}")
+    X, y, medians = prepare_training_data(df)
+    X = pd.DataFrame(X, columns=MODEL_FEATURES)
+    y = pd.Series(y, name='label')
+    print("\nLabel distribution:\n", y.value_counts())
+    print(f"\nNaNs after median imputation: {X.isna().sum().sum()}")
+    return X, y, medians
 
 
-# Log transforms
-X['transit_depth_log'] = np.log1p(X['transit_depth'])
-X['planet_radius_log'] = np.log1p(X['planet_radius'])
-X = X.drop(columns=['transit_depth','planet_radius'])
+def fit_scaling(X, y):
+    """Fitted scaler and label encoder with the transformed features and encoded labels."""
+    scaler = RobustScaler()
+    X_scaled = scaler.fit_transform(X)
 
-current_features_for_scaling = X.columns.tolist()
+    le = LabelEncoder()
+    y_enc = le.fit_transform(y)
+    return scaler, X_scaled, le, y_enc
 
-scaler = RobustScaler()
-X_scaled = scaler.fit_transform(X)
 
-le = LabelEncoder()
-y_enc = le.fit_transform(y)
+# The shared feature module is an input too, so changing it invalidates the cache
+X, y, medians = cache.run('features', prepare_features, DATA_PATH, files=[DATA_PATH, features_module.__file__])
+scaler, X_scaled, le, y_enc = cache.run('scaling', fit_scaling, X, y, depends=['features'])
 print("\nLabel mapping:", dict(zip(le.classes_, range(len(le.classes_)))))
 
 # ---------------- Train/Test Split ----------------
@@ -153,12 +149,16 @@ plt.show()
 model.save('exoplanet_classifier_final.keras')
 joblib.dump(scaler, 'scaler.joblib')
 joblib.dump(le, 'label_encoder.joblib')
+# Training medians and masking rules, applied by the API to incomplete candidates
+preprocessor = Preprocessor(dict(zip(RAW_FEATURES, medians)))
+preprocessor.save('preprocessing.json')
 
-print("\nSaved: exoplanet_classifier_best.keras (checkpoint), exoplanet_classifier_final.keras, scaler.joblib, label_encoder.joblib")
+print("\nSaved: exoplanet_classifier_best.keras (checkpoint), exoplanet_classifier_final.keras, scaler.joblib, label_encoder.joblib, preprocessing.json")
 
 print("\n--- Interactive Prediction ---")
 scaler = joblib.load('scaler.joblib')
 le = joblib.load('label_encoder.joblib')
+preprocessor = Preprocessor.load('preprocessing.json')
 model = load_model('exoplanet_classifier_final.keras')
 
 print("Enter the following parameters for prediction:\n")
@@ -171,30 +171,18 @@ model_snr = float(input("Model SNR (signal-to-noise ratio): "))
 transit_depth = float(input("Transit depth (ppm): "))
 planet_radius = float(input("Planet radius (in Earth radii): "))
 
-xrow = pd.DataFrame([[
+raw = [[
     period, duration, transit_depth, planet_radius,
     star_temp, star_radius, model_snr
-]], columns=features)
-
-for c in ['period','duration','planet_radius','star_radius','model_snr']:
-    if xrow.loc[0, c] <= 0: xrow.loc[0, c] = np.nan
-for c in ['transit_depth','star_temp']:
-    if xrow.loc[0, c] < 0: xrow.loc[0, c] = np.nan
-
-
-for c in features:
-    if xrow[c].isna().any():
-        print(f"Warning: Imputing NaN for '{c}' during interactive prediction. Consider providing valid inputs.")
-        xrow[c].fillna(X[c].median(), inplace=True)
+]]
 
-# Log transforms
-xrow['transit_depth_log'] = np.log1p(xrow['transit_depth'])
-xrow['planet_radius_log'] = np.log1p(xrow['planet_radius'])
-xrow = xrow.drop(columns=['transit_depth','planet_radius'])
+if not np.array_equal(preprocessor.transform(raw), raw):
+    print("Warning: Imputing training medians for invalid inputs. Consider providing valid inputs.")
+raw = preprocessor.transform(raw)
 
-# Scale features
-# Ensure the columns for scaling match the order used during training
-xscaled = scaler.transform(xrow[current_features_for_scaling])
+# Log transforms and scaling, in the same column order as training
+xrow = pd.DataFrame(to_model_features(raw), columns=MODEL_FEATURES)
+xscaled = scaler.transform(xrow)
 
 pred_proba = model.predict(xscaled)[0]
 pred_label = le.inverse_transform([pred_proba.argmax()])[0]
@@ -0,0 +1,155 @@
+"""
+Time preprocessing.build_full_data against the original row-by-row script
+and check both write the same Full Data.csv.
+
+Runs on the real survey CSVs when --data-dir has them, otherwise on
+synthetic archive-shaped tables (mapped columns plus filler columns):
+
+    python benchmark_preprocessing.py --rows 50000
+    python benchmark_preprocessing.py --data-dir data/model
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from preprocessing import COLUMN_MAPPING, DEFAULT_SOURCES, TARGET_MAP, build_full_data
+
+
+# ---------------- Original implementation, kept for comparison ----------------
+
+def legacy_generate_display_name(row, source_name, raw_df):
+    if source_name == "kepler":
+        return row["kepler_name"]
+    elif source_name == "k2":
+        return row["k2_name"]
+    elif source_name == "tess":
+        return f"TOI-{row['toi']}"
+    return "Unknown"
+
+
+def legacy_process_dataset(filepath, source_name):
+    df = pd.read_csv(filepath, comment='#')
+    processed_cols = {}
+    for standard_name, source_map in COLUMN_MAPPING.items():
+        original_name = source_map.get(source_name)
+        if original_name and original_name in df.columns:
+            processed_cols[standard_name] = df[original_name]
+        else:
+            processed_cols[standard_name] = pd.Series([np.nan] * len(df), name=standard_name)
+    processed_df = pd.DataFrame(processed_cols)
+    processed_df['display_name'] = [
+        legacy_generate_display_name(raw_row, source_name, df)
+        for _, raw_row in df.iterrows()
+    ]
+    processed_df['disposition'] = processed_df['disposition'].map(TARGET_MAP[source_name])
+    processed_df = processed_df[processed_df['disposition'].notna()]
+    processed_df['disposition'] = processed_df['disposition'].astype(int)
+    processed_df['source'] = source_name
+    return processed_df
+
+
+def legacy_build_full_data(sources):
+    df_merged = pd.concat([legacy_process_dataset(path, name) for name, path in sources.items()], ignore_index=True)
+    fp_flag_cols = [col for col in df_merged.columns if 'fp_flag' in col]
+    df_merged[fp_flag_cols] = df_merged[fp_flag_cols].fillna(0)
+    numeric_cols = df_merged.select_dtypes(include=np.number).columns.drop('disposition')
+    for col in numeric_cols:
+        if df_merged[col].isnull().any():
+            df_merged[col] = df_merged[col].fillna(df_merged[col].median())
+    return pd.get_dummies(df_merged, columns=['source'], drop_first=True)
+
+
+# ---------------- Synthetic archive tables ----------------
+
+def write_synthetic_surveys(directory, rows, filler_columns, seed=0):
+    rng = np.random.default_rng(seed)
+    sources = {}
+    for source_name in DEFAULT_SOURCES:
+        table = {}
+        for source_map in COLUMN_MAPPING.values():
+            column = source_map.get(source_name)
+            if column and column not in table:
+                values = rng.lognormal(2.0, 1.0, rows).round(4)
+                values[rng.random(rows) < 0.1] = np.nan
+                table[column] = values
+        for column in ('koi_fpflag_nt', 'koi_fpflag_ss', 'koi_fpflag_co', 'koi_fpflag_ec'):
+            if column in table:
+                table[column] = rng.integers(0, 2, rows)
+        dispositions = list(TARGET_MAP[source_name]) + ['REFUTED']
+        disposition_column = COLUMN_MAPPING['disposition'][source_name]
+        table[disposition_column] = rng.choice(dispositions, rows)
+        if source_name == 'tess':
+            table['toi'] = (np.arange(rows) + 100 + rng.integers(1, 4, rows) / 100).round(2)
+        else:
+            names = np.array([f"{source_name.upper()}-{i} b" for i in range(rows)], dtype=object)
+            names[rng.random(rows) < 0.3] = None
+            table[f"{source_name}_name"] = names
+        for i in range(filler_columns):
+            table[f"extra_{i}"] = rng.choice(['x', 'y', 'z'], rows) if i % 3 == 0 else rng.random(rows)
+
+        path = os.path.join(directory, os.path.basename(DEFAULT_SOURCES[source_name]))
+        with open(path, 'w') as f:
+            f.write("# This file was produced by the NASA Exoplanet Archive\n# COLUMN list omitted\n")
+            pd.DataFrame(table).to_csv(f, index=False)
+        sources[source_name] = path
+    return sources
+
+
+def timed(func, repeat):
+    best, result = None, None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def to_csv_text(df):
+    buffer = io.StringIO()
+    df.to_csv(buffer, index=False)
+    return buffer.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--data-dir', help="Folder with the real survey CSVs")
+    parser.add_argument('--rows', type=int, default=20000, help="Rows per synthetic survey")
+    parser.add_argument('--filler-columns', type=int, default=80)
+    parser.add_argument('--chunk-size', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        if args.data_dir:
+            sources = {
+                name: os.path.join(args.data_dir, os.path.basename(path)) for name, path in DEFAULT_SOURCES.items()
+            }
+        else:
+            sources = write_synthetic_surveys(directory, args.rows, args.filler_columns)
+
+        legacy_time, legacy_df = timed(lambda: legacy_build_full_data(sources), args.repeat)
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            new_time, new_df = timed(lambda: build_full_data(sources), args.repeat)
+            chunked_time, chunked_df = timed(lambda: build_full_data(sources, args.chunk_size), args.repeat)
+
+    expected = to_csv_text(legacy_df)
+    for label, df in (("whole-file", new_df), ("chunked", chunked_df)):
+        if to_csv_text(df) != expected:
+            raise SystemExit(f"❌ {label} output differs from the original script")
+
+    print(f"📊 {len(legacy_df)} output rows")
+    print(f"   original script: {legacy_time:.3f}s")
+    print(f"   vectorized:      {new_time:.3f}s ({legacy_time / new_time:.1f}x)")
+    print(f"   chunked ({args.chunk_size}): {chunked_time:.3f}s ({legacy_time / chunked_time:.1f}x)")
+    print("✅ Output is byte-identical")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Compare reload time and file size of Full Data in CSV, Parquet and Arrow IPC.
+
+Uses an existing Full Data CSV when given, otherwise builds one from
+synthetic surveys (see benchmark_preprocessing.py):
+
+    python benchmark_storage.py --csv "data/Full Data.csv"
+    python benchmark_storage.py --rows 100000
+"""
+import argparse
+import contextlib
+import os
+import tempfile
+import time
+
+from benchmark_preprocessing import write_synthetic_surveys
+from preprocessing import build_full_data
+from storage import FULL_DATA_COLUMNS, read_table, write_table
+
+
+def best_of(repeat, func):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--csv', help="Existing Full Data CSV")
+    parser.add_argument('--rows', type=int, default=50000, help="Rows per synthetic survey")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        if args.csv:
+            df = read_table(args.csv)
+        else:
+            sources = write_synthetic_surveys(directory, args.rows, filler_columns=0)
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                df = build_full_data(sources)
+
+        paths = {fmt: os.path.join(directory, f"Full Data.{fmt}") for fmt in ('csv', 'parquet', 'arrow')}
+        for path in paths.values():
+            write_table(df, path, FULL_DATA_COLUMNS)
+
+        print(f"📊 {len(df)} rows x {len(df.columns)} columns")
+        csv_time = csv_size = None
+        for fmt, path in paths.items():
+            elapsed = best_of(args.repeat, lambda: read_table(path))
+            size = os.path.getsize(path)
+            csv_time, csv_size = csv_time or elapsed, csv_size or size
+            print(
+                f"   {fmt:8} {size / 1e6:7.2f} MB ({csv_size / size:4.1f}x smaller) | "
+                f"read {elapsed * 1000:7.1f} ms ({csv_time / elapsed:5.1f}x faster)"
+            )
+
+
+if __name__ == '__main__':
+    main()
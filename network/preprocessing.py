@@ -1,19 +1,9 @@
+import argparse
+import os
+
 import pandas as pd
 import numpy as np
 
-def generate_display_name(row, source_name, raw_df):
-    """Generate a unified display name for Kepler, K2, and TESS datasets."""
-    if source_name == "kepler":
-        return row["kepler_name"]
-    
-    elif source_name == "k2":
-        return row["k2_name"]
-    
-    elif source_name == "tess":
-        return f"TOI-{row['toi']}"
-    
-    return "Unknown"
-
 
 COLUMN_MAPPING = {
     'disposition':       {'kepler': 'koi_disposition', 'k2': 'disposition',   'tess': 'tfopwg_disp'},
@@ -39,106 +29,169 @@ TARGET_MAP = {
     'tess':   {'CP': 1, 'FP': 0, 'PC': 2}
 }
 
+# Raw column the display name is built from: kepler_name / k2_name as-is,
+# TESS as "TOI-<toi>"
+DISPLAY_NAME_COLUMNS = {'kepler': 'kepler_name', 'k2': 'k2_name', 'tess': 'toi'}
+
+DEFAULT_SOURCES = {
+    'kepler': 'data/Kepler Data.csv',
+    'k2': 'data/K2 Data.csv',
+    'tess': 'data/TESS Data.csv',
+}
+DEFAULT_OUTPUT = 'data/Full Data.csv'
+
+
+def source_dtypes(source_name):
+    """Raw columns to read for a source, with their dtypes (text for names and dispositions)."""
+    dtypes = {}
+    for standard_name, source_map in COLUMN_MAPPING.items():
+        original_name = source_map.get(source_name)
+        if original_name:
+            dtypes[original_name] = str if standard_name == 'disposition' else 'float64'
+    display_column = DISPLAY_NAME_COLUMNS.get(source_name)
+    if display_column:
+        dtypes[display_column] = 'float64' if source_name == 'tess' else str
+    return dtypes
+
+
+def generate_display_names(raw_df, source_name):
+    """Unified display names for Kepler, K2, and TESS rows, as one vectorized Series."""
+    if source_name in ('kepler', 'k2'):
+        return raw_df[DISPLAY_NAME_COLUMNS[source_name]].astype(object)
+    if source_name == 'tess':
+        return 'TOI-' + raw_df['toi'].astype(str)
+    return pd.Series('Unknown', index=raw_df.index, dtype=object)
 
 
-def process_dataset(filepath, source_name):
+def process_chunk(raw_df, source_name):
+    """Select, rename and label one block of raw rows; rows without a known disposition are dropped."""
+    processed_df = pd.DataFrame(index=raw_df.index)
+
+    # Map and rename columns based on our standard schema
+    for standard_name, source_map in COLUMN_MAPPING.items():
+        original_name = source_map.get(source_name)
+        if original_name and original_name in raw_df.columns:
+            processed_df[standard_name] = raw_df[original_name]
+        else:
+            processed_df[standard_name] = np.nan
+
+    processed_df['display_name'] = generate_display_names(raw_df, source_name)
+
+    disposition = processed_df['disposition'].map(TARGET_MAP[source_name])
+    keep = disposition.notna()
+    processed_df = processed_df[keep].assign(disposition=disposition[keep].astype(int))
+    processed_df['source'] = source_name
+    return processed_df
+
+
+def process_dataset(filepath, source_name, chunk_size=None):
     """
     Loads, selects, renames, and cleans a single exoplanet dataset.
-    
+
+    Only the mapped columns are parsed. With `chunk_size`, the file is read
+    and processed that many rows at a time, so only the selected columns of a
+    large archive dump are ever held in memory.
+
     Args:
         filepath (str): Path to the CSV file.
         source_name (str): The name of the data source ('kepler', 'k2', or 'tess').
-        
+        chunk_size (int): Rows per chunk, or None to read the file in one go.
+
     Returns:
         pandas.DataFrame: A cleaned and standardized DataFrame, or None if file fails to load.
     """
     print(f"\n--- Processing {source_name.upper()} data from {filepath} ---")
+    dtypes = source_dtypes(source_name)
     try:
-        df = pd.read_csv(filepath, comment='#')
+        reader = pd.read_csv(
+            filepath, comment='#', usecols=lambda column: column in dtypes, dtype=dtypes,
+            chunksize=chunk_size,
+        )
     except FileNotFoundError:
         print(f"Error: File not found at {filepath}. Please check the path.")
         return None
 
-    processed_cols = {}
-    
-    # Map and rename columns based on our standard schema
-    for standard_name, source_map in COLUMN_MAPPING.items():
-        original_name = source_map.get(source_name)
-        if original_name and original_name in df.columns:
-            processed_cols[standard_name] = df[original_name]
-        else:
-            processed_cols[standard_name] = pd.Series([np.nan] * len(df), name=standard_name)
-
-    processed_df = pd.DataFrame(processed_cols)
+    chunks = reader if chunk_size else [reader]
+    processed_df = pd.concat([process_chunk(chunk, source_name) for chunk in chunks])
 
-    # Add display_name column
-    processed_df['display_name'] = [
-        generate_display_name(raw_row, source_name, df)
-        for _, raw_row in df.iterrows()
-    ]
+    print(f"Finished processing {source_name}. Shape: {processed_df.shape}")
+    return processed_df
 
 
-    disposition_map = TARGET_MAP[source_name]
-    processed_df['disposition'] = processed_df['disposition'].map(disposition_map)
-    
-    # Drop only rows with no disposition at all
-    processed_df = processed_df[processed_df['disposition'].notna()]
-    processed_df['disposition'] = processed_df['disposition'].astype(int)
+def merge_datasets(dataframes):
+    """Concatenate processed surveys, fill flags with 0 and other numeric gaps with the column median."""
+    df_merged = pd.concat(dataframes, ignore_index=True)
 
-    processed_df['source'] = source_name
-    
-    print(f"Finished processing {source_name}. Shape: {processed_df.shape}")
-    return processed_df
+    print(f"\n--- Merged all datasets. Total shape: {df_merged.shape} ---")
+    print("Value counts for the target variable 'disposition':")
+    print(df_merged['disposition'].value_counts())
+    print("\nValue counts for the 'source' of the data:")
+    print(df_merged['source'].value_counts())
 
+    print("\n--- Performing final cleaning and imputation on merged data ---")
 
-df_kepler = process_dataset('data/Kepler Data.csv', 'kepler')
-df_k2 = process_dataset('data/K2 Data.csv', 'k2')
-df_tess = process_dataset('data/TESS Data.csv', 'tess')
+    fp_flag_cols = [col for col in df_merged.columns if 'fp_flag' in col]
+    df_merged[fp_flag_cols] = df_merged[fp_flag_cols].fillna(0)
+    print(f"Filled missing values in {fp_flag_cols} with 0.")
 
-dataframes_to_merge = [df for df in [df_kepler, df_k2, df_tess] if df is not None]
-if not dataframes_to_merge:
-    print("\nNo dataframes to merge. Exiting.")
-    exit()
+    numeric_cols = df_merged.select_dtypes(include=np.number).columns.drop('disposition')
 
-df_merged = pd.concat(dataframes_to_merge, ignore_index=True)
+    print("\nMissing values BEFORE imputation:")
+    print(df_merged[numeric_cols].isnull().sum().loc[lambda x: x > 0])
 
-print(f"\n--- Merged all datasets. Total shape: {df_merged.shape} ---")
-print("Value counts for the target variable 'disposition':")
-print(df_merged['disposition'].value_counts())
-print("\nValue counts for the 'source' of the data:")
-print(df_merged['source'].value_counts())
+    df_merged[numeric_cols] = df_merged[numeric_cols].fillna(df_merged[numeric_cols].median())
 
+    print("\nMissing values AFTER imputation:")
+    print(df_merged[numeric_cols].isnull().sum().sum())
 
-print("\n--- Performing final cleaning and imputation on merged data ---")
+    return pd.get_dummies(df_merged, columns=['source'], drop_first=True)
 
-fp_flag_cols = [col for col in df_merged.columns if 'fp_flag' in col]
-df_merged[fp_flag_cols] = df_merged[fp_flag_cols].fillna(0)
-print(f"Filled missing values in {fp_flag_cols} with 0.")
 
-numeric_cols = df_merged.select_dtypes(include=np.number).columns.drop('disposition')
+def build_full_data(sources=None, chunk_size=None):
+    """
+    Run the whole Kepler/K2/TESS merge.
 
-print("\nMissing values BEFORE imputation:")
-print(df_merged[numeric_cols].isnull().sum().loc[lambda x: x > 0])
+    Args:
+        sources (dict): source name -> CSV path, defaults to DEFAULT_SOURCES.
+        chunk_size (int): Passed to process_dataset.
 
-for col in numeric_cols:
-    if df_merged[col].isnull().any():
-        median_val = df_merged[col].median()
-        df_merged[col].fillna(median_val, inplace=True)
+    Returns:
+        pandas.DataFrame: The contents of Full Data.csv, or None if no file could be read.
+    """
+    sources = sources or DEFAULT_SOURCES
+    dataframes = [process_dataset(path, name, chunk_size) for name, path in sources.items()]
+    dataframes = [df for df in dataframes if df is not None]
+    if not dataframes:
+        print("\nNo dataframes to merge. Exiting.")
+        return None
+    return merge_datasets(dataframes)
 
-print("\nMissing values AFTER imputation:")
-print(df_merged[numeric_cols].isnull().sum().sum())
 
+def main():
+    parser = argparse.ArgumentParser(description="Merge the Kepler, K2 and TESS tables into Full Data.csv")
+    parser.add_argument('--data-dir', default='data', help="Folder with the three survey CSVs")
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help="A .arrow path reloads fastest in NN.py (.parquet is smaller)")
+    parser.add_argument('--chunk-size', type=int, default=None, help="Rows per chunk when reading the surveys")
+    args = parser.parse_args()
 
+    sources = {
+        name: os.path.join(args.data_dir, os.path.basename(path)) for name, path in DEFAULT_SOURCES.items()
+    }
+    df_final = build_full_data(sources, args.chunk_size)
+    if df_final is None:
+        raise SystemExit(1)
 
-df_final = pd.get_dummies(df_merged, columns=['source'], drop_first=True)
+    # storage imports COLUMN_MAPPING from this module
+    from storage import FULL_DATA_COLUMNS, write_table
+    write_table(df_final, args.output, FULL_DATA_COLUMNS)
 
+    print(f"\nSuccess! Cleaned and merged data saved to '{args.output}'")
 
-output_filename = 'data/Full Data.csv'
-df_final.to_csv(output_filename, index=False)
+    print("\nFinal DataFrame Info:")
+    df_final.info()
+    print("\nFirst 5 rows of the final dataset:")
+    print(df_final.head())
 
-print(f"\nSuccess! Cleaned and merged data saved to '{output_filename}'")
 
-print("\nFinal DataFrame Info:")
-df_final.info()
-print("\nFirst 5 rows of the final dataset:")
-print(df_final.head())
\ No newline at end of file
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Content-addressed cache for the training pipeline's preprocessing stages.
+
+A stage's key is a hash of its input files' contents, its parameters, the
+source code of the stage function, its positional arguments (or the keys of
+the stages they came from) and the keys of the stages it depends on. Results
+are stored with joblib under that key, so a stage reruns only when something
+it depends on has changed:
+
+    cache = StageCache('.stage_cache')
+    X, y = cache.run('features', prepare_features, path, files=[path])
+    scaler, X_scaled = cache.run('scaling', fit_scaler, X, depends=['features'])
+"""
+import hashlib
+import inspect
+import json
+import os
+import tempfile
+
+import joblib
+
+
+def file_digest(path, block_size=1 << 20):
+    """sha256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class StageCache:
+    def __init__(self, directory='.stage_cache', enabled=True):
+        self.directory = directory
+        self.enabled = enabled
+        # stage name -> key of its last run, for stages that depend on it
+        self.keys = {}
+
+    def key(self, stage, func, files=(), params=None, depends=(), args=()):
+        try:
+            source = inspect.getsource(func)
+        except (OSError, TypeError):
+            source = getattr(func, '__qualname__', repr(func))
+        description = {
+            'stage': stage,
+            'code': hashlib.sha256(source.encode('utf-8')).hexdigest(),
+            'files': [file_digest(path) for path in files],
+            'params': joblib.hash(params or {}),
+            'args': joblib.hash(args),
+            'depends': [self.keys[name] for name in depends],
+        }
+        encoded = json.dumps(description, sort_keys=True, default=str).encode('utf-8')
+        return hashlib.sha256(encoded).hexdigest()[:32]
+
+    def path(self, stage, key):
+        return os.path.join(self.directory, f"{stage}-{key}.joblib")
+
+    def run(self, stage, func, *args, files=(), params=None, depends=()):
+        """
+        Return func(*args, **params), from the cache when this exact stage ran before.
+
+        Args:
+            stage (str): Stage name; also used by later stages' `depends`.
+            files: Input files whose contents the result depends on.
+            params (dict): Keyword arguments for `func`, part of the key.
+            depends: Names of earlier stages whose results are in `args`.
+                Their keys stand in for `args`, which are then not hashed;
+                without `depends`, `args` are hashed (arrays by content).
+        """
+        params = params or {}
+        key = self.key(stage, func, files, params, depends, args=() if depends else args)
+        self.keys[stage] = key
+        path = self.path(stage, key)
+
+        if self.enabled and os.path.exists(path):
+            print(f"♻️  Stage '{stage}' unchanged, loaded from {path}")
+            return joblib.load(path)
+
+        result = func(*args, **params)
+        if self.enabled:
+            os.makedirs(self.directory, exist_ok=True)
+            # Write then rename so an interrupted run never leaves a truncated entry
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            os.close(fd)
+            try:
+                joblib.dump(result, tmp_path)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            print(f"💾 Stage '{stage}' cached at {path}")
+        return result
@@ -0,0 +1,132 @@
+"""
+Columnar storage for the data passed between the pipeline stages.
+
+Every stage reads and writes through read_table / write_table, and the file
+extension picks the format:
+
+    .csv                  text, kept as the export format
+    .parquet              compressed columnar file (needs pyarrow)
+    .arrow / .feather     Arrow IPC file, memory-mapped on read (needs pyarrow)
+
+Columnar files are written with the typed schemas below, so readers get the
+same dtypes back without re-parsing or inferring anything.
+
+Reading Full Data back, measured with `python benchmark_storage.py --rows
+100000` (225k synthetic rows x 18 columns, pandas 3.0, pyarrow 17):
+
+    csv        25.4 MB, 460 ms
+    parquet    12.9 MB, 203 ms (2.3x faster)
+    arrow      30.2 MB,  82 ms (5.6x faster)
+
+The survey files are Git LFS pointers in this checkout, so real archive data
+hasn't been measured; random floats are a worst case for Parquet's
+compression. Arrow reloads fastest, so use a .arrow path for data passed
+between stages; Parquet mostly saves disk space. CSV stays the default.
+"""
+import os
+
+import pandas as pd
+
+from preprocessing import COLUMN_MAPPING
+
+PARQUET_EXTENSIONS = ('.parquet',)
+ARROW_EXTENSIONS = ('.arrow', '.feather')
+
+# Full Data.csv: the COLUMN_MAPPING columns (disposition as the integer
+# target), the display name and the one-hot source columns
+FULL_DATA_COLUMNS = {
+    **{column: ('int64' if column == 'disposition' else 'float64') for column in COLUMN_MAPPING},
+    'display_name': 'string',
+    'source_kepler': 'bool',
+    'source_tess': 'bool',
+}
+
+# stars.csv / planets.csv from visual_preprocessing.py (also read by load_data)
+STAR_COLUMNS = {
+    'id': 'int64', 'name': 'string', 'ra': 'float64', 'dec': 'float64',
+    'star_temp': 'float64', 'star_radius': 'float64', 'sy_dist': 'float64',
+}
+PLANET_COLUMNS = {
+    'id': 'int64', 'name': 'string', 'star_name': 'string', 'orbital_period': 'float64',
+    'radius': 'float64', 'ra': 'float64', 'dec': 'float64', 'duration': 'float64',
+    'transit_depth': 'float64', 'model_snr': 'float64',
+}
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError("Parquet/Arrow files need pyarrow: pip install pyarrow")
+    return pyarrow
+
+
+def file_format(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension in PARQUET_EXTENSIONS:
+        return 'parquet'
+    if extension in ARROW_EXTENSIONS:
+        return 'arrow'
+    return 'csv'
+
+
+def arrow_schema(columns):
+    """pyarrow schema from a {column: dtype name} mapping."""
+    pa = _pyarrow()
+    types = {'int64': pa.int64(), 'float64': pa.float64(), 'bool': pa.bool_(), 'string': pa.string()}
+    return pa.schema([(name, types[dtype]) for name, dtype in columns.items()])
+
+
+def write_table(df, path, columns=None, index=False):
+    """
+    Write `df` in the format given by the extension of `path`.
+
+    Args:
+        columns (dict): Typed schema ({column: dtype name}) for columnar files.
+            Columns of `df` not in it keep their inferred type.
+        index (bool): Write the index as a column (CSV: its name is the header).
+    """
+    fmt = file_format(path)
+    if fmt == 'csv':
+        df.to_csv(path, index=index)
+        return
+    pa = _pyarrow()
+    if index:
+        df = df.reset_index()
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if columns:
+        schema = arrow_schema({name: dtype for name, dtype in columns.items() if name in df.columns})
+        fields = [schema.field(name) if name in schema.names else table.schema.field(name) for name in df.columns]
+        table = table.cast(pa.schema(fields))
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        pq.write_table(table, path, compression='zstd')
+    else:
+        import pyarrow.feather as feather
+        # Uncompressed so the file can be memory-mapped without copying
+        feather.write_feather(table, path, compression='uncompressed')
+
+
+def read_table(path, columns=None, **csv_options):
+    """
+    Read a table written by write_table (or any CSV).
+
+    Args:
+        columns (list): Only load these columns (all of them if None).
+        csv_options: Extra pandas.read_csv arguments, used for CSV files only.
+    """
+    fmt = file_format(path)
+    if fmt == 'csv':
+        return pd.read_csv(path, usecols=columns, **csv_options)
+    pa = _pyarrow()
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        table = pq.read_table(path, columns=columns, memory_map=True)
+    else:
+        import pyarrow.ipc as ipc
+        with pa.memory_map(path, 'r') as source:
+            table = ipc.open_file(source).read_all()
+            if columns is not None:
+                table = table.select(columns)
+            return table.to_pandas()
+    return table.to_pandas()
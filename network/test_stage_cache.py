@@ -0,0 +1,97 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from stage_cache import StageCache
+
+
+def double(values, factor=2):
+    return values * factor
+
+
+def triple(values, factor=3):
+    return values * factor
+
+
+def line_count(path):
+    with open(path) as f:
+        return len(f.readlines())
+
+
+class StageCacheTests(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = os.path.join(directory.name, 'cache')
+        self.data_path = os.path.join(directory.name, 'data.csv')
+        self.write_data('a\nb\n')
+        self.calls = []
+
+    def write_data(self, content):
+        with open(self.data_path, 'w') as f:
+            f.write(content)
+
+    def counted(self, func):
+        def wrapper(*args, **kwargs):
+            self.calls.append(func.__name__)
+            return func(*args, **kwargs)
+        # The key hashes the stage function's source, so keep that of `func`
+        wrapper.__wrapped__ = func
+        return wrapper
+
+    def run_pipeline(self, params=None):
+        """A fresh StageCache (as in a new process) running a file stage and a dependent stage."""
+        cache = StageCache(self.directory)
+        lines = cache.run('lines', self.counted(line_count), self.data_path, files=[self.data_path])
+        return cache.run('doubled', self.counted(double), lines, params=params, depends=['lines'])
+
+    def testHitWhenNothingChanged(self):
+        self.assertEqual(self.run_pipeline(), 4)
+        self.assertEqual(self.calls, ['line_count', 'double'])
+        self.assertEqual(self.run_pipeline(), 4)
+        self.assertEqual(self.calls, ['line_count', 'double'])
+
+    def testInputFileChangeInvalidatesStageAndDependents(self):
+        self.run_pipeline()
+        self.write_data('a\nb\nc\n')
+        self.assertEqual(self.run_pipeline(), 6)
+        self.assertEqual(self.calls, ['line_count', 'double'] * 2)
+
+    def testParamsChangeInvalidatesOnlyThatStage(self):
+        self.run_pipeline()
+        self.assertEqual(self.run_pipeline(params={'factor': 5}), 10)
+        self.assertEqual(self.calls, ['line_count', 'double', 'double'])
+        self.run_pipeline(params={'factor': 5})
+        self.assertEqual(len(self.calls), 3)
+
+    def testFunctionSourceChangeInvalidates(self):
+        cache = StageCache(self.directory)
+        self.assertEqual(cache.run('scaled', self.counted(double), 2), 4)
+        self.assertEqual(cache.run('scaled', self.counted(triple), 2), 6)
+        self.assertEqual(cache.run('scaled', self.counted(double), 2), 4)
+        self.assertEqual(self.calls, ['double', 'triple'])
+
+    def testPositionalArraysAreHashedWithoutDepends(self):
+        cache = StageCache(self.directory)
+        values = np.arange(5.0)
+        np.testing.assert_array_equal(cache.run('scaled', self.counted(double), values), values * 2)
+        np.testing.assert_array_equal(cache.run('scaled', self.counted(double), values.copy()), values * 2)
+        self.assertEqual(len(self.calls), 1)
+
+        changed = values.copy()
+        changed[3] = 100.0
+        np.testing.assert_array_equal(cache.run('scaled', self.counted(double), changed), changed * 2)
+        self.assertEqual(len(self.calls), 2)
+
+    def testDisabledCacheAlwaysRuns(self):
+        cache = StageCache(self.directory, enabled=False)
+        cache.run('scaled', self.counted(double), 2)
+        cache.run('scaled', self.counted(double), 2)
+        self.assertEqual(len(self.calls), 2)
+        self.assertFalse(os.path.exists(self.directory))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,13 @@
+import argparse
+
 import pandas as pd
 
+from storage import PLANET_COLUMNS, STAR_COLUMNS, write_table
+
+parser = argparse.ArgumentParser(description="Build stars/planets tables for load_data from the archive CSVs")
+parser.add_argument("--format", choices=["csv", "parquet", "arrow"], default="csv")
+args = parser.parse_args()
+
 # Load raw CSVs (skip comment lines that start with #)
 planets_raw = pd.read_csv("data/visual/Planetary Systems.csv", comment='#', low_memory=False)
 stars_raw   = pd.read_csv("data/visual/Stellar Hosts.csv", comment='#', low_memory=False)
@@ -18,8 +26,8 @@ stars = stars[["name", "ra", "dec", "star_temp", "star_radius", "sy_dist"]].drop
 stars.reset_index(drop=True, inplace=True)
 stars.index.name = "id"
 
-stars.to_csv("stars.csv")
-print(f"✅ Saved {len(stars)} stars → stars.csv")
+write_table(stars, f"stars.{args.format}", STAR_COLUMNS, index=True)
+print(f"✅ Saved {len(stars)} stars → stars.{args.format}")
 
 # --- Process Planets ---
 planets = planets_raw.rename(columns={
@@ -51,5 +59,5 @@ planets["model_snr"] = None
 planets.reset_index(drop=True, inplace=True)
 planets.index.name = "id"
 
-planets.to_csv("planets.csv")
-print(f"✅ Saved {len(planets)} planets → planets.csv")
+write_table(planets, f"planets.{args.format}", PLANET_COLUMNS, index=True)
+print(f"✅ Saved {len(planets)} planets → planets.{args.format}")